@@ -0,0 +1,81 @@
+"""Compare the time and peak memory of converting circuits to ZX-graphs via
+``pyzx.Circuit.to_graph`` and via ``zxpass.graph.circuit_to_graph``.
+
+Usage: python bench_conversion.py [QASM_FILE ...]
+
+Without arguments, random Clifford+T circuits with up to 10^5 gates are used.
+"""
+
+import gc
+from pathlib import Path
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pyzx as zx  # noqa: E402
+from qiskit.circuit import QuantumCircuit  # noqa: E402
+from qiskit.converters import circuit_to_dag  # noqa: E402
+
+from zxpass import ZXPass  # noqa: E402
+from zxpass.graph import circuit_to_graph  # noqa: E402
+
+
+def random_circuit(num_qubits, num_gates, seed=0):
+    rng = np.random.default_rng(seed)
+    qc = QuantumCircuit(num_qubits)
+    for _ in range(num_gates):
+        kind = rng.integers(0, 5)
+        a, b = (int(q) for q in rng.choice(num_qubits, 2, replace=False))
+        if kind == 0:
+            qc.cx(a, b)
+        elif kind == 1:
+            qc.cz(a, b)
+        elif kind == 2:
+            qc.h(a)
+        elif kind == 3:
+            qc.rz(float(rng.uniform(0, 2 * np.pi)), a)
+        else:
+            qc.t(a)
+    return qc
+
+
+def measure(func, repeats=3):
+    """Return the best wall-clock time over ``repeats`` runs and the peak traced memory of one run."""
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    best = float("inf")
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best, peak
+
+
+def benchmark(name, qc):
+    dag = circuit_to_dag(qc)
+    zxpass = ZXPass()
+    convert_time, convert_peak = measure(lambda: zxpass._dag_to_circuits_and_nodes(dag))
+    circuits = [c for c in zxpass._dag_to_circuits_and_nodes(dag) if isinstance(c, zx.Circuit)]
+    pyzx_time, pyzx_peak = measure(lambda: [c.to_graph() for c in circuits])
+    direct_time, direct_peak = measure(lambda: [circuit_to_graph(c) for c in circuits])
+    print(f"{name:<28} {qc.size():>8} {convert_time:>10.3f} {convert_peak / 2**20:>9.1f} "
+          f"{pyzx_time:>10.3f} {pyzx_peak / 2**20:>9.1f} {direct_time:>10.3f} {direct_peak / 2**20:>9.1f} "
+          f"{pyzx_time / direct_time:>7.2f}x")
+
+
+if __name__ == "__main__":
+    print(f"{'circuit':<28} {'gates':>8} {'dag->zx s':>10} {'MiB':>9} "
+          f"{'to_graph s':>10} {'MiB':>9} {'direct s':>10} {'MiB':>9} {'speedup':>8}")
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            benchmark(path.rsplit("/", 1)[-1], QuantumCircuit.from_qasm_file(path))
+    else:
+        for num_qubits, num_gates in ((8, 1_000), (20, 10_000), (50, 100_000)):
+            benchmark(f"random_n{num_qubits}_g{num_gates}", random_circuit(num_qubits, num_gates))
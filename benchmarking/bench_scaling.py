@@ -0,0 +1,267 @@
+"""Measure how the stages of ZXPass scale with the number of qubits, the depth
+and the density of non-Clifford gates, on seeded synthetic circuits.
+
+Usage: python bench_scaling.py [--families F ...] [--qubits N ...] [--depths D ...]
+                               [--densities P ...] [--thresholds S ...] [--output FILE]
+
+Four families of circuits are generated, without any network access or data
+files, from seeded random number generators:
+
+- ``clifford_t``: layers of random CNOTs and single-qubit Clifford gates, with
+  each single-qubit gate a T or T-dagger with the given density;
+- ``phase_polynomial``: layers of random CNOTs followed by a Z rotation on each
+  qubit, non-Clifford with the given density (as for arithmetic circuits);
+- ``layered``: QAOA/Trotter-style layers of ZZ interactions on a ring followed
+  by X mixers, each layer's angles non-Clifford with the given density;
+- ``dynamic``: ``clifford_t`` layers interleaved with mid-circuit
+  measurements, feed-forward corrections and resets.
+
+Each family is swept along one axis at a time (qubits, depth or density)
+around a base point. Every circuit is run through ``ZXPass(collect_stats=True)``
+and the time of each stage of ``_optimize_unitary`` (summed over the segments)
+and of the whole pass is recorded. For the qubit and depth sweeps, a power law
+``time = c * x**k`` is fitted to each stage, and the sweep value at which the
+whole pass crosses each of the ``--thresholds`` (in seconds) is reported, both
+as observed and as extrapolated from the fit. Each circuit runs in a process of
+its own, which is killed after ``--timeout`` seconds, and larger values along
+its axis are then skipped. The results are written as JSON to ``--output``.
+"""
+
+import argparse
+import json
+import multiprocessing
+from pathlib import Path
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from qiskit.circuit import ClassicalRegister, QuantumCircuit  # noqa: E402
+from qiskit.transpiler import PassManager  # noqa: E402
+
+from zxpass import ZXPass  # noqa: E402
+from zxpass.hooks import SEGMENT_STAGES  # noqa: E402
+
+SINGLE_QUBIT_CLIFFORDS = ("h", "s", "sdg", "x", "z")
+
+
+def _pairs(rng, n):
+    """Return a random pairing of (at most) all ``n`` qubits."""
+    order = rng.permutation(n)
+    return [(int(order[i]), int(order[i + 1])) for i in range(0, n - 1, 2)]
+
+
+def _angle(rng, density):
+    """Return a non-Clifford angle (an odd multiple of pi/32) with probability ``density``, else a Clifford one."""
+    if rng.random() < density:
+        return float(rng.choice(np.arange(1, 64, 2))) * np.pi / 32
+    return float(rng.integers(0, 4)) * np.pi / 2
+
+
+def _clifford_t_layer(qc, rng, density):
+    for a, b in _pairs(rng, qc.num_qubits):
+        if rng.random() < 0.5:
+            qc.cx(a, b)
+    for q in range(qc.num_qubits):
+        if rng.random() < density:
+            gate = "t" if rng.random() < 0.5 else "tdg"
+        else:
+            gate = str(rng.choice(SINGLE_QUBIT_CLIFFORDS))
+        getattr(qc, gate)(q)
+
+
+def clifford_t(n, depth, density, rng):
+    qc = QuantumCircuit(n)
+    for _ in range(depth):
+        _clifford_t_layer(qc, rng, density)
+    return qc
+
+
+def phase_polynomial(n, depth, density, rng):
+    qc = QuantumCircuit(n)
+    for _ in range(depth):
+        for a, b in _pairs(rng, n):
+            qc.cx(a, b)
+        for q in range(n):
+            qc.rz(_angle(rng, density), q)
+    return qc
+
+
+def layered(n, depth, density, rng):
+    qc = QuantumCircuit(n)
+    qc.h(range(n))
+    for _ in range(depth):
+        gamma, beta = _angle(rng, density), _angle(rng, density)
+        for q in range(n):
+            qc.cx(q, (q + 1) % n)
+            qc.rz(gamma, (q + 1) % n)
+            qc.cx(q, (q + 1) % n)
+        qc.rx(beta, range(n))
+    return qc
+
+
+def dynamic(n, depth, density, rng):
+    qc = QuantumCircuit(n)
+    for layer in range(depth):
+        _clifford_t_layer(qc, rng, density)
+        if layer % 5 == 4:
+            # Measure a qubit, correct its neighbour on the outcome, and reuse it.
+            q = int(rng.integers(0, n))
+            creg = ClassicalRegister(1, f"m{layer}")
+            qc.add_register(creg)
+            qc.measure(q, creg[0])
+            with qc.if_test((creg, 1)):
+                qc.x((q + 1) % n)
+            qc.reset(q)
+    return qc
+
+
+FAMILIES = {
+    "clifford_t": clifford_t,
+    "phase_polynomial": phase_polynomial,
+    "layered": layered,
+    "dynamic": dynamic,
+}
+
+
+def run_point(family, n, depth, density, seed):
+    """Generate one circuit and run ZXPass on it, returning its size and the time of each stage."""
+    # Seed from the point itself, so that every point is reproducible on its own.
+    rng = np.random.default_rng([seed, list(FAMILIES).index(family), n, depth, int(round(density * 1000))])
+    qc = FAMILIES[family](n, depth, density, rng)
+    zx_pass = ZXPass(collect_stats=True)
+    start = time.perf_counter()
+    result = PassManager(zx_pass).run(qc)
+    total = time.perf_counter() - start
+    stats = zx_pass.property_set["zxpass_stats"]
+    stages = {
+        stage: sum(segment.get(f"{stage}_time", 0.0) for segment in stats["segments"]) for stage in SEGMENT_STAGES
+    }
+    stages.update({stage: stats["stages"].get(stage, 0.0) for stage in ("convert", "recover")})
+    return {
+        "qubits": n,
+        "depth": depth,
+        "density": density,
+        "gates_in": qc.size(),
+        "gates_out": result.size(),
+        "segments": len(stats["segments"]),
+        "total": total,
+        "stages": stages,
+    }
+
+
+def run_point_with_timeout(timeout, *args):
+    """Run :func:`run_point` in a separate process, returning ``None`` if it takes longer than ``timeout`` seconds.
+
+    A stage of ZXPass that is already running cannot be interrupted, so the process is killed instead.
+    """
+    with multiprocessing.Pool(1) as pool:
+        try:
+            return pool.apply_async(run_point, args).get(timeout)
+        except multiprocessing.TimeoutError:
+            return None
+
+
+def fit_power_law(xs, ys):
+    """Fit ``y = c * x**k`` by least squares in log-log space, ignoring non-positive points."""
+    points = [(x, y) for x, y in zip(xs, ys) if x > 0 and y > 0]
+    if len(points) < 2 or len({x for x, _ in points}) < 2:
+        return None
+    k, log_c = np.polyfit(np.log([x for x, _ in points]), np.log([y for _, y in points]), 1)
+    return {"c": float(np.exp(log_c)), "k": float(k)}
+
+
+def crossing(fit, threshold):
+    """Return the value of the swept variable at which the fitted time reaches ``threshold``."""
+    if fit is None or fit["k"] <= 0:
+        return None
+    return float((threshold / fit["c"]) ** (1 / fit["k"]))
+
+
+def sweep(args, family, axis, values):
+    points = []
+    report = {"axis": axis, "points": points}
+    for value in sorted(values):
+        point = {"qubits": args.base_qubits, "depth": args.base_depth, "density": args.base_density, axis: value}
+        result = run_point_with_timeout(
+            args.timeout, family, point["qubits"], point["depth"], point["density"], args.seed
+        )
+        if result is None:
+            # Larger values along the axis would only take longer.
+            print(f"{family:<17} {axis:<8} {value:>8} timed out after {args.timeout}s; skipping larger values")
+            report["timed_out_at"] = value
+            break
+        points.append(result)
+        print(f"{family:<17} {axis:<8} {value:>8} {result['gates_in']:>8} {result['gates_out']:>8} "
+              f"{result['total']:>9.3f}s " + " ".join(f"{result['stages'][s]:>9.3f}" for s in SEGMENT_STAGES))
+    if axis != "density":
+        xs = [point[axis] for point in points]
+        report["fits"] = {stage: fit_power_law(xs, [p["stages"][stage] for p in points]) for stage in SEGMENT_STAGES}
+        report["fits"]["total"] = fit_power_law(xs, [p["total"] for p in points])
+    report["thresholds"] = {}
+    for threshold in args.thresholds:
+        observed = next((point[axis] for point in points if point["total"] >= threshold), None)
+        if observed is None and threshold <= args.timeout:
+            observed = report.get("timed_out_at")
+        predicted = crossing(report.get("fits", {}).get("total"), threshold)
+        report["thresholds"][str(threshold)] = {"observed": observed, "predicted": predicted}
+    return report
+
+
+def print_summary(reports):
+    print("\nFitted exponents k of time = c * x**k:")
+    print(f"{'family':<17} {'axis':<8} " + " ".join(f"{stage:>18}" for stage in (*SEGMENT_STAGES, "total")))
+    for family, sweeps in reports.items():
+        for report in sweeps:
+            if "fits" not in report:
+                continue
+            fits = [report["fits"][stage] for stage in (*SEGMENT_STAGES, "total")]
+            print(f"{family:<17} {report['axis']:<8} "
+                  + " ".join(f"{fit['k']:>18.2f}" if fit else f"{'-':>18}" for fit in fits))
+    print("\nWhere the whole pass crosses each latency threshold (observed / extrapolated):")
+    for family, sweeps in reports.items():
+        for report in sweeps:
+            for threshold, where in report["thresholds"].items():
+                observed = "-" if where["observed"] is None else where["observed"]
+                predicted = "-" if where["predicted"] is None else f"{where['predicted']:.0f}"
+                print(f"{family:<17} {report['axis']:<8} {threshold:>6}s: {observed} / {predicted}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--families", nargs="+", choices=sorted(FAMILIES), default=list(FAMILIES))
+    parser.add_argument("--qubits", nargs="+", type=int, default=[10, 20, 50, 100, 200],
+                        help="numbers of qubits to sweep, at the base depth and density")
+    parser.add_argument("--depths", nargs="+", type=int, default=[10, 20, 50, 100],
+                        help="depths (in layers) to sweep, at the base number of qubits and density")
+    parser.add_argument("--densities", nargs="+", type=float, default=[0.0, 0.05, 0.1, 0.25, 0.5],
+                        help="non-Clifford densities to sweep, at the base number of qubits and depth")
+    parser.add_argument("--base-qubits", type=int, default=20)
+    parser.add_argument("--base-depth", type=int, default=20)
+    parser.add_argument("--base-density", type=float, default=0.1)
+    parser.add_argument("--thresholds", nargs="+", type=float, default=[0.1, 1.0, 10.0],
+                        help="latencies of the whole pass, in seconds, to report the crossing points of")
+    parser.add_argument("--timeout", type=float, default=300.0,
+                        help="the time after which a run of ZXPass is killed, and larger values on its axis skipped")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmarks_scaling.json", help="where to write the results")
+    args = parser.parse_args()
+
+    print(f"{'family':<17} {'axis':<8} {'value':>8} {'gates':>8} {'zx':>8} {'total':>10} "
+          + " ".join(f"{stage[:9]:>9}" for stage in SEGMENT_STAGES))
+    reports = {}
+    for family in args.families:
+        reports[family] = [
+            sweep(args, family, axis, values)
+            for axis, values in (("qubits", args.qubits), ("depth", args.depths), ("density", args.densities))
+        ]
+    print_summary(reports)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"seed": args.seed, "families": reports}, f, indent=2)
+    print(f"\nResults written to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Measure the wall time and peak memory of ZXPass and of Qiskit's level-3
+``transpile`` on the QASMBench circuits, and compare them against a baseline.
+
+Usage: python bench_timing.py [--repeats N] [--output FILE] [--baseline FILE] [CIRCUIT ...]
+
+For every circuit (by default, those of ``run_benchmarks.py``), both optimisers
+are timed ``--repeats`` times and the median and interquartile range of their
+wall times are recorded, along with the peak memory traced by ``tracemalloc``
+during one further run, the size, depth and number of non-local gates of their
+results, and the median time of each stage of ZXPass (see
+``ZXPass(collect_stats=True)``). The results are written as JSON to
+``--output``.
+
+With ``--baseline``, the results are compared against an earlier output. A
+median time more than ``--time-tolerance`` (relative) and ``--min-time``
+(absolute, in seconds) above the baseline, a peak memory more than
+``--memory-tolerance`` and ``--min-memory`` (in MiB) above it, or a larger
+ZXPass result than the baseline's, is reported as a regression, and the script
+exits with status 1.
+"""
+
+import argparse
+import gc
+import json
+from pathlib import Path
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pyzx as zx  # noqa: E402
+import qiskit  # noqa: E402
+from qiskit import transpile  # noqa: E402
+from qiskit.circuit import QuantumCircuit  # noqa: E402
+from qiskit.transpiler import PassManager  # noqa: E402
+
+from zxpass import ZXPass  # noqa: E402
+from zxpass.hooks import SEGMENT_STAGES  # noqa: E402
+from run_benchmarks import MEDIUM_BENCHMARKS, SMALL_BENCHMARKS  # noqa: E402
+
+# The measures of the quality of a result, for which lower is better.
+QUALITY = ("size", "depth", "nonlocal")
+
+
+def run_zxpass(qc):
+    zx_pass = ZXPass(collect_stats=True)
+    result = PassManager(zx_pass).run(qc)
+    stats = zx_pass.property_set["zxpass_stats"]
+    stages = dict(stats["stages"])
+    for stage in SEGMENT_STAGES:
+        stages[stage] = sum(segment.get(f"{stage}_time", 0.0) for segment in stats["segments"])
+    return result, stages
+
+
+def run_qiskit(qc):
+    return transpile(qc, basis_gates=["u3", "cx"], optimization_level=3), {}
+
+
+def summarise(times):
+    """Return the median and interquartile range of a list of times."""
+    if len(times) < 2:
+        return times[0], 0.0
+    q1, _, q3 = statistics.quantiles(times, n=4, method="inclusive")
+    return statistics.median(times), q3 - q1
+
+
+def measure(func, qc, repeats):
+    """Time ``func`` on ``qc`` ``repeats`` times, then trace the peak memory of one more run."""
+    times = []
+    stage_times = {}
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        result, stages = func(qc)
+        times.append(time.perf_counter() - start)
+        for stage, elapsed in stages.items():
+            stage_times.setdefault(stage, []).append(elapsed)
+    gc.collect()
+    tracemalloc.start()
+    func(qc)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    median, iqr = summarise(times)
+    return {
+        "time_median": median,
+        "time_iqr": iqr,
+        "times": times,
+        "peak_memory": peak,
+        "stages": {stage: statistics.median(elapsed) for stage, elapsed in stage_times.items()},
+        "size": result.size(),
+        "depth": result.depth(),
+        "nonlocal": result.num_nonlocal_gates(),
+    }
+
+
+def run(circuits, qasm_dir, repeats):
+    results = {}
+    for name in circuits:
+        paths = sorted(Path(qasm_dir).glob(f"*/{name}/{name}.qasm"))
+        if not paths:
+            print(f"Skipping {name}: not found in {qasm_dir}.")
+            continue
+        path = paths[0]
+        qc = QuantumCircuit.from_qasm_file(str(path))
+        results[name] = {
+            "original": {"size": qc.size(), "depth": qc.depth(), "nonlocal": qc.num_nonlocal_gates()},
+            "zxpass": measure(run_zxpass, qc, repeats),
+            "qiskit": measure(run_qiskit, qc, repeats),
+        }
+        zx_result, qiskit_result = results[name]["zxpass"], results[name]["qiskit"]
+        print(f"{name:<20} zxpass {zx_result['time_median']:8.3f}s ±{zx_result['time_iqr']:.3f} "
+              f"{zx_result['peak_memory'] / 2**20:7.1f} MiB   "
+              f"qiskit {qiskit_result['time_median']:8.3f}s ±{qiskit_result['time_iqr']:.3f} "
+              f"{qiskit_result['peak_memory'] / 2**20:7.1f} MiB")
+    return {
+        "metadata": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "qiskit": qiskit.__version__,
+            "pyzx": zx.__version__,
+            "repeats": repeats,
+        },
+        "circuits": results,
+    }
+
+
+def compare(current, baseline, time_tolerance, memory_tolerance, min_time, min_memory):
+    """Return a description of every regression of ``current`` against ``baseline``."""
+    regressions = []
+    for name, tools in current["circuits"].items():
+        if name not in baseline["circuits"]:
+            continue
+        for tool in ("zxpass", "qiskit"):
+            new, old = tools[tool], baseline["circuits"][name][tool]
+            slower = new["time_median"] - old["time_median"]
+            if slower > min_time and new["time_median"] > old["time_median"] * (1 + time_tolerance):
+                regressions.append(f"{name} {tool}: time {old['time_median']:.3f}s -> {new['time_median']:.3f}s")
+            larger = new["peak_memory"] - old["peak_memory"]
+            if larger > min_memory and new["peak_memory"] > old["peak_memory"] * (1 + memory_tolerance):
+                regressions.append(f"{name} {tool}: peak memory {old['peak_memory'] / 2**20:.1f} MiB -> "
+                                   f"{new['peak_memory'] / 2**20:.1f} MiB")
+            if tool == "zxpass":
+                for quality in QUALITY:
+                    if new[quality] > old[quality]:
+                        regressions.append(f"{name} {tool}: {quality} {old[quality]} -> {new[quality]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("circuits", nargs="*", help="names of QASMBench circuits (default: all benchmarked)")
+    parser.add_argument("--qasm-dir", default="QASMBench", help="the QASMBench checkout")
+    parser.add_argument("--repeats", type=int, default=5, help="timed runs per circuit and optimiser")
+    parser.add_argument("--output", default="benchmarks_timing.json", help="where to write the results")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    parser.add_argument("--time-tolerance", type=float, default=0.25,
+                        help="relative increase in median time reported as a regression")
+    parser.add_argument("--memory-tolerance", type=float, default=0.10,
+                        help="relative increase in peak memory reported as a regression")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="smallest increase in median time, in seconds, reported as a regression")
+    parser.add_argument("--min-memory", type=float, default=1.0,
+                        help="smallest increase in peak memory, in MiB, reported as a regression")
+    args = parser.parse_args()
+    if args.repeats < 1:
+        parser.error("--repeats must be at least 1")
+
+    current = run(args.circuits or SMALL_BENCHMARKS + MEDIUM_BENCHMARKS, args.qasm_dir, args.repeats)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2, sort_keys=True)
+    print(f"Results written to {args.output}.")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.time_tolerance, args.memory_tolerance, args.min_time,
+                              args.min_memory * 2**20)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,7 +18,7 @@ from qiskit.transpiler import PassManager
 import pyzx as zx
 
 from zxpass import ZXPass
-from zxpass.zxpass import _is_unitary_gate
+from zxpass.segments import _is_unitary_gate
 
 
 def _gate_breakdown(gates):
@@ -1,9 +1,17 @@
 """Profile Qiskit's optimisation passes on DNN circuits to identify which passes
-contribute most to depth reduction."""
+contribute most to depth reduction, and where the time goes inside ZXPass."""
+
+from collections import defaultdict
+from pathlib import Path
+import sys
 
 from qiskit.circuit import QuantumCircuit
+from qiskit.transpiler import PassManager
 from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from zxpass import ChromeTraceHook, ZXPass  # noqa: E402
+
 
 def profile_circuit(subdir, circuit_name):
     print(f"\n{'='*80}")
@@ -53,6 +61,33 @@ def profile_circuit(subdir, circuit_name):
           f"non-local gates: {prev_nonlocal}")
 
 
+class StageTotals(ChromeTraceHook):
+    """Sum up the time spent in each stage of ZXPass, as well as recording a trace."""
+
+    def __init__(self, path=None):
+        super().__init__(path)
+        self.totals = defaultdict(float)
+
+    def on_stage_end(self, stage, segment, elapsed, graph_stats):
+        super().on_stage_end(stage, segment, elapsed, graph_stats)
+        self.totals[stage if segment is None else f"  segment {stage}"] += elapsed
+
+
+def profile_zxpass(subdir, circuit_name):
+    qc = QuantumCircuit.from_qasm_file(
+        f"QASMBench/{subdir}/{circuit_name}/{circuit_name}.qasm"
+    )
+    hook = StageTotals(f"{circuit_name}_zxpass_trace.json")
+    PassManager(ZXPass(hook=hook)).run(qc)
+    print(f"\n  ZXPass stages for {circuit_name}:")
+    for stage, elapsed in hook.totals.items():
+        print(f"    {stage:<30} {elapsed:8.3f}s")
+    hook.save()
+    print(f"  Trace written to {hook.path} (open in chrome://tracing or Perfetto).")
+
+
 if __name__ == "__main__":
     profile_circuit("small", "dnn_n2")
     profile_circuit("small", "dnn_n8")
+    profile_zxpass("small", "dnn_n2")
+    profile_zxpass("small", "dnn_n8")
@@ -13,31 +13,105 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-if __name__ == "__main__":
-    import sys
+import argparse
+import hashlib
+import io
+import multiprocessing
+from multiprocessing.connection import Connection, wait
+from multiprocessing.process import BaseProcess
+import os
+from pathlib import Path
+import pickle
+import sys
+import time
+import traceback
 
-    sys.path.append("..")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-from qiskit import transpile
-from qiskit.circuit import QuantumCircuit
-from qiskit.transpiler import PassManager
-from typing import Dict, List, Tuple
-import matplotlib.pyplot as plt  # type: ignore
+import qiskit  # noqa: E402
+from qiskit import transpile  # noqa: E402
+from qiskit.circuit import QuantumCircuit  # noqa: E402
+from qiskit.transpiler import PassManager  # noqa: E402
+from typing import Dict, List, Optional, Tuple  # noqa: E402
+import matplotlib.pyplot as plt  # type: ignore  # noqa: E402
 
-from zxpass import ZXPass
+from zxpass import ZXPass  # noqa: E402
 
 
 pass_manager = PassManager(ZXPass())
 
+# List of circuits to benchmark, based on: https://github.com/Qiskit/qiskit/issues/4990#issuecomment-1157858632
+SMALL_BENCHMARKS = [
+    "wstate_n3",
+    "linearsolver_n3",
+    "fredkin_n3",
+    "dnn_n2",
+    "qrng_n4",
+    "adder_n4",
+    "deutsch_n2",
+    "cat_state_n4",
+    "basis_trotter_n4",
+    "qec_en_n5",
+    "toffoli_n3",
+    "grover_n2",
+    "hs4_n4",
+    "qaoa_n3",
+    "teleportation_n3",
+    "lpn_n5",
+    "vqe_uccsd_n4",
+    "quantumwalks_n2",
+    "variational_n4",
+    "qft_n4",
+    "iswap_n2",
+    "bell_n4",
+    "basis_change_n3",
+    "vqe_uccsd_n6",
+    "ising_n10",
+    "simon_n6",
+    "qpe_n9",
+    "qaoa_n6",
+    "bb84_n8",
+    "vqe_uccsd_n8",
+    "adder_n10",
+    "dnn_n8",
+]
+MEDIUM_BENCHMARKS = ["bv_n14", "multiplier_n15", "sat_n11", "qft_n18"]
+
+
+def _load_circuit(path: str, cache_dir: Optional[str]) -> QuantumCircuit:
+    """Parse a QASM file, reusing the circuit parsed by an earlier run if it is in ``cache_dir``.
+
+    Cached circuits are keyed by the contents of the file and the version of Qiskit that parsed it.
+    """
+    if cache_dir is None:
+        return QuantumCircuit.from_qasm_file(path)
+    with open(path, "rb") as f:
+        key = hashlib.sha256(f.read() + qiskit.__version__.encode()).hexdigest()
+    cached = Path(cache_dir) / f"{Path(path).stem}-{key[:16]}.pickle"
+    if cached.exists():
+        try:
+            with open(cached, "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass  # Parse the file again.
+    qc = QuantumCircuit.from_qasm_file(path)
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    # Write atomically, since several workers may parse the same file.
+    partial = cached.with_suffix(f".{os.getpid()}.tmp")
+    with open(partial, "wb") as f:
+        pickle.dump(qc, f)
+    os.replace(partial, cached)
+    return qc
+
 
 def _benchmark(
-    subdir: str, circuit_name: str, as_plugin: bool = False
-) -> Tuple[float, float, float]:
-    print(f"Circuit name: {circuit_name}")
+    subdir: str, circuit_name: str, as_plugin: bool = False, cache_dir: Optional[str] = None
+) -> Tuple[str, Tuple[float, float, float]]:
+    """Benchmark one circuit, returning the report to print and the ratios to plot."""
+    out = io.StringIO()
+    print(f"Circuit name: {circuit_name}", file=out)
 
-    qc = QuantumCircuit.from_qasm_file(
-        f"QASMBench/{subdir}/{circuit_name}/{circuit_name}.qasm"
-    )
+    qc = _load_circuit(f"QASMBench/{subdir}/{circuit_name}/{circuit_name}.qasm", cache_dir)
     opt_qc = transpile(qc, basis_gates=["u3", "cx"], optimization_level=3)
     if as_plugin:
         zx_qc = transpile(qc, optimization_method="zxpass", optimization_level=3)
@@ -47,24 +121,27 @@ def _benchmark(
     print(
         f"Size - original: {qc.size()}, "
         f"optimized: {opt_qc.size()} ({qc.size() / opt_qc.size():.2f}), "
-        f"zx: {zx_qc.size()} ({qc.size() / zx_qc.size():.2f})"
+        f"zx: {zx_qc.size()} ({qc.size() / zx_qc.size():.2f})",
+        file=out,
     )
     print(
         f"Depth - original: {qc.depth()}, "
         f"optimized: {opt_qc.depth()} ({qc.depth() / opt_qc.depth():.2f}), "
-        f"zx: {zx_qc.depth()} ({qc.depth() / zx_qc.depth():.2f})"
+        f"zx: {zx_qc.depth()} ({qc.depth() / zx_qc.depth():.2f})",
+        file=out,
     )
-    print(f"Number of non-local gates - original: {qc.num_nonlocal_gates()}, ", end="")
+    print(f"Number of non-local gates - original: {qc.num_nonlocal_gates()}, ", end="", file=out)
     if qc.num_nonlocal_gates() != 0:
         print(
             f"optimized: {opt_qc.num_nonlocal_gates()}, zx: {zx_qc.num_nonlocal_gates()}, "
-            f"ratio: {opt_qc.num_nonlocal_gates() / zx_qc.num_nonlocal_gates():.2f}"
+            f"ratio: {opt_qc.num_nonlocal_gates() / zx_qc.num_nonlocal_gates():.2f}",
+            file=out,
         )
     else:
-        print("optimized: 0, zx: 0")
-    print()
+        print("optimized: 0, zx: 0", file=out)
+    print(file=out)
 
-    return (
+    return out.getvalue(), (
         qc.depth() / opt_qc.depth(),
         qc.depth() / zx_qc.depth(),
         qc.num_nonlocal_gates() / zx_qc.num_nonlocal_gates()
@@ -73,6 +150,72 @@ def _benchmark(
     )
 
 
+def _benchmark_in_worker(subdir: str, circuit_name: str, cache_dir: Optional[str], conn) -> None:
+    """Run :func:`_benchmark` in a worker process, sending its outcome (or the error it raised) back on ``conn``."""
+    try:
+        conn.send(("ok", _benchmark(subdir, circuit_name, cache_dir=cache_dir)))
+    except Exception as e:  # pylint: disable=broad-except
+        # Only the error itself goes into the report, which must not depend on where the code lives.
+        traceback.print_exc(file=sys.stderr)
+        conn.send(("error", "".join(traceback.format_exception_only(type(e), e))))
+    finally:
+        conn.close()
+
+
+def _failure(circuit_name: str, message: str) -> Tuple[str, None]:
+    return f"Circuit name: {circuit_name}\n{message}\n\n", None
+
+
+def _run_parallel(
+    circuits: List[Tuple[str, str]], workers: int, timeout: float, cache_dir: Optional[str]
+):
+    """Benchmark each circuit in a process of its own, at most ``workers`` at a time, yielding outcomes in order.
+
+    A circuit that takes more than ``timeout`` seconds is killed, and one that raises an error
+    or crashes its process is reported, without affecting the others. Outcomes are yielded in
+    the order of ``circuits`` as soon as they and all those before them are done, so the output
+    does not depend on the number of workers or on which circuits finish first.
+    """
+    context = multiprocessing.get_context()
+    pending = list(enumerate(circuits))
+    running: Dict[int, Tuple[BaseProcess, Connection, float]] = {}
+    done: Dict[int, Tuple[str, Optional[Tuple[float, float, float]]]] = {}
+    next_index = 0
+    while next_index < len(circuits):
+        while pending and len(running) < workers:
+            i, (subdir, circuit_name) = pending.pop(0)
+            receiver, sender = context.Pipe(duplex=False)
+            process: BaseProcess = context.Process(
+                target=_benchmark_in_worker, args=(subdir, circuit_name, cache_dir, sender), daemon=True
+            )
+            process.start()
+            sender.close()
+            running[i] = (process, receiver, time.monotonic())
+
+        ready = wait([receiver for _, receiver, _ in running.values()], timeout=0.1)
+        for i, (process, receiver, start) in list(running.items()):
+            circuit_name = circuits[i][1]
+            if receiver in ready:
+                try:
+                    status, payload = receiver.recv()
+                except EOFError:
+                    process.join()
+                    status, payload = "error", f"worker process exited with code {process.exitcode}"
+                done[i] = payload if status == "ok" else _failure(circuit_name, f"ERROR: {payload.strip()}")
+            elif time.monotonic() - start > timeout:
+                process.kill()
+                done[i] = _failure(circuit_name, f"TIMEOUT after {timeout:g}s")
+            else:
+                continue
+            process.join()
+            receiver.close()
+            del running[i]
+
+        while next_index in done:
+            yield circuits[next_index], done.pop(next_index)
+            next_index += 1
+
+
 def _save_plot(
     title: str, plot_index: List[str], data: Dict[str, List[float]], ylabel: str
 ) -> None:
@@ -90,7 +233,11 @@ def _save_plot(
     plt.savefig(f"{title.replace(' ', '_')}.png")
 
 
-def run_benchmarks() -> None:
+def run_benchmarks(workers: int = 1, timeout: float = 1800.0, cache_dir: Optional[str] = None) -> int:
+    """Benchmark every circuit, printing a report for each in order, and plot the ratios.
+
+    :return: The number of circuits that failed or timed out.
+    """
     print("Legend:")
     print("  Raw counts (size, depth, non-local gates): lower is better.")
     print(
@@ -104,66 +251,43 @@ def run_benchmarks() -> None:
     )
     print()
 
-    # List of circuits to benchmark, based on: https://github.com/Qiskit/qiskit/issues/4990#issuecomment-1157858632
-    small_benchmarks = [
-        "wstate_n3",
-        "linearsolver_n3",
-        "fredkin_n3",
-        "dnn_n2",
-        "qrng_n4",
-        "adder_n4",
-        "deutsch_n2",
-        "cat_state_n4",
-        "basis_trotter_n4",
-        "qec_en_n5",
-        "toffoli_n3",
-        "grover_n2",
-        "hs4_n4",
-        "qaoa_n3",
-        "teleportation_n3",
-        "lpn_n5",
-        "vqe_uccsd_n4",
-        "quantumwalks_n2",
-        "variational_n4",
-        "qft_n4",
-        "iswap_n2",
-        "bell_n4",
-        "basis_change_n3",
-        "vqe_uccsd_n6",
-        "ising_n10",
-        "simon_n6",
-        "qpe_n9",
-        "qaoa_n6",
-        "bb84_n8",
-        "vqe_uccsd_n8",
-        "adder_n10",
-        "dnn_n8",
-    ]
-    medium_benchmarks = ["bv_n14", "multiplier_n15", "sat_n11", "qft_n18"]
-
+    circuits = [("small", name) for name in SMALL_BENCHMARKS] + [("medium", name) for name in MEDIUM_BENCHMARKS]
     depth_ratio: Dict[str, List[float]] = {"qiskit": [], "pyzx": []}
     num_nonlocal_ratio: Dict[str, List[float]] = {"qiskit": [], "pyzx": []}
     plot_index = []
-    for benchmark in small_benchmarks:
-        qiskit_depth, zx_depth, non_local_ratio = _benchmark("small", benchmark)
-        depth_ratio["pyzx"].append(zx_depth)
-        depth_ratio["qiskit"].append(qiskit_depth)
-        num_nonlocal_ratio["pyzx"].append(non_local_ratio)
-        num_nonlocal_ratio["qiskit"].append(1 if non_local_ratio != 0 else 0)
-        plot_index.append(benchmark)
-    for benchmark in medium_benchmarks:
-        qiskit_depth, zx_depth, non_local_ratio = _benchmark("medium", benchmark)
+    failures = 0
+    start = time.perf_counter()
+    for (_, benchmark), (report, ratios) in _run_parallel(circuits, workers, timeout, cache_dir):
+        print(report, end="", flush=True)
+        if ratios is None:
+            failures += 1
+            continue
+        qiskit_depth, zx_depth, non_local_ratio = ratios
         depth_ratio["pyzx"].append(zx_depth)
         depth_ratio["qiskit"].append(qiskit_depth)
         num_nonlocal_ratio["pyzx"].append(non_local_ratio)
         num_nonlocal_ratio["qiskit"].append(1 if non_local_ratio != 0 else 0)
         plot_index.append(benchmark)
+    # Timings go to stderr, to keep the snapshot on stdout deterministic.
+    print(f"Benchmarked {len(circuits)} circuits in {time.perf_counter() - start:.1f}s "
+          f"with {workers} workers; {failures} failed.", file=sys.stderr)
 
     _save_plot("Depth compression ratio", plot_index, depth_ratio, "depth_ratio")
     _save_plot(
         "Ratio of non-local gates", plot_index, num_nonlocal_ratio, "num_nonlocal_ratio"
     )
+    return failures
 
 
 if __name__ == "__main__":
-    run_benchmarks()
+    parser = argparse.ArgumentParser(description="Benchmark ZXPass against Qiskit on QASMBench circuits.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="circuits to benchmark at the same time, each in a process of its own")
+    parser.add_argument("--timeout", type=float, default=1800.0,
+                        help="seconds after which a circuit is abandoned and reported as timed out")
+    parser.add_argument("--cache-dir", default=".qasm_cache", help="where to keep parsed circuits between runs")
+    parser.add_argument("--no-cache", action="store_true", help="parse every QASM file again")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    sys.exit(1 if run_benchmarks(args.workers, args.timeout, None if args.no_cache else args.cache_dir) else 0)
@@ -41,3 +41,16 @@ def assert_equiv(original: QuantumCircuit, optimized: QuantumCircuit) -> None:
     assert Statevector.from_instruction(original).equiv(
         Statevector.from_instruction(optimized)
     )
+
+
+def two_segment_circuit() -> QuantumCircuit:
+    """Build a circuit with a reducible segment and an irreducible one, separated by a barrier."""
+    qc = QuantumCircuit(2)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.cx(0, 1)
+    qc.t(1)
+    qc.barrier()
+    qc.h(0)
+    qc.cx(0, 1)
+    return qc
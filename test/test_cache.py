@@ -0,0 +1,255 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for caching optimised unitary segments."""
+
+# pylint: disable=duplicate-code
+
+from fractions import Fraction
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+import pickle
+
+import pyzx as zx
+
+from qiskit.circuit import QuantumCircuit
+from qiskit.transpiler import PassManager
+
+from zxpass import ZXPass, SegmentCache, PersistentSegmentCache
+from zxpass.cache import segment_fingerprint
+
+from ._helpers import assert_equiv
+
+
+def _segment(phase: Fraction = Fraction(1, 4), adjoint: bool = False) -> zx.Circuit:
+    c = zx.Circuit(2)
+    c.add_gate("HAD", 0)
+    c.add_gate("CNOT", 0, 1)
+    c.add_gate("ZPhase", 1, phase=phase)
+    c.add_gate("S", 0, adjoint=adjoint)
+    return c
+
+
+def test_fingerprint_distinguishes_gates() -> None:
+    """The fingerprint depends on gate phases, adjoint flags, qubits and circuit width."""
+    base = segment_fingerprint(_segment())
+    assert base == segment_fingerprint(_segment())
+    assert base != segment_fingerprint(_segment(phase=Fraction(1, 8)))
+    assert base != segment_fingerprint(_segment(adjoint=True))
+
+    wider = zx.Circuit(3)
+    for gate in _segment().gates:
+        wider.add_gate(gate)
+    assert base != segment_fingerprint(wider)
+
+    swapped = zx.Circuit(2)
+    swapped.add_gate("HAD", 0)
+    swapped.add_gate("CNOT", 1, 0)
+    swapped.add_gate("ZPhase", 1, phase=Fraction(1, 4))
+    swapped.add_gate("S", 0)
+    assert base != segment_fingerprint(swapped)
+
+
+def test_lru_eviction_and_counters() -> None:
+    """The least recently used entry is evicted once the cache is full."""
+    cache = SegmentCache(maxsize=2)
+    a, b, c = _segment(Fraction(1, 4)), _segment(Fraction(1, 8)), _segment(Fraction(1, 16))
+    cache.put("a", a)
+    cache.put("b", b)
+    assert cache.get("a") is not None  # "a" is now most recently used.
+    cache.put("c", c)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats() == {"hits": 3, "misses": 1, "evictions": 1, "size": 2}
+
+
+def test_cached_circuits_are_copies() -> None:
+    """Modifying a circuit after caching it, or after retrieving it, does not affect the cache."""
+    cache = SegmentCache()
+    c = _segment()
+    cache.put("k", c)
+    c.add_gate("HAD", 1)
+    retrieved = cache.get("k")
+    assert retrieved is not None and len(retrieved.gates) == 4
+    retrieved.add_gate("HAD", 1)
+    again = cache.get("k")
+    assert again is not None and len(again.gates) == 4
+
+
+def test_cache_shared_between_passes() -> None:
+    """A second pass sharing the cache reuses every segment and gives the same result."""
+    qc = QuantumCircuit(3)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.cx(1, 2)
+    qc.cx(1, 2)
+    qc.t(2)
+    qc.barrier()
+    qc.cx(0, 1)
+    qc.cx(0, 1)
+
+    cache = SegmentCache()
+    first = PassManager(ZXPass(cache=cache)).run(qc)
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["hits"] == 0
+
+    second = PassManager(ZXPass(cache=cache)).run(qc)
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["hits"] == 2
+    assert second == first
+    assert_equiv(qc, second)
+
+
+def test_cache_with_rzz() -> None:
+    """Segments containing RZZ gates, whose copy method fails in PyZX, can be cached and reused."""
+    qc = QuantumCircuit(2)
+    qc.rzz(0.3, 0, 1)
+
+    cache = SegmentCache()
+    first = PassManager(ZXPass(cache=cache)).run(qc)
+    second = PassManager(ZXPass(cache=cache)).run(qc)
+    assert cache.stats()["hits"] == 1
+    assert second == first
+    assert_equiv(qc, second)
+
+    segment = zx.Circuit(2)
+    segment.add_gate("RZZ", 0, 1, phase=Fraction(1, 8))
+    cache.put("rzz", segment)
+    retrieved = cache.get("rzz")
+    assert retrieved is not None and segment_fingerprint(retrieved) == segment_fingerprint(segment)
+
+
+def test_cache_concurrent_use() -> None:
+    """Concurrent runs sharing one cache all produce correct results."""
+    qc = QuantumCircuit(3)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.cx(1, 2)
+    qc.cx(1, 2)
+    qc.rz(0.3, 2)
+
+    cache = SegmentCache(maxsize=4)
+
+    def _run(_: int) -> QuantumCircuit:
+        return PassManager(ZXPass(cache=cache)).run(qc)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(_run, range(8)))
+
+    for result in results:
+        assert_equiv(qc, result)
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == 8
+    assert stats["size"] == 1
+
+
+def _store_segment(directory: str, index: int) -> int:
+    """Store a distinct segment in a persistent cache from a worker process."""
+    cache = PersistentSegmentCache(directory)
+    cache.put(f"k{index}", _segment(Fraction(1, index + 2)))
+    return len(cache)
+
+
+def test_persistent_cache_survives_instances(tmp_path: Path) -> None:
+    """A segment stored by one instance is visible to a new instance on the same directory."""
+    PersistentSegmentCache(tmp_path).put("k", _segment())
+    cache = PersistentSegmentCache(tmp_path)
+    retrieved = cache.get("k")
+    assert retrieved is not None
+    assert segment_fingerprint(retrieved) == segment_fingerprint(_segment())
+    assert cache.get("missing") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_persistent_cache_keyed_by_pyzx_version(tmp_path: Path) -> None:
+    """Entries written under another PyZX version are not served."""
+    old = PersistentSegmentCache(tmp_path)
+    old.version = "0.0.0"
+    old.put("k", _segment())
+    assert PersistentSegmentCache(tmp_path).get("k") is None
+
+
+def test_persistent_cache_eviction(tmp_path: Path) -> None:
+    """The least recently used entries are evicted when either cap is exceeded."""
+    cache = PersistentSegmentCache(tmp_path, max_entries=2, touch_interval=0.0)
+    cache.put("a", _segment(Fraction(1, 4)))
+    cache.put("b", _segment(Fraction(1, 8)))
+    assert cache.get("a") is not None
+    cache.put("c", _segment(Fraction(1, 16)))
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    small = PersistentSegmentCache(tmp_path / "small", max_bytes=1)
+    small.put("a", _segment())
+    assert len(small) == 0
+
+
+def test_persistent_cache_throttles_touches(tmp_path: Path) -> None:
+    """A hit soon after an entry was last used does not make it more recently used."""
+    cache = PersistentSegmentCache(tmp_path, max_entries=2)
+    cache.put("a", _segment(Fraction(1, 4)))
+    cache.put("b", _segment(Fraction(1, 8)))
+    assert cache.get("a") is not None
+    cache.put("c", _segment(Fraction(1, 16)))
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+
+
+def test_persistent_cache_totals(tmp_path: Path) -> None:
+    """The number and size of the entries stay exact through replacements, discards and clears."""
+    cache = PersistentSegmentCache(tmp_path)
+    cache.put("a", _segment())
+    cache.put("b", _segment(Fraction(1, 8)))
+    cache.put("a", _segment(Fraction(1, 16), adjoint=True))
+    cache.discard("b")
+    reopened = PersistentSegmentCache(tmp_path)
+    assert reopened.stats()["size"] == len(reopened) == 1
+    stored = pickle.dumps(_segment(Fraction(1, 16), adjoint=True), protocol=pickle.HIGHEST_PROTOCOL)
+    assert reopened.stats()["bytes"] == len(stored)
+    reopened.clear()
+    assert cache.stats()["size"] == cache.stats()["bytes"] == 0
+
+
+def test_persistent_cache_concurrent_processes(tmp_path: Path) -> None:
+    """Several processes can write to the same directory at once."""
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(_store_segment, [str(tmp_path)] * 8, range(8)))
+    cache = PersistentSegmentCache(tmp_path)
+    assert len(cache) == 8
+    assert all(cache.get(f"k{i}") is not None for i in range(8))
+
+
+def test_persistent_cache_in_pass(tmp_path: Path) -> None:
+    """A later pass with a fresh in-memory cache is served from the persistent cache."""
+    qc = QuantumCircuit(2)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.cx(0, 1)
+    qc.t(1)
+
+    first = PassManager(ZXPass(persistent_cache=PersistentSegmentCache(tmp_path))).run(qc)
+
+    memory = SegmentCache()
+    persistent = PersistentSegmentCache(tmp_path)
+    second = PassManager(ZXPass(cache=memory, persistent_cache=persistent)).run(qc)
+    assert persistent.stats()["hits"] == 1
+    assert memory.stats()["misses"] == 1
+    assert len(memory) == 1
+    assert second == first
+    assert_equiv(qc, second)
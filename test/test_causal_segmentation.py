@@ -0,0 +1,132 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for segmenting circuits by the causal past of non-unitary and unsupported operations."""
+
+# pylint: disable=duplicate-code
+
+import random
+
+import pyzx as zx
+
+from qiskit.circuit import QuantumCircuit
+from qiskit.circuit.random import random_circuit
+from qiskit.transpiler import PassManager
+import qiskit.converters
+
+from zxpass import ZXPass
+from zxpass.segments import _causal_split, _split_at_non_unitary
+
+from ._helpers import assert_equiv
+
+
+def test_causal_split() -> None:
+    """Only gates in a barrier's causal past are placed before it."""
+    ops = [
+        ("a", {0, 1}, False),
+        ("b", {2}, False),
+        ("c", {1}, False),
+        ("x", {1}, True),
+        ("d", {2, 3}, False),
+        ("e", {0}, False),
+    ]
+    assert _causal_split(ops) == [["a", "c"], "x", ["b", "d", "e"]]
+    assert _causal_split([("x", {0}, True), ("a", {0}, False)]) == ["x", ["a"]]
+    assert _causal_split(ops, causal=False) == [["a", "b", "c"], "x", ["d", "e"]]
+
+
+def test_unsupported_op_keeps_unrelated_gates_together() -> None:
+    """Gates on qubits an unsupported operation does not touch stay in one segment across it."""
+    qc = QuantumCircuit(3)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.ryy(0.3, 1, 2)
+    qc.cx(0, 1)
+    qc.h(0)
+
+    circuits_and_nodes = ZXPass(causal_segmentation=True)._dag_to_circuits_and_nodes(  # pylint: disable=protected-access
+        qiskit.converters.circuit_to_dag(qc)
+    )
+    assert [type(part).__name__ for part in circuits_and_nodes] == ["Circuit", "DAGOpNode", "Circuit"]
+
+    qc = QuantumCircuit(3)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.barrier(2)
+    qc.cx(0, 1)
+    qc.h(0)
+    result = PassManager(ZXPass(causal_segmentation=True)).run(qc)
+    assert result.count_ops().get("cx", 0) == 0
+    assert_equiv(qc, result)
+
+
+def test_measurement_keeps_unrelated_gates_together() -> None:
+    """A measurement only cuts the unitary gates in its causal past."""
+    c = zx.Circuit(3, bit_amount=1)
+    c.add_gate("CNOT", 1, 2)
+    c.add_gate("HAD", 0)
+    c.add_gate(zx.gates.Measurement(0, result_bit=0))
+    c.add_gate("CNOT", 1, 2)
+
+    parts = _split_at_non_unitary(c, causal=True)
+    assert len(parts) == 3
+    assert isinstance(parts[0], zx.Circuit) and [str(g) for g in parts[0].gates] == ["HAD(0)"]
+    assert isinstance(parts[1], zx.gates.Measurement)
+    assert isinstance(parts[2], zx.Circuit)
+    assert [str(g) for g in parts[2].gates] == ["CNOT(1,2)", "CNOT(1,2)"]
+
+
+def test_random_partial_barriers() -> None:
+    """Circuits with barriers and unsupported operations on random subsets of qubits stay equivalent."""
+    rng = random.Random(1234)
+    for seed in range(10):
+        qc = QuantumCircuit(4)
+        for _ in range(4):
+            qc.compose(random_circuit(4, 2, max_operands=2, seed=seed * 10 + rng.randint(0, 9)), inplace=True)
+            qubits = rng.sample(range(4), 2)
+            if rng.random() < 0.5:
+                qc.barrier(qubits)
+            else:
+                qc.ryy(0.7, *qubits)
+        assert_equiv(qc, PassManager(ZXPass(causal_segmentation=True)).run(qc))
+
+
+def test_default_segmentation() -> None:
+    """By default, a measurement or an unsupported operation ends the segment on all qubits."""
+    c = zx.Circuit(3, bit_amount=1)
+    c.add_gate("CNOT", 1, 2)
+    c.add_gate("HAD", 0)
+    c.add_gate(zx.gates.Measurement(0, result_bit=0))
+    c.add_gate("CNOT", 1, 2)
+
+    parts = _split_at_non_unitary(c)
+    assert len(parts) == 3
+    assert isinstance(parts[0], zx.Circuit) and [str(g) for g in parts[0].gates] == ["CNOT(1,2)", "HAD(0)"]
+    assert isinstance(parts[2], zx.Circuit) and [str(g) for g in parts[2].gates] == ["CNOT(1,2)"]
+
+    qc = QuantumCircuit(3)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.cx(1, 2)
+    qc.ryy(0.3, 1, 2)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.h(0)
+    dag = qiskit.converters.circuit_to_dag(qc)
+    default = ZXPass()._dag_to_circuits_and_nodes(dag)  # pylint: disable=protected-access
+    causal = ZXPass(causal_segmentation=True)._dag_to_circuits_and_nodes(dag)  # pylint: disable=protected-access
+    assert [str(g) for g in default[0].gates] == ["HAD(0)", "CNOT(0,1)", "HAD(0)", "CNOT(1,2)"]
+    assert [str(g) for g in causal[0].gates] == ["HAD(0)", "CNOT(0,1)", "CNOT(1,2)"]
+    assert_equiv(qc, PassManager(ZXPass()).run(qc))
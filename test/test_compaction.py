@@ -0,0 +1,147 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for splitting unitary segments into independent components and compacting them to their qubits."""
+
+# pylint: disable=duplicate-code
+
+from fractions import Fraction
+
+import pyzx as zx
+
+from qiskit.circuit import QuantumCircuit
+from qiskit.transpiler import PassManager
+
+from zxpass import ZXPass, SegmentCache
+from zxpass.cache import segment_fingerprint
+from zxpass.compaction import canonical_form, _expand, _split_components
+
+from ._helpers import assert_equiv
+
+
+def test_canonical_form_and_expand() -> None:
+    """A sparse segment is restricted to its active qubits and expanded back to the same gates."""
+    c = zx.Circuit(10)
+    c.add_gate("HAD", 7)
+    c.add_gate("CNOT", 7, 2)
+    c.add_gate("TOF", 2, 7, 5)
+    c.add_gate("RZZ", 5, 2, phase=Fraction(1, 4))
+    c.add_gate("ZPhase", 5, phase=Fraction(1, 8))
+
+    compacted, labels = canonical_form(c, reorder=False)
+    assert labels == [7, 2, 5]
+    assert compacted.qubits == 3
+    assert str(compacted.gates[1]) == "CNOT(0,1)"
+
+    expanded = _expand(compacted, labels, c.qubits)
+    assert expanded.qubits == c.qubits
+    assert segment_fingerprint(expanded) == segment_fingerprint(c)
+
+
+def test_canonical_form() -> None:
+    """Segments that differ only by qubit labels or the order of commuting gates share a canonical form."""
+
+    def segment(a: int, b: int, c: int, swap: bool) -> zx.Circuit:
+        circuit = zx.Circuit(6)
+        gates = [("HAD", a), ("T", c)]
+        for name, qubit in reversed(gates) if swap else gates:
+            circuit.add_gate(name, qubit)
+        circuit.add_gate("CNOT", a, b)
+        circuit.add_gate("CZ", c, a)
+        return circuit
+
+    first, labels = canonical_form(segment(0, 1, 2, False))
+    assert labels == [0, 2, 1]
+    for a, b, c, swap in ((5, 3, 1, False), (2, 0, 4, True)):
+        other, other_labels = canonical_form(segment(a, b, c, swap))
+        assert other_labels == [a, c, b]
+        assert segment_fingerprint(other) == segment_fingerprint(first)
+        expanded = _expand(other, other_labels, 6)
+        assert [str(gate) for gate in expanded.gates] == [f"HAD({a})", f"T({c})", f"CNOT({a},{b})", f"CZ({c},{a})"]
+
+    ordered = zx.Circuit(2)
+    ordered.add_gate("HAD", 0)
+    ordered.add_gate("CNOT", 0, 1)
+    assert canonical_form(ordered) == (ordered, [0, 1])
+
+
+def test_relabelled_segments_share_cache_entries() -> None:
+    """The same gates on qubits in a different order share a cache entry."""
+    cache = SegmentCache()
+    for control, target in ((0, 1), (5, 2)):
+        qc = QuantumCircuit(6)
+        qc.h(control)
+        qc.cx(control, target)
+        qc.cx(control, target)
+        qc.t(target)
+        result = PassManager(ZXPass(cache=cache)).run(qc)
+        assert_equiv(qc, result)
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_compacted_segments_share_cache_entries() -> None:
+    """The same gates on different qubits share a cache entry, mapped onto each set of qubits."""
+    cache = SegmentCache()
+    for control, target in ((0, 1), (4, 5)):
+        qc = QuantumCircuit(6)
+        qc.h(control)
+        qc.cx(control, target)
+        qc.cx(control, target)
+        qc.t(target)
+        result = PassManager(ZXPass(cache=cache)).run(qc)
+        assert_equiv(qc, result)
+        assert result.size() < qc.size()
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_split_components() -> None:
+    """Gates are grouped by the connected components of the qubit-interaction graph."""
+    c = zx.Circuit(6)
+    c.add_gate("HAD", 3)
+    c.add_gate("CNOT", 0, 1)
+    c.add_gate("CNOT", 3, 4)
+    c.add_gate("CZ", 1, 5)
+    c.add_gate("T", 2)
+
+    components = _split_components(c)
+    assert [[str(gate) for gate in part.gates] for part in components] == [
+        ["HAD(3)", "CNOT(3,4)"],
+        ["CNOT(0,1)", "CZ(1,5)"],
+        ["T(2)"],
+    ]
+    assert all(part.qubits == c.qubits for part in components)
+
+    connected = zx.Circuit(3)
+    connected.add_gate("CNOT", 0, 1)
+    connected.add_gate("CNOT", 1, 2)
+    assert _split_components(connected) == [connected]
+
+
+def test_components_optimised_separately() -> None:
+    """A segment made of non-interacting registers is optimised correctly, register by register."""
+    qc = QuantumCircuit(6)
+    for control, target in ((0, 1), (2, 3), (4, 5)):
+        qc.h(control)
+        qc.cx(control, target)
+        qc.cx(control, target)
+        qc.rz(0.3, target)
+    cache = SegmentCache()
+    result = PassManager(ZXPass(cache=cache)).run(qc)
+    # The three registers hold the same gates, so only one of them is optimised.
+    assert cache.stats()["misses"] == 1
+    assert_equiv(qc, result)
+    assert result.size() < qc.size()
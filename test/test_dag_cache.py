@@ -0,0 +1,168 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Tests for caching whole optimised DAGs."""
+
+# pylint: disable=duplicate-code
+
+import time
+
+import pytest
+
+from qiskit.circuit import Clbit, QuantumCircuit, QuantumRegister, ClassicalRegister, Parameter, Qubit
+from qiskit.circuit.library import XGate
+from qiskit.dagcircuit import DAGCircuit
+from qiskit.transpiler import PassManager
+import qiskit.converters
+
+from zxpass import ZXPass, DAGCache
+from zxpass.cache import dag_fingerprint
+
+from ._helpers import assert_equiv
+
+
+def _circuit(angle: float = 0.3, name: str = "q") -> QuantumCircuit:
+    qc = QuantumCircuit(QuantumRegister(3, name))
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.rz(angle, 1)
+    qc.cx(0, 1)
+    qc.h(0)
+    qc.ccx(0, 1, 2)
+    return qc
+
+
+def _dag(qc: QuantumCircuit) -> DAGCircuit:
+    return qiskit.converters.circuit_to_dag(qc)
+
+
+def test_fingerprint() -> None:
+    """DAGs built the same way share a fingerprint; differing operations or registers do not."""
+    assert dag_fingerprint(_dag(_circuit())) == dag_fingerprint(_dag(_circuit()))
+    assert dag_fingerprint(_dag(_circuit())) != dag_fingerprint(_dag(_circuit(angle=0.4)))
+    assert dag_fingerprint(_dag(_circuit())) != dag_fingerprint(_dag(_circuit(name="r")))
+    swapped = _circuit()
+    swapped.cx(1, 0)
+    unswapped = _circuit()
+    unswapped.cx(0, 1)
+    assert dag_fingerprint(_dag(swapped)) != dag_fingerprint(_dag(unswapped))
+
+    def conditional(value: int) -> QuantumCircuit:
+        qc = QuantumCircuit(QuantumRegister(1, "q"), ClassicalRegister(1, "c"))
+        with qc.if_test((qc.cregs[0], value)):  # pylint: disable=not-context-manager
+            qc.x(0)
+        return qc
+
+    assert dag_fingerprint(_dag(conditional(0))) == dag_fingerprint(_dag(conditional(0)))
+    assert dag_fingerprint(_dag(conditional(0))) != dag_fingerprint(_dag(conditional(1)))
+
+
+def test_repeated_transpile_hits() -> None:
+    """A repeated transpile is served from the cache, with the same result and properties."""
+    cache = DAGCache()
+    zxpass = ZXPass(dag_cache=cache, phase_mode="dyadic", phase_precision=4)
+    first = PassManager(zxpass).run(_circuit())
+    first_error = zxpass.property_set["zxpass_max_phase_error"]
+    assert cache.stats() == {"hits": 0, "misses": 1, "evictions": 0, "expirations": 0, "size": 1}
+
+    zxpass = ZXPass(dag_cache=cache, phase_mode="dyadic", phase_precision=4)
+    second = PassManager(zxpass).run(_circuit())
+    assert cache.stats()["hits"] == 1
+    assert cache.hit_rate == 0.5
+    assert zxpass.property_set["zxpass_max_phase_error"] == first_error > 0
+    assert second == first
+    assert_equiv(_circuit(), second)
+
+
+def test_cached_dags_are_copies() -> None:
+    """Modifying a DAG returned by the pass does not affect later hits."""
+    cache = DAGCache()
+    zxpass = ZXPass(dag_cache=cache)
+    result = zxpass.run(_dag(_circuit()))
+    expected = result.count_ops()
+    result.apply_operation_back(XGate(), (result.qubits[0],))
+    assert zxpass.run(_dag(_circuit())).count_ops() == expected
+
+
+def test_hit_uses_the_input_bits() -> None:
+    """A hit for a DAG on bits outside any register acts on that DAG's bits, not the cached DAG's."""
+
+    def loose() -> QuantumCircuit:
+        qc = QuantumCircuit([Qubit(), Qubit()], [Clbit()])
+        qc.h(0)
+        qc.cx(0, 1)
+        qc.cx(0, 1)
+        qc.t(1)
+        qc.measure(1, 0)
+        return qc
+
+    cache = DAGCache()
+    first = ZXPass(dag_cache=cache).run(_dag(loose()))
+    dag = _dag(loose())
+    second = ZXPass(dag_cache=cache).run(dag)
+    assert cache.stats()["hits"] == 1
+    assert second.qubits == dag.qubits and second.clbits == dag.clbits
+    assert second.qubits != first.qubits
+    assert [(node.op.name, [dag.find_bit(q).index for q in node.qargs]) for node in second.topological_op_nodes()] == [
+        (node.op.name, [first.find_bit(q).index for q in node.qargs]) for node in first.topological_op_nodes()
+    ]
+
+
+def test_keyed_by_settings() -> None:
+    """Passes with different settings do not share entries, and custom optimisers bypass the cache."""
+    cache = DAGCache()
+    ZXPass(dag_cache=cache).run(_dag(_circuit()))
+    ZXPass(dag_cache=cache, strategy="basic").run(_dag(_circuit()))
+    assert cache.stats()["hits"] == 0
+    assert len(cache) == 2
+
+    ZXPass(lambda c: c, dag_cache=cache).run(_dag(_circuit()))
+    assert cache.stats()["hits"] + cache.stats()["misses"] == 2
+
+
+def test_eviction_and_expiry() -> None:
+    """Entries are evicted once the cache is full and expire after the TTL."""
+    cache = DAGCache(maxsize=1)
+    ZXPass(dag_cache=cache).run(_dag(_circuit()))
+    ZXPass(dag_cache=cache).run(_dag(_circuit(angle=0.4)))
+    assert cache.stats()["evictions"] == 1
+    assert len(cache) == 1
+
+    cache = DAGCache(ttl=0.05)
+    ZXPass(dag_cache=cache).run(_dag(_circuit()))
+    time.sleep(0.1)
+    ZXPass(dag_cache=cache).run(_dag(_circuit()))
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["hits"] == 0
+    assert len(cache) == 1
+
+    with pytest.raises(ValueError):
+        DAGCache(maxsize=0)
+    with pytest.raises(ValueError):
+        DAGCache(ttl=0)
+
+
+def test_fingerprint_of_parameters() -> None:
+    """Parameterised DAGs share a fingerprint only if they use the very same parameters."""
+    theta = Parameter("θ")
+
+    def parameterised(param: Parameter) -> QuantumCircuit:
+        qc = QuantumCircuit(1)
+        qc.rz(2 * param + 0.3, 0)
+        return qc
+
+    assert dag_fingerprint(_dag(parameterised(theta))) == dag_fingerprint(_dag(parameterised(theta)))
+    assert dag_fingerprint(_dag(parameterised(theta))) != dag_fingerprint(_dag(parameterised(Parameter("θ"))))
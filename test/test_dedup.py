@@ -0,0 +1,103 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for optimising repeated blocks of gates only once."""
+
+# pylint: disable=duplicate-code
+
+from pathlib import Path
+
+import pyzx as zx
+
+from qiskit.circuit import QuantumCircuit
+from qiskit.transpiler import PassManager
+
+from zxpass import PersistentSegmentCache, SegmentCache, ZXPass
+from zxpass.segments import _repeat_period
+
+from ._helpers import assert_equiv
+
+
+def _trotter_circuit(steps: int) -> QuantumCircuit:
+    """Build a Trotterised Ising evolution, which repeats the same layer ``steps`` times."""
+    qc = QuantumCircuit(4)
+    for _ in range(steps):
+        qc.h(0)
+        for q in range(3):
+            qc.cx(q, q + 1)
+            qc.rz(0.3, q + 1)
+            qc.cx(q, q + 1)
+        for q in range(4):
+            qc.h(q)
+            qc.rz(0.2, q)
+            qc.h(q)
+        qc.h(0)
+    return qc
+
+
+def test_repeat_period() -> None:
+    """The period is the shortest block the circuit repeats at least twice, possibly ending part-way."""
+    c = zx.Circuit(2)
+    for _ in range(3):
+        c.add_gate("HAD", 0)
+        c.add_gate("CNOT", 0, 1)
+        c.add_gate("T", 1)
+    assert _repeat_period(c) == 3
+    c.add_gate("HAD", 0)
+    assert _repeat_period(c) == 3
+    c.add_gate("HAD", 1)
+    assert _repeat_period(c) is None
+    assert _repeat_period(zx.Circuit(1)) is None
+
+
+def test_identical_segments_optimised_once() -> None:
+    """Identical segments in one batch share a single optimisation."""
+    qc = QuantumCircuit(2)
+    for _ in range(4):
+        qc.h(0)
+        qc.cx(0, 1)
+        qc.cx(0, 1)
+        qc.t(1)
+        qc.barrier()
+    cache = SegmentCache()
+    result = PassManager(ZXPass(cache=cache)).run(qc)
+    assert_equiv(qc, result)
+    assert result.count_ops().get("cx", 0) == 0
+    assert cache.stats()["misses"] == 1
+
+
+def test_identical_rzz_components(tmp_path: Path) -> None:
+    """Identical components containing RZZ gates, whose copy method fails in PyZX, share a cached result."""
+    qc = QuantumCircuit(4)
+    qc.rzz(0.3, 0, 1)
+    qc.rzz(0.3, 2, 3)
+    cache = PersistentSegmentCache(tmp_path)
+    first = PassManager(ZXPass(persistent_cache=cache)).run(qc)
+    second = PassManager(ZXPass(persistent_cache=cache)).run(qc)
+    assert second == first
+    assert_equiv(qc, second)
+
+
+def test_detect_repeats() -> None:
+    """A periodic circuit is optimised one layer at a time, with each distinct window optimised once."""
+    qc = _trotter_circuit(8)
+    cache = SegmentCache()
+    result = PassManager(ZXPass(cache=cache, detect_repeats=True)).run(qc)
+    assert_equiv(qc, result)
+    assert result.size() <= qc.size()
+    assert cache.stats()["misses"] < 8
+
+    windowed = PassManager(ZXPass(detect_repeats=True, window_size=40)).run(qc)
+    assert_equiv(qc, windowed)
@@ -0,0 +1,80 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the direct conversion of PyZX circuits to ZX-graphs."""
+
+# pylint: disable=duplicate-code
+
+import random
+from fractions import Fraction
+from typing import Any
+
+import pyzx as zx
+
+from zxpass.graph import circuit_to_graph
+from zxpass.zxpass import qiskit_gate_table
+
+
+def _structure(g: Any) -> tuple:
+    """Return everything about a graph that simplification and extraction can observe."""
+    vertices = list(g.vertices())
+    return (
+        vertices,
+        [(g.type(v), g.qubit(v), g.row(v), g.phase(v)) for v in vertices],
+        [(v, list(g.neighbors(v)), [g.edge_type(g.edge(v, w)) for w in g.neighbors(v)]) for v in vertices],
+        g.inputs(),
+        g.outputs(),
+        g.scalar.power2,
+        g.scalar.phase,
+    )
+
+
+def _random_circuit(seed: int) -> zx.Circuit:
+    """Build a random circuit using every gate type the pass converts to PyZX."""
+    rng = random.Random(seed)
+    gate_types = [entry[0] for entry in qiskit_gate_table.values()]
+    c = zx.Circuit(5)
+    for _ in range(100):
+        gate_type = rng.choice(gate_types)
+        entry = next(entry for entry in qiskit_gate_table.values() if entry[0] is gate_type)
+        qubits = rng.sample(range(5), entry[2])
+        phases = [Fraction(rng.randrange(16), 8) for _ in range(entry[3])]
+        c.add_gate(gate_type(*qubits, *phases))  # type: ignore[call-arg]
+    return c
+
+
+def test_graph_matches_pyzx() -> None:
+    """The graph is the one PyZX builds, down to the order of vertices and neighbours."""
+    for seed in range(10):
+        c = _random_circuit(seed)
+        assert _structure(circuit_to_graph(c)) == _structure(c.to_graph())
+
+
+def test_graph_idle_and_empty() -> None:
+    """Idle qubits and empty circuits give the same graph as PyZX."""
+    c = zx.Circuit(3)
+    c.add_gate("CNOT", 0, 2)
+    assert _structure(circuit_to_graph(c)) == _structure(c.to_graph())
+    empty = zx.Circuit(2)
+    assert _structure(circuit_to_graph(empty)) == _structure(empty.to_graph())
+
+
+def test_graph_extracts_identically() -> None:
+    """Simplifying and extracting the graph gives the same circuit as with PyZX's graph."""
+    c = _random_circuit(42)
+    ours, theirs = circuit_to_graph(c), c.to_graph()
+    zx.simplify.full_reduce(ours)
+    zx.simplify.full_reduce(theirs)
+    assert zx.extract.extract_circuit(ours).gates == zx.extract.extract_circuit(theirs).gates
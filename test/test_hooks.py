@@ -0,0 +1,138 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the hooks called around the stages of a run."""
+
+# pylint: disable=duplicate-code
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+import pyzx as zx
+from qiskit.transpiler import PassManager
+
+from zxpass import ChromeTraceHook, CProfileHook, PassHook, ZXPass
+
+from ._helpers import assert_equiv, two_segment_circuit
+
+
+class _RecordingHook(PassHook):
+    """Records every callback, in order."""
+
+    def __init__(self) -> None:
+        self.calls: List[Tuple[Any, ...]] = []
+
+    def on_segment_start(self, segment: int, circuit: zx.Circuit) -> None:
+        self.calls.append(("segment_start", segment, len(circuit.gates)))
+
+    def on_stage_start(self, stage: str, segment: Optional[int]) -> None:
+        self.calls.append(("stage_start", stage, segment))
+
+    def on_stage_end(
+        self, stage: str, segment: Optional[int], elapsed: float, graph_stats: Optional[Dict[str, int]]
+    ) -> None:
+        assert elapsed >= 0
+        self.calls.append(("stage_end", stage, segment, graph_stats))
+
+    def on_segment_end(self, segment: int, circuit: zx.Circuit, elapsed: float) -> None:
+        assert elapsed >= 0
+        self.calls.append(("segment_end", segment, len(circuit.gates)))
+
+
+def test_hook_calls() -> None:
+    """Stages of the run and of each segment's pipeline are reported as they run."""
+    qc = two_segment_circuit()
+    hook = _RecordingHook()
+    result = PassManager(ZXPass(hook=hook)).run(qc)
+    assert_equiv(qc, result)
+
+    run_stages = [call[1] for call in hook.calls if call[0] == "stage_end" and call[2] is None]
+    assert run_stages == ["convert", "optimize", "recover"]
+    assert [call for call in hook.calls if call[0] in ("segment_start", "segment_end")] == [
+        ("segment_start", 0, 4),
+        ("segment_end", 0, 2),
+        ("segment_start", 1, 2),
+        ("segment_end", 1, 2),
+    ]
+    first = hook.calls.index(("segment_start", 0, 4))
+    assert [call[:3] for call in hook.calls[first + 1 : first + 9]] == [
+        ("stage_start", "to_graph", 0),
+        ("stage_end", "to_graph", 0),
+        ("stage_start", "simplify", 0),
+        ("stage_end", "simplify", 0),
+        ("stage_start", "extract", 0),
+        ("stage_end", "extract", 0),
+        ("stage_start", "basic_optimization", 0),
+        ("stage_end", "basic_optimization", 0),
+    ]
+    graph_stats = {call[1]: call[3] for call in hook.calls if call[0] == "stage_end" and call[2] == 0}
+    assert graph_stats["to_graph"]["vertices"] > 0 and graph_stats["simplify"]["edges"] > 0
+    assert graph_stats["extract"] is None
+
+
+def test_hook_replays_executor_segments() -> None:
+    """Segments optimised on an executor are reported once their results are back, without stage starts."""
+    hook = _RecordingHook()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        PassManager(ZXPass(hook=hook, executor=executor, portfolio=("basic", "full_reduce"))).run(two_segment_circuit())
+    assert not [call for call in hook.calls if call[0] == "stage_start" and call[2] is not None]
+    starts = [call[1] for call in hook.calls if call[0] == "segment_start"]
+    ends = [call[1] for call in hook.calls if call[0] == "segment_end"]
+    assert starts == ends == [0, 1, 2, 3]
+    assert {call[1] for call in hook.calls if call[0] == "stage_end" and call[2] is not None} >= {
+        "simplify",
+        "basic_optimization",
+    }
+
+
+def test_chrome_trace_hook(tmp_path: Path) -> None:
+    """The Chrome trace hook writes complete events for the stages of the run and of each segment."""
+    path = tmp_path / "trace.json"
+    hook = ChromeTraceHook(str(path))
+    PassManager(ZXPass(hook=hook)).run(two_segment_circuit())
+    hook.save()
+
+    events = json.loads(path.read_text(encoding="utf-8"))["traceEvents"]
+    complete = [event for event in events if event["ph"] == "X"]
+    assert {"convert", "optimize", "recover", "to_graph", "simplify", "extract", "segment"} <= {
+        event["name"] for event in complete
+    }
+    assert all(event["dur"] >= 0 for event in complete)
+    segments = [event for event in complete if event["name"] == "segment"]
+    assert [(event["args"]["gates_in"], event["args"]["gates_out"]) for event in segments] == [(4, 2), (2, 2)]
+    for segment in segments:
+        for event in complete:
+            if event["tid"] == segment["tid"] and event is not segment:
+                assert segment["ts"] <= event["ts"] + 1e-3
+                assert event["ts"] + event["dur"] <= segment["ts"] + segment["dur"] + 1e-3
+
+    hook.clear()
+    assert not hook.trace()["traceEvents"]
+    with pytest.raises(ValueError):
+        ChromeTraceHook().save()
+
+
+def test_cprofile_hook() -> None:
+    """The cProfile hook profiles each kind of stage separately."""
+    hook = CProfileHook()
+    PassManager(ZXPass(hook=hook)).run(two_segment_circuit())
+    assert {"convert", "to_graph", "simplify", "extract", "recover"} <= set(hook.profiles)
+    assert hook.stats("simplify").total_calls > 0  # type: ignore[attr-defined]
+    assert hook.stats().total_calls >= hook.stats("simplify").total_calls  # type: ignore[attr-defined]
+    with pytest.raises(ValueError):
+        hook.stats("optimize")
@@ -27,7 +27,7 @@ from qiskit.transpiler import PassManager
 import qiskit.converters
 
 from zxpass import ZXPass
-from zxpass.zxpass import (
+from zxpass.segments import (
     _optimize_unitary,
     _permutation_to_swaps,
     compute_output_permutation,
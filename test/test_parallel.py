@@ -0,0 +1,106 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for optimising segments on an executor (``workers`` / ``executor``)."""
+
+# pylint: disable=duplicate-code
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from qiskit.circuit import QuantumCircuit, QuantumRegister, ClassicalRegister
+from qiskit.transpiler import PassManager
+import qiskit.converters
+
+from zxpass import ZXPass
+
+from ._helpers import assert_equiv
+
+
+def _hybrid_circuit() -> QuantumCircuit:
+    """Build a circuit with several reducible unitary segments separated by measurements and resets."""
+    q = QuantumRegister(3, "q")
+    c = ClassicalRegister(1, "c")
+    qc = QuantumCircuit(q, c)
+    for i in range(4):
+        qc.h(q[i % 3])
+        qc.cx(q[0], q[1])
+        qc.cx(q[1], q[2])
+        qc.cx(q[1], q[2])
+        qc.rz(0.1 * (i + 1), q[2])
+        qc.cx(q[0], q[1])
+        qc.cx(q[0], q[2])
+        qc.measure(q[i % 3], c[0])
+        qc.reset(q[i % 3])
+    qc.swap(q[0], q[2])
+    qc.barrier()
+    qc.t(q[0])
+    qc.cx(q[0], q[1])
+    qc.cx(q[0], q[1])
+    return qc
+
+
+def _op_list(qc: QuantumCircuit) -> list:
+    dag = qiskit.converters.circuit_to_dag(qc)
+    return [(node.op.name, node.op.params, node.qargs, node.cargs) for node in dag.topological_op_nodes()]
+
+
+def test_workers_match_serial() -> None:
+    """Optimising with a process pool gives exactly the serial result."""
+    qc = _hybrid_circuit()
+    serial = PassManager(ZXPass()).run(qc)
+    parallel = PassManager(ZXPass(workers=2)).run(qc)
+
+    assert _op_list(parallel) == _op_list(serial)
+    assert parallel.size() < qc.size()
+
+
+def test_injected_executor() -> None:
+    """An injected executor is used for segments and left running for the caller."""
+    qc = _hybrid_circuit()
+    serial = PassManager(ZXPass()).run(qc)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        zxpass = ZXPass(executor=executor)
+        first = PassManager(zxpass).run(qc)
+        # The executor must still be usable after the run.
+        second = PassManager(zxpass).run(qc)
+
+    assert _op_list(first) == _op_list(serial)
+    assert _op_list(second) == _op_list(serial)
+
+
+def test_injected_executor_custom_optimize() -> None:
+    """A custom ``optimize`` callback is mapped over whole circuits on the executor."""
+    qc = QuantumCircuit(2)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.barrier()
+    qc.cx(0, 1)
+    qc.h(1)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        result = PassManager(ZXPass(lambda circ: circ.to_basic_gates(), executor=executor)).run(qc)
+
+    assert_equiv(qc, result)
+
+
+def test_invalid_worker_arguments() -> None:
+    """``workers`` must be positive and cannot be combined with ``executor``."""
+    with pytest.raises(ValueError):
+        ZXPass(workers=0)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with pytest.raises(ValueError):
+            ZXPass(workers=2, executor=executor)
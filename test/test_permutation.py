@@ -20,7 +20,7 @@ from typing import Any
 import pyzx as zx
 import pytest
 
-from zxpass.zxpass import compute_output_permutation, _permutation_to_swaps
+from zxpass.segments import compute_output_permutation, _permutation_to_swaps
 
 
 def test_compute_output_permutation() -> None:
@@ -0,0 +1,80 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for converting gate angles to PyZX phases (``phase_mode``)."""
+
+# pylint: disable=duplicate-code
+
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from qiskit.circuit import QuantumCircuit
+from qiskit.quantum_info import Operator
+from qiskit.transpiler import PassManager
+
+from zxpass import ZXPass
+from zxpass.zxpass import phase_modes
+
+
+def test_phase_modes() -> None:
+    """Each mode bounds the denominator of the phase it returns."""
+    phase = 0.1234 / np.pi
+    assert phase_modes["exact"](phase, 4) == Fraction(phase)
+    assert phase_modes["limit_denominator"](phase, 4).denominator <= 16
+    assert phase_modes["dyadic"](phase, 4) == Fraction(round(phase * 16), 16)
+    assert phase_modes["dyadic"](0.5, 4) == Fraction(1, 2)
+
+
+def test_max_phase_error_reported() -> None:
+    """The largest change to any angle is recorded, and the result stays close to the original."""
+    qc = QuantumCircuit(2)
+    qc.h(0)
+    qc.rz(0.1, 0)
+    qc.cx(0, 1)
+    qc.crx(1.2345, 0, 1)
+    exact = ZXPass()
+    PassManager(exact).run(qc)
+    assert exact.property_set["zxpass_max_phase_error"] < 1e-12
+
+    for mode, bound in (("limit_denominator", np.pi / 2**8), ("dyadic", np.pi / 2**9)):
+        zxpass = ZXPass(phase_mode=mode, phase_precision=8)
+        result = PassManager(zxpass).run(qc)
+        error = zxpass.property_set["zxpass_max_phase_error"]
+        assert 0 < error <= bound
+        assert Operator(result).equiv(Operator(qc), atol=1e-2)
+
+
+def test_quantised_phases_cancel() -> None:
+    """Angles that only cancel up to floating-point error cancel exactly once snapped to a dyadic grid."""
+    qc = QuantumCircuit(1)
+    qc.h(0)
+    qc.rz(0.1, 0)
+    qc.rz(0.2, 0)
+    qc.rz(-0.3, 0)
+    qc.h(0)
+    exact = PassManager(ZXPass()).run(qc)
+    dyadic = PassManager(ZXPass(phase_mode="dyadic")).run(qc)
+    assert exact.count_ops().get("rz", 0) == 1
+    assert dyadic.size() == 0
+
+
+def test_invalid_phase_arguments() -> None:
+    """``phase_mode`` must be a known mode and ``phase_precision`` positive."""
+    with pytest.raises(ValueError):
+        ZXPass(phase_mode="round")
+    with pytest.raises(ValueError):
+        ZXPass(phase_mode="dyadic", phase_precision=0)
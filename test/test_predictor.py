@@ -0,0 +1,158 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the benefit predictor that screens segments before optimisation."""
+
+# pylint: disable=duplicate-code
+
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+
+import pytest
+import pyzx as zx
+
+from qiskit.circuit import QuantumCircuit
+from qiskit.circuit.random import random_circuit
+from qiskit.transpiler import PassManager
+
+from zxpass import BenefitPredictor, ZXPass
+from zxpass.predictor import segment_features
+
+from ._helpers import assert_equiv
+
+
+def test_segment_features() -> None:
+    """Features count two-qubit and Clifford gates, and adjacent pairs that merge or cancel."""
+    c = zx.Circuit(3)
+    c.add_gate("HAD", 0)
+    c.add_gate("CNOT", 0, 1)
+    c.add_gate("CNOT", 0, 1)
+    c.add_gate("ZPhase", 2, phase=Fraction(1, 3))
+    c.add_gate("T", 2)
+    c.add_gate("CZ", 1, 2)
+    c.add_gate("CZ", 2, 1)
+    c.add_gate("CNOT", 1, 0)
+    features = segment_features(c)
+    assert features["gates"] == 8
+    assert features["two_qubit_density"] == 5 / 8
+    assert features["clifford_fraction"] == 6 / 8
+    assert features["mergeable_pairs"] == 3
+
+    apart = zx.Circuit(2)
+    apart.add_gate("CNOT", 0, 1)
+    apart.add_gate("HAD", 1)
+    apart.add_gate("CNOT", 0, 1)
+    assert segment_features(apart)["mergeable_pairs"] == 0
+
+
+def test_clifford_phases() -> None:
+    """A phase that is a multiple of pi/2 is Clifford on single-qubit and ZZ-type phase gates, not controlled ones."""
+    c = zx.Circuit(2)
+    c.add_gate("ZPhase", 0, phase=Fraction(1, 2))
+    c.add_gate("XPhase", 1, phase=Fraction(3, 2))
+    c.add_gate("RZZ", 0, 1, phase=Fraction(1, 2))
+    c.add_gate("CPhase", 0, 1, phase=Fraction(1, 2))
+    c.add_gate("CRZ", 0, 1, phase=Fraction(1))
+    c.add_gate("ZPhase", 0, phase=Fraction(1, 4))
+    assert segment_features(c)["clifford_fraction"] == 3 / 6
+
+
+def test_screen() -> None:
+    """Short segments are skipped, mergeable ones attempted, and similar segments that never improve skipped."""
+    predictor = BenefitPredictor(min_history=2, min_success_rate=0.5, audit_every=None)
+    single = zx.Circuit(1)
+    single.add_gate("HAD", 0)
+    assert predictor.screen(single) == (False, False)
+
+    cancelling = zx.Circuit(1)
+    cancelling.add_gate("HAD", 0)
+    cancelling.add_gate("HAD", 0)
+    assert predictor.screen(cancelling) == (True, False)
+
+    stuck = zx.Circuit(2)
+    stuck.add_gate("HAD", 0)
+    stuck.add_gate("CNOT", 0, 1)
+    for _ in range(2):
+        assert predictor.screen(stuck) == (True, False)
+        predictor.record(stuck, False)
+    assert predictor.screen(stuck) == (False, False)
+    assert predictor.stats() == {"attempted": 3, "improved": 0, "skipped": 2, "audited": 0, "missed": 0}
+
+    predictor.clear()
+    assert predictor.screen(stuck) == (True, False)
+
+
+def test_audit() -> None:
+    """Every ``audit_every``-th rejected segment is optimised anyway, and counted as missed if it improves."""
+    predictor = BenefitPredictor(min_gates=3, audit_every=2)
+    c = zx.Circuit(2)
+    c.add_gate("HAD", 0)
+    c.add_gate("CNOT", 0, 1)
+    assert predictor.screen(c) == (False, False)
+    assert predictor.screen(c) == (True, True)
+    predictor.record(c, True, audit=True)
+    assert predictor.stats() == {"attempted": 0, "improved": 0, "skipped": 2, "audited": 1, "missed": 1}
+
+
+def test_invalid_thresholds() -> None:
+    """Out-of-range thresholds are rejected."""
+    with pytest.raises(ValueError):
+        BenefitPredictor(min_gates=0)
+    with pytest.raises(ValueError):
+        BenefitPredictor(max_two_qubit_density=1.5)
+    with pytest.raises(ValueError):
+        BenefitPredictor(audit_every=0)
+
+
+def test_pass_with_predictor() -> None:
+    """The pass stays correct with a predictor, and records how it screened the segments of each run."""
+    predictor = BenefitPredictor()
+    for seed in range(10):
+        qc = random_circuit(4, 6, max_operands=2, seed=seed)
+        pass_manager = PassManager(ZXPass(predictor=predictor))
+        assert_equiv(qc, pass_manager.run(qc))
+
+    qc = QuantumCircuit(2)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.cx(0, 1)
+    qc.barrier()
+    qc.t(1)
+    zx_pass = ZXPass(predictor=BenefitPredictor(audit_every=None))
+    result = PassManager(zx_pass).run(qc)
+    assert_equiv(qc, result)
+    assert result.count_ops().get("cx", 0) == 0
+    stats = zx_pass.property_set["zxpass_predictor_stats"]
+    assert stats["attempted"] == 1
+    assert stats["skipped"] == 1
+    assert stats["improved"] == 1
+
+
+def test_improvements_counted_across_processes() -> None:
+    """Segments optimised in another process are counted as improved only if their gates changed."""
+    qc = QuantumCircuit(2)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.barrier()
+    qc.h(1)
+    qc.cx(0, 1)
+    qc.cx(0, 1)
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        zx_pass = ZXPass(predictor=BenefitPredictor(audit_every=None), executor=executor)
+        result = PassManager(zx_pass).run(qc)
+    assert_equiv(qc, result)
+    stats = zx_pass.property_set["zxpass_predictor_stats"]
+    assert stats["attempted"] == 2
+    assert stats["improved"] == 1
@@ -0,0 +1,85 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Tests for the recovery of Qiskit gates from optimised PyZX circuits."""
+
+# pylint: disable=duplicate-code
+
+import numpy as np
+from qiskit.circuit import QuantumCircuit
+import qiskit.converters
+
+from zxpass import ZXPass
+from zxpass.zxpass import _recovery_table
+
+
+def _gate_zoo() -> QuantumCircuit:
+    qc = QuantumCircuit(4)
+    qc.x(0)
+    qc.z(1)
+    qc.s(2)
+    qc.t(3)
+    qc.sdg(0)
+    qc.tdg(1)
+    qc.sx(2)
+    qc.sxdg(3)
+    qc.h(0)
+    qc.y(1)
+    qc.rz(np.pi / 8, 2)
+    qc.rx(np.pi / 3, 3)
+    qc.ry(np.pi / 5, 0)
+    qc.cx(0, 1)
+    qc.cz(1, 2)
+    qc.cy(2, 3)
+    qc.ch(3, 0)
+    qc.crz(np.pi / 4, 0, 2)
+    qc.cswap(0, 1, 3)
+    qc.ccx(3, 2, 1)
+    qc.ccz(0, 2, 3)
+    qc.swap(1, 3)
+    return qc
+
+
+def test_recovery_round_trip() -> None:
+    """Test that every kind of unitary gate is recovered with the same name, parameters and qubits."""
+    qc = _gate_zoo()
+    dag = qiskit.converters.circuit_to_dag(qc)
+    result = ZXPass(optimize=lambda circ: circ).run(dag)
+    original = [(node.op.name, node.op.params, node.qargs) for node in dag.topological_op_nodes()]
+    recovered = [(node.op.name, node.op.params, node.qargs) for node in result.topological_op_nodes()]
+    assert len(recovered) == len(original)
+    for (name, params, qargs), (new_name, new_params, new_qargs) in zip(original, recovered):
+        assert new_name == name
+        assert new_qargs == qargs
+        assert np.allclose([float(p) for p in new_params], [float(p) for p in params])
+
+
+def test_parameterless_gates_share_instances() -> None:
+    """Test that parameterless gates are recovered as a shared instance, and parametrised gates are not."""
+    qc = QuantumCircuit(2)
+    qc.cx(0, 1)
+    qc.rz(np.pi / 8, 0)
+    qc.cx(1, 0)
+    qc.rz(np.pi / 4, 1)
+    dag = qiskit.converters.circuit_to_dag(qc)
+    result = ZXPass(optimize=lambda circ: circ).run(dag)
+    cxs = [node.op for node in result.topological_op_nodes() if node.op.name == "cx"]
+    rzs = [node.op for node in result.topological_op_nodes() if node.op.name == "rz"]
+    assert len(cxs) == 2 and len(rzs) == 2
+    assert cxs[0] is cxs[1]
+    assert any(instance is cxs[0] for _, instance, _, _ in _recovery_table.values())
+    assert rzs[0] is not rzs[1]
+    assert rzs[0].params != rzs[1].params
@@ -0,0 +1,83 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the per-run statistics recorded in ``property_set["zxpass_stats"]``."""
+
+# pylint: disable=duplicate-code
+
+from concurrent.futures import ThreadPoolExecutor
+
+from qiskit.converters import circuit_to_dag
+from qiskit.transpiler import PassManager
+
+from zxpass import DAGCache, ZXPass
+
+from ._helpers import assert_equiv, two_segment_circuit
+
+
+def test_stats() -> None:
+    """A run records its stages, its gate counts and the statistics of every segment."""
+    qc = two_segment_circuit()
+    zx_pass = ZXPass(collect_stats=True)
+    result = PassManager(zx_pass).run(qc)
+    assert_equiv(qc, result)
+
+    stats = zx_pass.property_set["zxpass_stats"]
+    assert set(stats["stages"]) == {"convert", "optimize", "recover"}
+    assert stats["time"] >= sum(stats["stages"].values())
+    assert stats["gates_in"] == circuit_to_dag(qc).size()
+    assert stats["gates_out"] == circuit_to_dag(result).size()
+    assert stats["recovery"] in ("spliced", "rebuilt")
+
+    improved, discarded = stats["segments"]
+    assert improved["strategy"] == "full_reduce"
+    assert improved["gates_in"] == 4 and improved["gates_out"] == 2
+    assert not improved["discarded"]
+    assert discarded["gates_in"] == discarded["gates_out"] == 2
+    assert discarded["discarded"]
+    for segment in stats["segments"]:
+        assert segment["qubits"] == 2
+        assert segment["vertices_before"] > 0 and segment["edges_before"] > 0
+        assert {"to_graph_time", "simplify_time", "extract_time"} <= set(segment)
+        assert segment["time"] >= segment["simplify_time"]
+
+
+def test_stats_disabled() -> None:
+    """No statistics are recorded unless asked for."""
+    zx_pass = ZXPass()
+    PassManager(zx_pass).run(two_segment_circuit())
+    assert "zxpass_stats" not in zx_pass.property_set
+
+
+def test_stats_with_caches_and_portfolio() -> None:
+    """Cache hits and the strategies of a portfolio are recorded, also with an executor."""
+    dag_cache = DAGCache()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for hit in (False, True):
+            zx_pass = ZXPass(
+                collect_stats=True, dag_cache=dag_cache, executor=executor, portfolio=("basic", "full_reduce")
+            )
+            PassManager(zx_pass).run(two_segment_circuit())
+            stats = zx_pass.property_set["zxpass_stats"]
+            assert stats["dag_cache_hit"] is hit
+            if not hit:
+                assert sorted(segment["strategy"] for segment in stats["segments"]) == [
+                    "basic",
+                    "basic",
+                    "full_reduce",
+                    "full_reduce",
+                ]
+            else:
+                assert not stats["segments"]
@@ -0,0 +1,134 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the optimisation strategies and the plugin's optimization-level tiers."""
+
+# pylint: disable=duplicate-code
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+import pyzx as zx
+
+from qiskit.circuit import QuantumCircuit
+from qiskit.circuit.random import random_circuit
+from qiskit.transpiler import PassManager
+
+from zxpass import ZXPass
+from zxpass.plugin import ZXPlugin
+from zxpass.segments import _race_strategies, costs, strategies
+
+from ._helpers import assert_equiv
+
+
+def _reducible_circuit() -> QuantumCircuit:
+    qc = QuantumCircuit(3)
+    qc.h(0)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.t(1)
+    qc.cx(0, 1)
+    qc.cx(1, 2)
+    qc.s(2)
+    qc.cx(1, 2)
+    qc.cx(0, 2)
+    qc.cx(0, 2)
+    return qc
+
+
+@pytest.mark.parametrize("strategy", sorted(strategies))
+def test_strategies_preserve_equivalence(strategy: str) -> None:
+    """Every strategy produces an equivalent circuit that is no larger than the original."""
+    np.random.seed(1234)
+    for _ in range(10):
+        qc = random_circuit(np.random.randint(2, 6), np.random.randint(5, 15), seed=np.random.randint(1 << 16))
+        result = PassManager(ZXPass(strategy=strategy)).run(qc)
+        assert_equiv(qc, result)
+        assert result.size() <= qc.size()
+
+    qc = _reducible_circuit()
+    result = PassManager(ZXPass(strategy=strategy)).run(qc)
+    assert_equiv(qc, result)
+    assert result.size() < qc.size()
+
+
+def test_unknown_strategy() -> None:
+    """An unknown strategy name is rejected."""
+    with pytest.raises(ValueError):
+        ZXPass(strategy="no_such_strategy")
+
+
+@pytest.mark.parametrize("cost", sorted(costs))
+def test_portfolio_keeps_best(cost: str) -> None:
+    """A portfolio's result is equivalent and at least as cheap as that of each of its strategies."""
+    np.random.seed(4321)
+    portfolio = ("basic", "teleport", "full_reduce")
+    for _ in range(5):
+        qc = random_circuit(np.random.randint(2, 6), np.random.randint(5, 15), seed=np.random.randint(1 << 16))
+        result = PassManager(ZXPass(portfolio=portfolio, portfolio_cost=cost)).run(qc)
+        assert_equiv(qc, result)
+        if cost == "gates":
+            assert result.size() <= min(PassManager(ZXPass(strategy=s)).run(qc).size() for s in portfolio)
+
+    qc = _reducible_circuit()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        result = PassManager(ZXPass(portfolio=portfolio, portfolio_cost=cost, executor=executor)).run(qc)
+    assert_equiv(qc, result)
+    assert result.size() < qc.size()
+
+
+def test_portfolio_deadline() -> None:
+    """Segments for which no strategy finishes before the deadline are left unchanged and reported."""
+    c = zx.Circuit(2)
+    c.add_gate("HAD", 0)
+    c.add_gate("HAD", 0)
+    timed_out: list = []
+    deadline = time.monotonic() - 1
+    result = _race_strategies([c], ("basic", "full_reduce"), costs["gates"], deadline=deadline, timed_out=timed_out)
+    assert result == [c]
+    assert timed_out == [0]
+
+    timed_out.clear()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        result = _race_strategies([c], ("basic",), costs["gates"], executor, timed_out=timed_out)
+    assert not result[0].gates
+    assert not timed_out
+
+
+def test_unknown_portfolio() -> None:
+    """Unknown portfolio strategies and costs are rejected."""
+    with pytest.raises(ValueError):
+        ZXPass(portfolio=("basic", "no_such_strategy"))
+    with pytest.raises(ValueError):
+        ZXPass(portfolio=("basic",), portfolio_cost="no_such_cost")
+
+
+@pytest.mark.parametrize(
+    "level, strategy", [(0, "basic"), (1, "clifford"), (2, "full_reduce"), (3, "full_reduce"), (None, "full_reduce")]
+)
+def test_plugin_levels(level: int, strategy: str) -> None:
+    """Each optimization level runs ZXPass with the matching strategy."""
+    qc = _reducible_circuit()
+    pass_manager = ZXPlugin().pass_manager(None, optimization_level=level)  # type: ignore[arg-type]
+    expected = PassManager(ZXPass(strategy=strategy)).run(qc)
+    assert pass_manager.run(qc) == expected
+
+
+def test_plugin_unsupported_level() -> None:
+    """Optimization levels beyond 3 are rejected."""
+    with pytest.raises(ValueError):
+        ZXPlugin().pass_manager(None, optimization_level=4)  # type: ignore[arg-type]
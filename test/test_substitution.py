@@ -0,0 +1,107 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Tests for splicing optimised segments into the original DAG in place."""
+
+# pylint: disable=duplicate-code
+
+import pyzx as zx
+
+from qiskit.circuit import QuantumCircuit
+import qiskit.converters
+
+from zxpass import ZXPass
+
+from ._helpers import assert_equiv
+
+
+def _irreducible(qc: QuantumCircuit) -> None:
+    """Append gates on qubits 1 to 3 that the default optimiser cannot shorten."""
+    for _ in range(4):
+        qc.t(1)
+        qc.h(1)
+        qc.cx(1, 2)
+        qc.t(2)
+        qc.h(2)
+        qc.cx(2, 3)
+        qc.t(3)
+        qc.h(3)
+
+
+def test_changed_segment_spliced_in_place() -> None:
+    """Only the segment that improved is replaced, in the DAG that was passed in."""
+    qc = QuantumCircuit(4)
+    qc.h(0)
+    qc.h(0)
+    qc.ryy(0.3, 0, 1)
+    _irreducible(qc)
+
+    dag = qiskit.converters.circuit_to_dag(qc)
+    result = ZXPass().run(dag)
+    assert result is dag
+    assert result.count_ops() == {"t": 12, "h": 12, "cx": 8, "ryy": 1}
+    assert_equiv(qc, qiskit.converters.dag_to_circuit(result))
+
+
+def test_unchanged_dag_untouched() -> None:
+    """A DAG none of whose segments improve is returned as it was."""
+    qc = QuantumCircuit(4)
+    qc.ryy(0.3, 0, 1)
+    _irreducible(qc)
+
+    dag = qiskit.converters.circuit_to_dag(qc)
+    before = [(node.op.name, node.qargs) for node in dag.topological_op_nodes()]
+    result = ZXPass().run(dag)
+    assert result is dag
+    assert [(node.op.name, node.qargs) for node in result.topological_op_nodes()] == before
+
+
+def test_measurement_segment_spliced() -> None:
+    """Segments containing measurements are spliced together with their classical bits."""
+    qc = QuantumCircuit(4, 1)
+    qc.h(0)
+    qc.h(0)
+    qc.x(0)
+    qc.measure(0, 0)
+    qc.ryy(0.3, 0, 1)
+    _irreducible(qc)
+
+    dag = qiskit.converters.circuit_to_dag(qc)
+    result = ZXPass().run(dag)
+    assert result is dag
+    assert result.count_ops() == {"t": 12, "h": 12, "cx": 8, "ryy": 1, "x": 1, "measure": 1}
+    names = [node.op.name for node in result.topological_op_nodes() if node.qargs[0] == result.qubits[0]]
+    assert names == ["x", "measure", "ryy"]
+
+
+def test_segment_on_other_qubits_rebuilt() -> None:
+    """An optimised segment acting on qubits outside its nodes is handled by rebuilding the DAG."""
+
+    def add_idle_gates(c: zx.Circuit) -> zx.Circuit:
+        c = c.copy()
+        c.add_gate("HAD", c.qubits - 1)
+        c.add_gate("HAD", c.qubits - 1)
+        return c
+
+    qc = QuantumCircuit(3)
+    qc.h(0)
+    qc.ryy(0.3, 0, 1)
+    qc.h(1)
+    dag = qiskit.converters.circuit_to_dag(qc)
+    result = ZXPass(add_idle_gates).run(dag)
+    assert result is not dag
+    assert result.count_ops()["h"] == 6
+    assert_equiv(qc, qiskit.converters.dag_to_circuit(result))
@@ -0,0 +1,133 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Tests for carrying parameterised angles through the pass as symbolic phases."""
+
+# pylint: disable=duplicate-code
+
+from fractions import Fraction
+from typing import Dict
+
+import numpy as np
+from pyzx.symbolic import new_var
+
+from qiskit.circuit import QuantumCircuit, QuantumRegister, ClassicalRegister, Parameter, ParameterExpression
+from qiskit.quantum_info import Operator
+from qiskit.transpiler import PassManager
+import qiskit.converters
+
+from zxpass import ZXPass
+from zxpass.symbolic import parameter_to_phase, phase_to_parameter
+
+
+def _assert_equiv_when_bound(original: QuantumCircuit, optimized: QuantumCircuit) -> None:
+    """Assert that two parameterised circuits have the same unitary for several bindings of their parameters."""
+    rng = np.random.default_rng(1234)
+    for _ in range(3):
+        values = {param: rng.uniform(-np.pi, np.pi) for param in original.parameters}
+        assert Operator(original.assign_parameters(values)).equiv(
+            Operator(optimized.assign_parameters(values, strict=False))
+        )
+
+
+def test_phase_round_trip() -> None:
+    """Linear expressions convert to polynomials in units of pi and back; others are rejected."""
+    theta, phi = Parameter("θ"), Parameter("φ")
+    parameters: Dict[str, Parameter] = {}
+    phase = parameter_to_phase(2 * theta - phi / 3 + np.pi / 4, lambda angle: Fraction(angle / np.pi), parameters)
+    assert phase is not None
+    theta_var, phi_var = new_var("θ", is_bool=False), new_var("φ", is_bool=False)
+    assert phase == theta_var * 2 - phi_var * Fraction(1, 3) + Fraction(1, 4)
+    assert set(parameters) == {"θ", "φ"}
+    angle = phase_to_parameter(phase, parameters)
+    assert isinstance(angle, ParameterExpression)
+    assert "**" not in str(angle)
+    single = parameter_to_phase(2 * theta, lambda angle: Fraction(angle / np.pi), parameters)
+    assert single is not None
+    assert str(phase_to_parameter(single, parameters)) == "2*θ"
+    values = {theta: 0.7, phi: -1.1}
+    assert np.isclose(float(angle.bind(values)), 2 * 0.7 + 1.1 / 3 + np.pi / 4)
+
+    assert parameter_to_phase(theta * phi, lambda angle: Fraction(angle / np.pi), {}) is None
+    assert parameter_to_phase(theta.sin(), lambda angle: Fraction(angle / np.pi), {}) is None
+
+
+def test_symbolic_phases_merge() -> None:
+    """Rotations by parameterised angles are merged like numeric ones, and stay parameterised."""
+    theta = Parameter("θ")
+    qc = QuantumCircuit(2)
+    qc.h(0)
+    qc.rz(theta, 0)
+    qc.cx(0, 1)
+    qc.cx(0, 1)
+    qc.rz(2 * theta, 0)
+    qc.h(0)
+
+    result = PassManager(ZXPass()).run(qc)
+    assert result.size() < qc.size()
+    assert result.parameters == qc.parameters
+    _assert_equiv_when_bound(qc, result)
+
+
+def test_every_parameterised_gate() -> None:
+    """Every kind of parameterised gate survives the pass with its parameters."""
+    theta, phi = Parameter("θ"), Parameter("φ")
+    qc = QuantumCircuit(3)
+    qc.rx(theta, 0)
+    qc.ry(phi + 0.5, 1)
+    qc.rz(2 * theta, 2)
+    qc.p(-phi, 0)
+    qc.crz(theta, 0, 1)
+    qc.crx(phi, 1, 2)
+    qc.cry(theta - phi, 2, 0)
+    qc.cp(theta / 2, 0, 2)
+    qc.rxx(phi, 0, 1)
+    qc.rzz(theta, 1, 2)
+    qc.u(theta, phi, 0.3, 0)
+    qc.cu(theta, 0.1, phi, 0.2, 1, 2)
+    qc.h(1)
+    qc.cx(0, 1)
+    for strategy in ("basic", "clifford", "full_reduce"):
+        _assert_equiv_when_bound(qc, PassManager(ZXPass(strategy=strategy)).run(qc))
+
+
+def test_nonlinear_expressions_left_alone() -> None:
+    """Gates whose angles are not linear in their parameters are kept as they are."""
+    theta, phi = Parameter("θ"), Parameter("φ")
+    qc = QuantumCircuit(2)
+    qc.h(0)
+    qc.h(0)
+    qc.rz(theta * phi, 1)
+    qc.rx(theta.sin(), 0)
+    result = PassManager(ZXPass()).run(qc)
+    assert result.count_ops() == {"rz": 1, "rx": 1}
+    _assert_equiv_when_bound(qc, result)
+
+
+def test_symbolic_conditional() -> None:
+    """A conditional rotation by a parameterised angle round-trips."""
+    theta = Parameter("θ")
+    q = QuantumRegister(1, "q")
+    c = ClassicalRegister(1, "c")
+    qc = QuantumCircuit(q, c)
+    qc.measure(0, 0)
+    with qc.if_test((c, 1)):  # pylint: disable=not-context-manager
+        qc.rz(theta, 0)
+
+    result = ZXPass(optimize=lambda circ: circ).run(qiskit.converters.circuit_to_dag(qc))
+    if_ops = [node.op for node in result.topological_op_nodes() if node.op.name == "if_else"]
+    assert len(if_ops) == 1
+    assert if_ops[0].blocks[0].data[0].operation.params == [theta]
@@ -0,0 +1,136 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Tests for reusing optimised structural templates across circuits that differ only in their angles."""
+
+# pylint: disable=duplicate-code
+
+import numpy as np
+
+from qiskit.circuit import QuantumCircuit, Parameter, Qubit
+from qiskit.quantum_info import Operator
+from qiskit.transpiler import PassManager
+import qiskit.converters
+
+from zxpass import ZXPass, DAGCache
+from zxpass.cache import dag_fingerprint
+from zxpass.zxpass import _is_template_angle
+
+from ._helpers import assert_equiv
+
+
+def _ansatz(angles: np.ndarray, fixed: float = np.pi / 4, loose: bool = False) -> QuantumCircuit:
+    qc = QuantumCircuit([Qubit() for _ in range(3)]) if loose else QuantumCircuit(3)
+    for layer in range(2):
+        for q in range(3):
+            qc.rz(angles[3 * layer + q], q)
+            qc.rz(angles[3 * layer + q] / 2, q)
+            qc.sx(q)
+            qc.rz(fixed, q)
+        qc.cx(0, 1)
+        qc.cx(1, 2)
+        qc.cx(0, 1)
+    return qc
+
+
+def test_fingerprint_ignores_template_angles() -> None:
+    """Only angles that are not multiples of pi/4 are left out of the structural fingerprint."""
+    rng = np.random.default_rng(1)
+    first = qiskit.converters.circuit_to_dag(_ansatz(rng.uniform(-3, 3, 6)))
+    second = qiskit.converters.circuit_to_dag(_ansatz(rng.uniform(-3, 3, 6)))
+    clifford = qiskit.converters.circuit_to_dag(_ansatz(rng.uniform(-3, 3, 6), fixed=np.pi / 2))
+    assert dag_fingerprint(first) != dag_fingerprint(second)
+    assert dag_fingerprint(first, _is_template_angle) == dag_fingerprint(second, _is_template_angle)
+    assert dag_fingerprint(first, _is_template_angle) != dag_fingerprint(clifford, _is_template_angle)
+
+
+def test_template_reused() -> None:
+    """Circuits with the same structure are bound to one optimised template, and stay equivalent."""
+    rng = np.random.default_rng(2)
+    cache = DAGCache()
+    results = []
+    for _ in range(3):
+        qc = _ansatz(rng.uniform(-3, 3, 6))
+        result = PassManager(ZXPass(template_cache=cache)).run(qc)
+        assert_equiv(qc, result)
+        assert not result.parameters
+        results.append(result)
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"] == 2
+    assert len({result.size() for result in results}) == 1
+    assert results[0].size() < _ansatz(np.zeros(6)).size()
+
+
+def test_different_structure_misses() -> None:
+    """A change of structure, including of a multiple of pi/4, gets its own template."""
+    rng = np.random.default_rng(3)
+    cache = DAGCache()
+    for qc in (_ansatz(rng.uniform(-3, 3, 6)), _ansatz(rng.uniform(-3, 3, 6), fixed=np.pi / 2)):
+        assert_equiv(qc, PassManager(ZXPass(template_cache=cache)).run(qc))
+    qc = _ansatz(rng.uniform(-3, 3, 6))
+    qc.h(2)
+    assert_equiv(qc, PassManager(ZXPass(template_cache=cache)).run(qc))
+    assert cache.stats()["hits"] == 0
+    assert len(cache) == 3
+
+
+def test_template_with_parameters() -> None:
+    """User parameters are kept alongside the angles bound from the template."""
+    theta = Parameter("θ")
+    rng = np.random.default_rng(4)
+    cache = DAGCache()
+    for _ in range(2):
+        qc = _ansatz(rng.uniform(-3, 3, 6))
+        qc.rz(theta, 0)
+        qc.rx(2 * theta + 0.3, 1)
+        result = PassManager(ZXPass(template_cache=cache)).run(qc)
+        assert result.parameters == qc.parameters
+        for value in (0.2, -1.3):
+            assert Operator(qc.assign_parameters({theta: value})).equiv(
+                Operator(result.assign_parameters({theta: value}))
+            )
+    assert cache.stats()["hits"] == 1
+
+
+def test_template_hit_uses_the_input_bits() -> None:
+    """A DAG bound to a cached template acts on its own bits, even outside any register."""
+    rng = np.random.default_rng(5)
+    cache = DAGCache()
+    for _ in range(2):
+        qc = _ansatz(rng.uniform(-3, 3, 6), loose=True)
+        dag = qiskit.converters.circuit_to_dag(qc)
+        result = ZXPass(template_cache=cache).run(dag)
+        assert result.qubits == dag.qubits
+        assert_equiv(qc, qiskit.converters.dag_to_circuit(result))
+    assert cache.stats()["hits"] == 1
+
+
+def test_template_phase_mode() -> None:
+    """The angles bound to a template are converted according to the phase mode, as without a template."""
+    rng = np.random.default_rng(6)
+    cache = DAGCache()
+    for _ in range(2):
+        qc = _ansatz(rng.uniform(-3, 3, 6))
+        zxpass = ZXPass(template_cache=cache, phase_mode="dyadic", phase_precision=3)
+        result = PassManager(zxpass).run(qc)
+        direct = ZXPass(phase_mode="dyadic", phase_precision=3)
+        PassManager(direct).run(qc)
+        assert np.isclose(zxpass.property_set["zxpass_max_phase_error"], direct.property_set["zxpass_max_phase_error"])
+        for instruction in result.data:
+            for param in instruction.operation.params:
+                eighths = float(param) * 8 / np.pi
+                assert np.isclose(eighths, round(eighths))
+    assert cache.stats()["hits"] == 1
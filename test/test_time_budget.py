@@ -0,0 +1,138 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the ``time_budget`` and ``segment_time_budget`` options of ``ZXPass``."""
+
+# pylint: disable=duplicate-code
+
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+import time
+from typing import Optional
+
+import numpy as np
+import pytest
+import pyzx as zx
+
+from qiskit.circuit import QuantumCircuit
+from qiskit.transpiler import PassManager
+import qiskit.converters
+
+from zxpass import ZXPass, SegmentCache
+
+from ._helpers import assert_equiv
+
+
+def _two_segment_circuit() -> QuantumCircuit:
+    qc = QuantumCircuit(3)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.cx(1, 2)
+    qc.cx(1, 2)
+    qc.t(2)
+    qc.barrier()
+    qc.cx(0, 1)
+    qc.cx(0, 1)
+    qc.h(2)
+    return qc
+
+
+def test_generous_budget_matches_unbudgeted() -> None:
+    """A budget that is never reached changes nothing and records no timeouts."""
+    qc = _two_segment_circuit()
+    dag = qiskit.converters.circuit_to_dag(qc)
+    expected = ZXPass().run(dag)
+
+    zxpass = ZXPass(time_budget=60.0, segment_time_budget=60.0)
+    result = zxpass.run(qiskit.converters.circuit_to_dag(qc))
+
+    assert result == expected
+    assert not zxpass.property_set["zxpass_timed_out_segments"]
+
+
+def test_exhausted_segment_budget_keeps_original() -> None:
+    """Segments that exceed their budget are left unoptimised and recorded."""
+    qc = _two_segment_circuit()
+    dag = qiskit.converters.circuit_to_dag(qc)
+    cache = SegmentCache()
+
+    zxpass = ZXPass(segment_time_budget=1e-9, cache=cache)
+    result = zxpass.run(dag)
+
+    assert zxpass.property_set["zxpass_timed_out_segments"] == [0, 1]
+    assert result.size() == dag.size()
+    assert_equiv(qc, qiskit.converters.dag_to_circuit(result))
+    # Unoptimised fallbacks must not be cached as if they were optimised.
+    assert len(cache) == 0
+
+
+def test_deadline_with_executor_keeps_finished_segments() -> None:
+    """With an executor, the pass stops waiting at the deadline and keeps segments that finished."""
+    qc = _two_segment_circuit()
+
+    def optimize(circ: zx.Circuit) -> zx.Circuit:
+        # The second segment (starting with CNOT) is too slow for the budget.
+        if type(circ.gates[0]).__name__ == "CNOT":
+            time.sleep(2.0)
+        return zx.optimize.basic_optimization(circ.to_basic_gates())
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        zxpass = ZXPass(optimize, executor=executor, time_budget=0.5)
+        start = time.monotonic()
+        result = zxpass.run(qiskit.converters.circuit_to_dag(qc))
+        elapsed = time.monotonic() - start
+
+    assert elapsed < 1.5
+    assert zxpass.property_set["zxpass_timed_out_segments"] == [1]
+    assert_equiv(qc, qiskit.converters.dag_to_circuit(result))
+
+
+def _slow_circuit() -> QuantumCircuit:
+    """Build a random Clifford+T circuit that takes PyZX tens of seconds to simplify and extract."""
+    rng = np.random.default_rng(0)
+    qc = QuantumCircuit(30)
+    for _ in range(2000):
+        kind = rng.integers(0, 3)
+        a, b = (int(q) for q in rng.choice(30, 2, replace=False))
+        if kind == 0:
+            qc.cx(a, b)
+        elif kind == 1:
+            qc.h(a)
+        else:
+            qc.t(a)
+    return qc
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_time_budget_bounds_wall_clock(workers: Optional[int]) -> None:
+    """The pass returns soon after the deadline even in the middle of a PyZX call, and leaves no worker running."""
+    qc = _slow_circuit()
+    zxpass = ZXPass(time_budget=1.0, workers=workers)
+    start = time.monotonic()
+    result = PassManager(zxpass).run(qc)
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 3.0
+    assert zxpass.property_set["zxpass_timed_out_segments"] == [0]
+    assert result.size() == qc.size()
+    assert not multiprocessing.active_children()
+
+
+def test_invalid_budgets() -> None:
+    """Budgets must be positive."""
+    with pytest.raises(ValueError):
+        ZXPass(time_budget=0)
+    with pytest.raises(ValueError):
+        ZXPass(segment_time_budget=-1.0)
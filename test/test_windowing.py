@@ -0,0 +1,96 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for sliding-window optimisation of long unitary segments (``window_size``)."""
+
+# pylint: disable=duplicate-code
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import pyzx as zx
+
+from qiskit.circuit import QuantumCircuit
+from qiskit.transpiler import PassManager
+import qiskit.converters
+
+from zxpass import ZXPass
+from zxpass.segments import _cut_windows
+
+from ._helpers import assert_equiv
+
+
+def _long_circuit() -> QuantumCircuit:
+    """Build a long, reducible unitary circuit on a few qubits."""
+    qc = QuantumCircuit(3)
+    for i in range(20):
+        qc.h(i % 3)
+        qc.cx(0, 1)
+        qc.cx(1, 2)
+        qc.cx(1, 2)
+        qc.t(2)
+        qc.cx(0, 1)
+        qc.rz(0.1 * (i + 1), 0)
+    return qc
+
+
+def test_cut_windows() -> None:
+    """Windows cover every gate in order, with the first window shortened by ``offset``."""
+    qc = _long_circuit()
+    c = ZXPass()._dag_to_circuits_and_nodes(  # pylint: disable=protected-access
+        qiskit.converters.circuit_to_dag(qc)
+    )[0]
+    assert isinstance(c, zx.Circuit)
+    for offset in (0, 3):
+        windows = _cut_windows(c, 8, offset)
+        assert [g for w in windows for g in w.gates] == c.gates
+        assert all(len(w.gates) <= 8 for w in windows)
+        assert all(w.qubits == c.qubits for w in windows)
+    assert len(_cut_windows(c, 8, 3)[0].gates) == 3
+
+
+def test_windowed_equivalence() -> None:
+    """Windowed optimisation preserves the circuit and does not make it longer."""
+    qc = _long_circuit()
+    result = PassManager(ZXPass(window_size=16)).run(qc)
+    assert_equiv(qc, result)
+    assert result.size() <= qc.size()
+
+
+def test_windowed_short_segments_unchanged() -> None:
+    """Segments no longer than the window are optimised as a whole, exactly as without windowing."""
+    qc = QuantumCircuit(2)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.cx(0, 1)
+    qc.t(1)
+    assert PassManager(ZXPass(window_size=64)).run(qc) == PassManager(ZXPass()).run(qc)
+
+
+def test_windowed_on_executor() -> None:
+    """Windows can be optimised on an executor, with the same result as serially."""
+    qc = _long_circuit()
+    serial = PassManager(ZXPass(window_size=16)).run(qc)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        parallel = PassManager(ZXPass(window_size=16, executor=executor)).run(qc)
+    assert parallel == serial
+
+
+def test_invalid_window_arguments() -> None:
+    """``window_size`` must be at least 2 and ``max_window_rounds`` at least 1."""
+    with pytest.raises(ValueError):
+        ZXPass(window_size=1)
+    with pytest.raises(ValueError):
+        ZXPass(window_size=8, max_window_rounds=0)
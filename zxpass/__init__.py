@@ -16,3 +16,6 @@
 """A transpiler pass for Qiskit which uses ZX-Calculus for circuit optimization, implemented using PyZX."""
 
 from .zxpass import ZXPass
+from .cache import SegmentCache, PersistentSegmentCache, DAGCache
+from .predictor import BenefitPredictor
+from .hooks import PassHook, ChromeTraceHook, CProfileHook
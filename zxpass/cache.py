@@ -0,0 +1,497 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Caches of optimised unitary segments, keyed by a fingerprint of the segment's gates, and of whole optimised DAGs."""
+
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Tuple, Union
+import copy
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+import pyzx as zx
+from pyzx.circuit.gates import Gate
+
+from qiskit.circuit import Instruction, ParameterExpression, QuantumCircuit
+from qiskit.dagcircuit import DAGCircuit
+
+# Attributes naming the qubits a PyZX gate acts on, in the order used by ``to_qasm``.
+_qubit_attrs = ("ctrl1", "ctrl2", "control", "target")
+
+
+def _remap_gate(gate: Gate, mask: Sequence[int]) -> Gate:
+    """Return a copy of ``gate`` acting on qubit ``mask[q]`` wherever it acted on qubit ``q``.
+
+    This is :meth:`Gate.reposition`, except that it also works for ``RZZ``, whose ``copy``
+    (inherited from ``ParityPhase``) fails in PyZX.
+    """
+    # A shallow copy of the attributes, as copy.copy makes, without its generic dispatch.
+    remapped = object.__new__(type(gate))
+    attrs = remapped.__dict__
+    attrs.update(gate.__dict__)
+    for attr in _qubit_attrs:
+        if attr in attrs:
+            attrs[attr] = mask[attrs[attr]]
+    if "targets" in attrs:
+        attrs["targets"] = tuple(mask[q] for q in attrs["targets"])
+    return remapped
+
+
+def _copy_circuit(c: zx.Circuit) -> zx.Circuit:
+    """Return a copy of ``c`` with copies of its gates.
+
+    This is :meth:`zx.Circuit.copy`, except that it also works for ``RZZ`` (see :func:`_remap_gate`).
+    """
+    copied = zx.Circuit(c.qubits, c.name, c.bits)
+    identity = range(c.qubits)
+    copied.gates = [_remap_gate(gate, identity) for gate in c.gates]
+    return copied
+
+
+def _gate_token(gate: Gate) -> str:
+    """Return a canonical string for a single gate: type, qubits, phases and adjoint flag."""
+    qubits = ",".join(str(getattr(gate, attr)) for attr in _qubit_attrs if hasattr(gate, attr))
+    if hasattr(gate, "phase"):
+        phases = str(gate.phase)
+    elif hasattr(gate, "phases"):
+        phases = ",".join(str(phase) for phase in gate.phases)
+    else:
+        phases = ""
+    adjoint = "*" if getattr(gate, "adjoint", False) else ""
+    return f"{type(gate).__name__}{adjoint}({qubits};{phases})"
+
+
+def segment_fingerprint(c: zx.Circuit) -> str:
+    """Return a hash identifying a PyZX circuit by its width and exact gate sequence.
+
+    Two circuits with the same fingerprint have the same number of qubits and the same
+    gates (type, qubits, phases and adjoint flag) in the same order, so an optimised
+    version of one can be reused for the other.
+    """
+    h = hashlib.sha256(str(c.qubits).encode())
+    for gate in c.gates:
+        h.update(b"|")
+        h.update(_gate_token(gate).encode())
+    return h.hexdigest()
+
+
+def _instruction_token(
+    op: Instruction,
+    qubits: Tuple[int, ...],
+    clbits: Tuple[int, ...],
+    ignore_param: Optional[Callable[[str, Any], bool]] = None,
+) -> str:
+    """Return a canonical string for a Qiskit operation on the given bit indices, including any control flow.
+
+    Parameters for which ``ignore_param(op.name, param)`` is true are replaced by ``_``.
+    """
+    params = ",".join(
+        "_" if ignore_param is not None and ignore_param(op.name, param) else _param_token(param)
+        for param in op.params
+    )
+    condition = getattr(op, "condition", None)
+    condition_token = "" if condition is None else f"?{condition!r}"
+    return f"{op.name}{qubits}{clbits}({params}){condition_token}"
+
+
+def _param_token(param: Any) -> str:
+    """Return a canonical string for a parameter of a Qiskit operation."""
+    if isinstance(param, QuantumCircuit):
+        return _circuit_token(param)
+    if isinstance(param, ParameterExpression):
+        # Parameters are identified by their UUIDs as well as their names, since a DAG served from a cache must
+        # contain the very parameters the caller will bind.
+        uuids = ",".join(str(parameter.uuid) for parameter in sorted(param.parameters, key=str))
+        return f"{param}[{uuids}]"
+    return repr(param)
+
+
+def _circuit_token(circuit: QuantumCircuit) -> str:
+    """Return a canonical string for the body of a control-flow operation."""
+    qubit_indices = {qubit: index for index, qubit in enumerate(circuit.qubits)}
+    clbit_indices = {clbit: index for index, clbit in enumerate(circuit.clbits)}
+    return ";".join(
+        _instruction_token(
+            instruction.operation,
+            tuple(qubit_indices[qubit] for qubit in instruction.qubits),
+            tuple(clbit_indices[clbit] for clbit in instruction.clbits),
+        )
+        for instruction in circuit.data
+    )
+
+
+def dag_fingerprint(dag: DAGCircuit, ignore_param: Optional[Callable[[str, Any], bool]] = None) -> str:
+    """Return a hash identifying a Qiskit DAG by its registers, global phase and operations.
+
+    Two DAGs with the same fingerprint have the same registers and numbers of bits, the same
+    global phase, and the same operations (name, bits, parameters, condition and control-flow
+    bodies) in the same topological order, so an optimised version of one can be reused for
+    the other.
+
+    :param dag: The DAG to fingerprint.
+    :param ignore_param: If given, a predicate on an operation's name and one of its parameters.
+        Top-level parameters it holds for are left out of the fingerprint, so DAGs differing only
+        in those parameters share a fingerprint.
+    """
+    qubit_indices = {qubit: index for index, qubit in enumerate(dag.qubits)}
+    clbit_indices = {clbit: index for index, clbit in enumerate(dag.clbits)}
+    h = hashlib.sha256(f"{dag.num_qubits()},{dag.num_clbits()},{dag.global_phase!r}".encode())
+    for register in (*dag.qregs.values(), *dag.cregs.values()):
+        h.update(f"|{type(register).__name__}:{register.name}:{register.size}".encode())
+    for node in dag.topological_op_nodes():
+        h.update(b"|")
+        h.update(
+            _instruction_token(
+                node.op,
+                tuple(qubit_indices[qubit] for qubit in node.qargs),
+                tuple(clbit_indices[clbit] for clbit in node.cargs),
+                ignore_param,
+            ).encode()
+        )
+    return h.hexdigest()
+
+
+
+def _onto_bits(cached: DAGCircuit, dag: DAGCircuit) -> DAGCircuit:
+    """Return a DAG served from a cache in place of ``dag``, acting on the bits of ``dag``.
+
+    Fingerprints identify bits by their index, so a hit for a DAG built on bits outside any register would
+    otherwise act on the bits of the DAG that was cached. The operations of ``cached`` are moved onto the bits of
+    ``dag`` with the same indices, along with any conditions on them. If the bits already match (e.g. if they all
+    belong to registers), ``cached`` itself is returned.
+    """
+    if cached.qubits == dag.qubits and cached.clbits == dag.clbits:
+        return cached
+    mapped = dag.copy_empty_like()
+    mapped.global_phase = 0
+    mapped.compose(cached, qubits=dag.qubits, clbits=dag.clbits)
+    return mapped
+
+class SegmentCache:
+    """A size-bounded, thread-safe LRU cache of optimised unitary segments.
+
+    A single instance may be shared between several :class:`~.ZXPass` instances. Cached
+    circuits are copied on the way in and out, so callers are free to modify them.
+
+    :param maxsize: The maximum number of segments to keep. Once full, the least recently
+        used segment is evicted.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        if maxsize < 1:
+            raise ValueError(f"Expected maxsize to be at least 1, got {maxsize}.")
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, zx.Circuit]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[zx.Circuit]:
+        """Return a copy of the circuit cached under ``key``, or ``None`` on a miss."""
+        with self._lock:
+            circuit = self._entries.get(key)
+            if circuit is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return _copy_circuit(circuit)
+
+    def put(self, key: str, circuit: zx.Circuit) -> None:
+        """Cache a copy of ``circuit`` under ``key``, evicting the least recently used entry if full."""
+        circuit = _copy_circuit(circuit)
+        with self._lock:
+            self._entries[key] = circuit
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all cached segments. The counters are left untouched."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return the hit, miss and eviction counters and the current number of entries."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+            }
+
+
+class PersistentSegmentCache:  # pylint: disable=too-many-instance-attributes
+    """An on-disk cache of optimised unitary segments, shared between processes and runs.
+
+    Segments are stored in an SQLite database in ``directory``, keyed by the cache key
+    together with the installed PyZX version, so that upgrading PyZX never serves results
+    computed by an older version. The database is opened in WAL mode and every operation
+    uses its own short-lived connection, so any number of worker processes on the same host
+    may share one directory. The number and total size of the entries are kept up to date by
+    triggers, so that a write only has to look for entries to evict once either size cap is
+    exceeded; the least recently used entries are then evicted. To keep hits from writing to
+    the database, an entry's time of last use is only updated on a hit at least
+    ``touch_interval`` seconds after the previous update, so the order of eviction is only
+    accurate to that interval.
+
+    Entries are stored with :mod:`pickle`, so only point this at a directory you trust.
+
+    :param directory: The directory holding the database. Created if it does not exist.
+    :param max_entries: The maximum number of segments to keep.
+    :param max_bytes: The maximum total size of the stored segments, in bytes.
+    :param timeout: How long to wait for a lock held by another process, in seconds.
+    :param touch_interval: The least time between updates of an entry's time of last use, in seconds.
+    """
+
+    filename = "segments.sqlite3"
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        directory: Union[str, os.PathLike],
+        max_entries: int = 100_000,
+        max_bytes: int = 256 * 1024 * 1024,
+        timeout: float = 30.0,
+        touch_interval: float = 60.0,
+    ):
+        if max_entries < 1:
+            raise ValueError(f"Expected max_entries to be at least 1, got {max_entries}.")
+        if max_bytes < 1:
+            raise ValueError(f"Expected max_bytes to be at least 1, got {max_bytes}.")
+        if touch_interval < 0:
+            raise ValueError(f"Expected touch_interval to be non-negative, got {touch_interval}.")
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, self.filename)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.touch_interval = touch_interval
+        self.version = zx.__version__
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+        with self._transaction() as conn:
+            # Create the tables and triggers at once, so that no process sees segments without their totals.
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS segments ("
+                "key TEXT NOT NULL, pyzx_version TEXT NOT NULL, data BLOB NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (key, pyzx_version))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS segments_last_used ON segments (last_used)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS totals ("
+                "id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL, bytes INTEGER NOT NULL)"
+            )
+            conn.execute("INSERT OR IGNORE INTO totals SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM segments")
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS segments_insert AFTER INSERT ON segments BEGIN "
+                "UPDATE totals SET entries = entries + 1, bytes = bytes + NEW.size; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS segments_update AFTER UPDATE OF size ON segments BEGIN "
+                "UPDATE totals SET bytes = bytes + NEW.size - OLD.size; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS segments_delete AFTER DELETE ON segments BEGIN "
+                "UPDATE totals SET entries = entries - 1, bytes = bytes - OLD.size; END"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Yield a fresh connection, committing on success and closing it afterwards."""
+        with closing(self._connect()) as conn:
+            with conn:
+                yield conn
+
+    def get(self, key: str) -> Optional[zx.Circuit]:
+        """Return the circuit stored under ``key`` for this PyZX version, or ``None`` on a miss."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT data, last_used FROM segments WHERE key = ? AND pyzx_version = ?", (key, self.version)
+            ).fetchone()
+        now = time.time()
+        if row is not None and now - row[1] >= self.touch_interval:
+            with self._transaction() as conn:
+                conn.execute(
+                    "UPDATE segments SET last_used = ? WHERE key = ? AND pyzx_version = ?", (now, key, self.version)
+                )
+        circuit: Optional[zx.Circuit] = None
+        if row is not None:
+            try:
+                circuit = pickle.loads(row[0])
+            except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError, ValueError):
+                # Unreadable entry (e.g. written by an incompatible build): drop it.
+                self.discard(key)
+        if circuit is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return circuit
+
+    def put(self, key: str, circuit: zx.Circuit) -> None:
+        """Store ``circuit`` under ``key``, then evict least recently used entries over either cap."""
+        data = pickle.dumps(circuit, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO segments (key, pyzx_version, data, size, last_used) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (key, pyzx_version) DO UPDATE SET "
+                "data = excluded.data, size = excluded.size, last_used = excluded.last_used",
+                (key, self.version, data, len(data), time.time()),
+            )
+            entries, total_bytes = conn.execute("SELECT entries, bytes FROM totals").fetchone()
+            if entries > self.max_entries or total_bytes > self.max_bytes:
+                self.evictions += self._evict(conn, entries, total_bytes)
+
+    def _evict(self, conn: sqlite3.Connection, entries: int, total_bytes: int) -> int:
+        """Delete the least recently used entries until both caps are met, returning how many were deleted."""
+        victims = []
+        with closing(conn.execute("SELECT rowid, size FROM segments ORDER BY last_used, rowid")) as rows:
+            for rowid, size in rows:
+                if entries <= self.max_entries and total_bytes <= self.max_bytes:
+                    break
+                victims.append((rowid,))
+                entries -= 1
+                total_bytes -= size
+        conn.executemany("DELETE FROM segments WHERE rowid = ?", victims)
+        return len(victims)
+
+    def discard(self, key: str) -> None:
+        """Remove the entry stored under ``key`` for this PyZX version, if any."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM segments WHERE key = ? AND pyzx_version = ?", (key, self.version))
+
+    def clear(self) -> None:
+        """Remove all stored segments, for every PyZX version. The counters are left untouched."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM segments")
+
+    def __len__(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT entries FROM totals").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        """Return this instance's hit, miss and eviction counters and the database's current size."""
+        with closing(self._connect()) as conn:
+            size, total_bytes = conn.execute("SELECT entries, bytes FROM totals").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": size,
+            "bytes": total_bytes,
+        }
+
+
+class DAGCache:  # pylint: disable=too-many-instance-attributes
+    """A size-bounded, thread-safe LRU cache of whole optimised DAGs, whose entries may expire.
+
+    A single instance may be shared between several :class:`~.ZXPass` instances. DAGs are
+    copied on the way in and out, so callers are free to modify them. Each entry also holds
+    the ``property_set`` entries the pass recorded when it produced the DAG.
+
+    :param maxsize: The maximum number of DAGs to keep. Once full, the least recently used DAG
+        is evicted.
+    :param ttl: How long an entry may be served after it was stored, in seconds. Entries never
+        expire if not given.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = None):
+        if maxsize < 1:
+            raise ValueError(f"Expected maxsize to be at least 1, got {maxsize}.")
+        if ttl is not None and ttl <= 0:
+            raise ValueError(f"Expected ttl to be positive, got {ttl}.")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, DAGCircuit, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Tuple[DAGCircuit, Dict[str, Any]]]:
+        """Return a copy of the DAG cached under ``key`` and its properties, or ``None`` on a miss.
+
+        An expired entry is removed and counts as a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        _, dag, properties = entry
+        return copy.deepcopy(dag), copy.deepcopy(properties)
+
+    def put(self, key: str, dag: DAGCircuit, properties: Optional[Dict[str, Any]] = None) -> None:
+        """Cache a copy of ``dag`` and ``properties`` under ``key``, evicting the least recently used entry if full."""
+        entry = (time.monotonic(), copy.deepcopy(dag), copy.deepcopy(properties or {}))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all cached DAGs. The counters are left untouched."""
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups so far that were hits, or 0 before the first lookup."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, int]:
+        """Return the hit, miss, eviction and expiration counters and the current number of entries."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self._entries),
+            }
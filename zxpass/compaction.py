@@ -0,0 +1,138 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Splitting unitary segments into independent groups of qubits, and mapping them onto as few qubits as possible."""
+
+from typing import Dict, List, Tuple
+
+import pyzx as zx
+from pyzx.circuit.gates import Gate
+
+from .cache import _qubit_attrs, _remap_gate
+
+
+def _gate_qubits(gate: Gate) -> List[int]:
+    """Return the qubits a PyZX gate acts on."""
+    return [getattr(gate, attr) for attr in _qubit_attrs if hasattr(gate, attr)]
+
+
+def _split_components(c: zx.Circuit) -> List[zx.Circuit]:
+    """Split a unitary segment into groups of qubits that never interact with each other.
+
+    Returns one circuit (as wide as ``c``) per connected component of the qubit-interaction
+    graph, in order of each component's first gate, holding that component's gates in their
+    original order. As the components act on disjoint qubits, their gates commute, so
+    concatenating the circuits gives back ``c`` up to the order of commuting gates. If
+    every gate belongs to one component, ``[c]`` is returned.
+    """
+    parent = list(range(c.qubits))
+
+    def _find(q: int) -> int:
+        while parent[q] != q:
+            parent[q] = parent[parent[q]]
+            q = parent[q]
+        return q
+
+    for gate in c.gates:
+        qubits = _gate_qubits(gate)
+        for q in qubits[1:]:
+            parent[_find(q)] = _find(qubits[0])
+
+    components: Dict[int, zx.Circuit] = {}
+    for gate in c.gates:
+        root = _find(_gate_qubits(gate)[0])
+        if root not in components:
+            components[root] = zx.Circuit(c.qubits)
+        components[root].add_gate(gate)
+    if len(components) <= 1:
+        return [c]
+    return list(components.values())
+
+
+def canonical_form(  # pylint: disable=too-many-locals
+    c: zx.Circuit, reorder: bool = True
+) -> Tuple[zx.Circuit, List[int]]:
+    """Return a form of a unitary segment that does not depend on which qubits it acts on.
+
+    This restricts ``c`` to the qubits its gates act on, since idle qubits would otherwise each
+    add an input and an output vertex to the graph that simplification and extraction must
+    walk, and returns the new circuit, whose qubit ``i`` is qubit ``labels[i]`` of ``c``,
+    together with ``labels``. The qubits are numbered in the order in which the gates first
+    use them, so that segments that differ only by a relabelling of their qubits have the same canonical
+    form. With ``reorder``, gates are first sorted by their layer (the length of the longest
+    chain of gates before them) and then by what they do, which only swaps gates on disjoint
+    qubits. This removes most of the differences in the order of commuting gates, though not
+    all: gates with the same layer and kind keep their order. If nothing changes, ``c``
+    itself is returned.
+
+    :param c: The unitary segment to canonicalise.
+    :param reorder: Whether to sort gates on disjoint qubits into a canonical order.
+    :return: The canonical circuit, and the qubit of ``c`` that each of its qubits stands for.
+    """
+    gates = c.gates
+    gate_qubits = [_gate_qubits(gate) for gate in gates]
+    order = list(range(len(gates)))
+    if reorder:
+        depth = [0] * c.qubits
+        keys = []
+        for gate, qubits in zip(gates, gate_qubits):
+            layer = max((depth[q] for q in qubits), default=0)
+            for q in qubits:
+                depth[q] = layer + 1
+            kind = (type(gate).__name__, getattr(gate, "adjoint", False), str(getattr(gate, "phase", "")))
+            keys.append((layer, kind))
+        order.sort(key=keys.__getitem__)
+    labels = list(dict.fromkeys(q for i in order for q in gate_qubits[i]))
+    if not labels:
+        return c, list(range(c.qubits))
+    relabel = labels != list(range(c.qubits))
+    if not relabel and order == list(range(len(gates))):
+        return c, labels
+    mask = [0] * c.qubits
+    for i, qubit in enumerate(labels):
+        mask[qubit] = i
+    canonical = zx.Circuit(len(labels))
+    for i in order:
+        canonical.add_gate(_remap_gate(gates[i], mask) if relabel else gates[i])
+    return canonical, labels
+
+
+def _expand(c: zx.Circuit, active: List[int], qubits: int) -> zx.Circuit:
+    """Inverse of :func:`canonical_form`: map the qubits of ``c`` back onto ``active`` in a circuit of width ``qubits``.
+
+    :param c: The circuit to expand, e.g. an optimised canonical form.
+    :param active: The qubit of the expanded circuit that each qubit of ``c`` stands for, i.e. the ``labels``.
+    :param qubits: The width of the expanded circuit.
+    """
+    if active == list(range(qubits)):
+        return c
+    expanded = zx.Circuit(qubits)
+    for gate in c.gates:
+        expanded.add_gate(_remap_gate(gate, active))
+    return expanded
+
+
+def _merge_components(
+    c: zx.Circuit, compacted: List[Tuple[zx.Circuit, List[int]]], optimized: List[zx.Circuit]
+) -> zx.Circuit:
+    """Map each optimised component of ``c`` back onto its qubits and concatenate them."""
+    expanded = [_expand(result, active, c.qubits) for (_, active), result in zip(compacted, optimized)]
+    if len(expanded) == 1:
+        return expanded[0]
+    merged = zx.Circuit(c.qubits)
+    for circuit in expanded:
+        for gate in circuit.gates:
+            merged.add_gate(gate)
+    return merged
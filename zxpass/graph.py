@@ -0,0 +1,135 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Direct conversion of unitary PyZX circuits to ZX-graphs."""
+
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import pyzx as zx
+from pyzx.circuit.gates import Gate, ZPhase, XPhase, NOT, HAD, CNOT, CZ
+from pyzx.utils import EdgeType, VertexType
+
+# Kinds of basic gate that :func:`circuit_to_graph` emits directly, keyed by their ``to_graph`` implementation.
+_Z_SPIDER, _X_SPIDER, _HADAMARD, _CNOT, _CZ = range(5)
+_kinds = {
+    ZPhase.to_graph: _Z_SPIDER,
+    XPhase.to_graph: _X_SPIDER,
+    HAD.to_graph: _HADAMARD,
+    CNOT.to_graph: _CNOT,
+    CZ.to_graph: _CZ,
+}
+
+# ``to_basic_gates`` implementations that return ``[self]``, so need not be called.
+_trivial_expansions = (Gate.to_basic_gates, NOT.to_basic_gates)
+
+# Gate types seen so far, with their kind (or ``None`` for other gates) and whether they must be expanded.
+_type_info: Dict[type, Tuple[Optional[int], bool]] = {}
+
+
+def _gate_kind(gate: Gate) -> Tuple[Optional[int], bool]:
+    """Return the kind of a gate for :func:`circuit_to_graph`, and whether it must be expanded into basic gates."""
+    info = _type_info.get(type(gate))
+    if info is None:
+        info = _kinds.get(type(gate).to_graph), type(gate).to_basic_gates not in _trivial_expansions
+        _type_info[type(gate)] = info
+    return info
+
+
+def _basic_gates(c: zx.Circuit) -> Iterator[Tuple[Optional[int], Gate]]:
+    """Yield the basic gates of ``c`` in order, as :meth:`pyzx.Circuit.to_basic_gates` would, with their kinds."""
+    for gate in c.gates:
+        kind, expand = _gate_kind(gate)
+        if not expand:
+            yield kind, gate
+            continue
+        for basic in gate.to_basic_gates():
+            yield _gate_kind(basic)[0], basic
+
+
+def circuit_to_graph(c: zx.Circuit) -> Any:  # pylint: disable=too-many-locals,too-many-statements
+    """Convert a unitary PyZX circuit to a ZX-graph, like :meth:`pyzx.Circuit.to_graph`.
+
+    PyZX first copies the circuit into basic gates and then lets each gate add itself to the
+    graph through a ``TargetMapper``. Here, the vertices and edges of the basic gates (Z and X
+    phases, Hadamards, CNOTs and CZs) are emitted straight from the gates, without the
+    intermediate circuit and with plain lists for the per-qubit bookkeeping. As every edge
+    joins a new vertex, edges are added without the checks for self-loops and parallel edges.
+    The graph is identical to PyZX's: the same vertices, qubits, rows, phases and edges,
+    created in the same order. Circuits with classical bits or other kinds of basic gate are
+    handed to PyZX.
+    """
+    if c.bits:
+        return c.to_graph()
+    g = zx.Graph()
+    if g.track_phases:
+        return c.to_graph()
+    n = c.qubits
+    add_vertices, add_edges = g.add_vertices, g.add_edges
+    set_type, set_qubit, set_row = g.set_type, g.set_qubit, g.set_row
+
+    inputs = add_vertices(n)
+    for q, v in enumerate(inputs):
+        set_qubit(v, q)
+        set_row(v, 0)
+    prev = list(inputs)
+    next_row = [1] * n
+    max_row = 1 if n else 0
+    scalar_power = 0
+    for kind, gate in _basic_gates(c):
+        if kind in (_Z_SPIDER, _X_SPIDER, _HADAMARD):
+            q = gate.target  # type: ignore[attr-defined]
+            (v,) = add_vertices(1)
+            set_type(v, VertexType.X if kind == _X_SPIDER else VertexType.Z)
+            set_qubit(v, q)
+            set_row(v, next_row[q])
+            if kind == _HADAMARD:
+                add_edges([(prev[q], v)], EdgeType.HADAMARD)
+            else:
+                g.set_phase(v, gate.phase)  # type: ignore[attr-defined]
+                add_edges([(prev[q], v)])
+            prev[q] = v
+            next_row[q] += 1
+            max_row = max(max_row, next_row[q])
+        elif kind in (_CNOT, _CZ):
+            t, ctrl = gate.target, gate.control  # type: ignore[attr-defined]
+            # A CNOT occupies a row on every qubit between its two, a CZ only on its own two.
+            span = range(min(t, ctrl), max(t, ctrl) + 1) if kind == _CNOT else (t, ctrl)
+            r = max(next_row[q] for q in span)
+            tv, cv = add_vertices(2)
+            set_type(tv, VertexType.X if kind == _CNOT else VertexType.Z)
+            set_type(cv, VertexType.Z)
+            set_qubit(tv, t)
+            set_qubit(cv, ctrl)
+            set_row(tv, r)
+            set_row(cv, r)
+            add_edges([(prev[t], tv), (prev[ctrl], cv)])
+            add_edges([(tv, cv)], EdgeType.SIMPLE if kind == _CNOT else EdgeType.HADAMARD)
+            prev[t], prev[ctrl] = tv, cv
+            for q in span:
+                next_row[q] = r + 1
+            max_row = max(max_row, r + 1)
+            scalar_power += 1
+        else:
+            return c.to_graph()
+
+    outputs = add_vertices(n)
+    for q, v in enumerate(outputs):
+        set_qubit(v, q)
+        set_row(v, max_row)
+    add_edges(list(zip(prev, outputs)))
+    g.set_inputs(tuple(inputs))
+    g.set_outputs(tuple(outputs))
+    g.scalar.add_power(scalar_power)
+    return g
@@ -0,0 +1,224 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Callbacks around the stages of a :class:`ZXPass` run, for profiling and tracing."""
+
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import pyzx as zx
+
+# The stages of the optimisation pipelines that run on each unitary segment.
+SEGMENT_STAGES = ("to_graph", "simplify", "extract", "basic_optimization")
+
+# The stages of a whole run, reported with a segment of ``None``.
+PASS_STAGES = ("convert", "optimize", "recover")
+
+
+class PassHook:
+    """Callbacks that a :class:`ZXPass` makes around each stage of a run and each unitary segment it optimises.
+
+    The base class does nothing; subclasses override the callbacks they need. The stages of a
+    run (``"convert"``, ``"optimize"`` and ``"recover"``) are reported with a segment of
+    ``None``. Within ``"optimize"``, each run of the default optimiser's pipeline on a unitary
+    segment is numbered from 0, in the order the runs start, and its stages (``"to_graph"``,
+    ``"simplify"``, ``"extract"`` and ``"basic_optimization"``, as far as its strategy has them)
+    are reported with that number. With a portfolio, each strategy run on a segment counts as a
+    segment of its own.
+
+    Segments optimised in this process are reported as they run. Segments optimised on an
+    executor have their stages recorded where they run and are reported once their result is
+    back, with the recorded times, but without :meth:`on_stage_start`; segments that run out of
+    time there are not reported. Callbacks are made from the thread that runs :class:`ZXPass`,
+    or from the thread optimising the segment.
+    """
+
+    def on_segment_start(self, segment: int, circuit: zx.Circuit) -> None:
+        """Called before a unitary segment is optimised.
+
+        :param segment: The number of the segment within the run.
+        :param circuit: The segment, compacted to the qubits it acts on.
+        """
+
+    def on_stage_start(self, stage: str, segment: Optional[int]) -> None:
+        """Called before a stage starts, if it runs in this process.
+
+        :param stage: The name of the stage.
+        :param segment: The number of the segment the stage belongs to, or ``None`` for a stage of the run.
+        """
+
+    def on_stage_end(  # pylint: disable=unused-argument
+        self, stage: str, segment: Optional[int], elapsed: float, graph_stats: Optional[Dict[str, int]]
+    ) -> None:
+        """Called after a stage has finished.
+
+        :param stage: The name of the stage.
+        :param segment: The number of the segment the stage belongs to, or ``None`` for a stage of the run.
+        :param elapsed: The wall time of the stage, in seconds.
+        :param graph_stats: For stages that leave a ZX-graph (``"to_graph"`` and ``"simplify"``), its numbers
+            of vertices (``"vertices"``) and edges (``"edges"``); otherwise ``None``.
+        """
+
+    def on_segment_end(self, segment: int, circuit: zx.Circuit, elapsed: float) -> None:
+        """Called after a unitary segment has been optimised.
+
+        :param segment: The number of the segment within the run.
+        :param circuit: The optimised segment, or the segment itself if it was not improved or ran out of time.
+        :param elapsed: The wall time of the whole optimisation of the segment, in seconds.
+        """
+
+
+class ChromeTraceHook(PassHook):
+    """Records the stages of each run as Chrome trace events, for viewing in ``chrome://tracing`` or Perfetto.
+
+    The stages of a run are shown on one track and each segment on a track of its own, with
+    its gate counts and the sizes of its ZX-graph as arguments. Segments reported after they
+    ran on an executor are placed at the time their result came back, with their stages laid
+    end to end. One hook may record several runs.
+
+    :param path: If given, :meth:`save` writes the trace here by default.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        # The start of each open segment and the end of its last stage, in microseconds, and its number of gates.
+        self._segments: Dict[int, List[float]] = {}
+
+    def _now(self) -> float:
+        """Return the time since the hook was created, in microseconds."""
+        return (time.perf_counter() - self._origin) * 1e6
+
+    def _event(  # pylint: disable=too-many-arguments
+        self, name: str, tid: int, ts: float, dur: float, args: Dict[str, Any]
+    ) -> None:
+        """Record a complete event."""
+        self.events.append(
+            {"name": name, "cat": "zxpass", "ph": "X", "ts": ts, "dur": dur, "pid": self._pid, "tid": tid, "args": args}
+        )
+
+    def on_segment_start(self, segment: int, circuit: zx.Circuit) -> None:
+        now = self._now()
+        with self._lock:
+            self._segments[segment] = [now, now, len(circuit.gates)]
+            self.events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": self._pid,
+                    "tid": segment + 1,
+                    "args": {"name": f"segment {segment}"},
+                }
+            )
+
+    def on_stage_end(
+        self, stage: str, segment: Optional[int], elapsed: float, graph_stats: Optional[Dict[str, int]]
+    ) -> None:
+        duration = elapsed * 1e6
+        end = self._now()
+        with self._lock:
+            if segment is None:
+                self._event(stage, 0, end - duration, duration, {})
+                return
+            cursor = self._segments.setdefault(segment, [end - duration, end - duration, 0])
+            start = max(cursor[1], end - duration)
+            cursor[1] = start + duration
+            self._event(stage, segment + 1, start, duration, dict(graph_stats or {}))
+
+    def on_segment_end(self, segment: int, circuit: zx.Circuit, elapsed: float) -> None:
+        with self._lock:
+            start, _, gates_in = self._segments.pop(segment, (self._now() - elapsed * 1e6, 0.0, 0))
+            args = {"qubits": circuit.qubits, "gates_in": int(gates_in), "gates_out": len(circuit.gates)}
+            self._event("segment", segment + 1, start, elapsed * 1e6, args)
+
+    def trace(self) -> Dict[str, Any]:
+        """Return the recorded events in the Chrome trace event format."""
+        with self._lock:
+            return {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write the recorded events as JSON.
+
+        :param path: The file to write, instead of the hook's ``path``.
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError("Expected a path to save the trace to.")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.trace(), f)
+
+    def clear(self) -> None:
+        """Forget the recorded events."""
+        with self._lock:
+            self.events.clear()
+            self._segments.clear()
+
+
+class CProfileHook(PassHook):
+    """Profiles the stages of each run with :mod:`cProfile`, separately for each kind of stage.
+
+    Only stages that run in this process (i.e. without ``workers`` or ``executor``) are
+    profiled. Only one stage is profiled at a time, so a stage that starts while another is
+    being profiled is left to the outer one; by default, the stages of the segments are
+    profiled along with the conversion and recovery of the run, but not ``"optimize"``, which
+    contains them. One hook may profile several runs.
+
+    :param stages: The names of the stages to profile.
+    """
+
+    def __init__(self, stages: Sequence[str] = ("convert", *SEGMENT_STAGES, "recover")):
+        self.stages = tuple(stages)
+        self.profiles: Dict[str, cProfile.Profile] = {}
+        # The stage and segment being profiled, if any.
+        self._active: Optional[Any] = None
+
+    def on_stage_start(self, stage: str, segment: Optional[int]) -> None:
+        if stage not in self.stages or self._active is not None:
+            return
+        self._active = (stage, segment)
+        self.profiles.setdefault(stage, cProfile.Profile()).enable()
+
+    def on_stage_end(
+        self, stage: str, segment: Optional[int], elapsed: float, graph_stats: Optional[Dict[str, int]]
+    ) -> None:
+        if self._active != (stage, segment):
+            return
+        self.profiles[stage].disable()
+        self._active = None
+
+    def stats(self, stage: Optional[str] = None) -> pstats.Stats:
+        """Return the profile of one stage, or of all stages together.
+
+        :param stage: The name of the stage, or ``None`` for all of them.
+        :return: The profile, e.g. to print with ``stats().sort_stats("cumulative").print_stats(20)``.
+        """
+        if stage is None:
+            profiles = list(self.profiles.values())
+        else:
+            profiles = [self.profiles[stage]] if stage in self.profiles else []
+        if not profiles:
+            raise ValueError(f"Stage {stage!r} has not been profiled." if stage else "No stage has been profiled.")
+        result = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            result.add(profile)
+        return result
@@ -15,7 +15,7 @@
 
 """A transpiler stage plugin for Qiskit which uses ZX-Calculus for circuit optimization, implemented using PyZX."""
 
-from typing import Optional
+from typing import Dict, Optional
 
 from qiskit.transpiler.preset_passmanagers.plugin import PassManagerStagePlugin
 from qiskit.transpiler import PassManagerConfig, PassManager
@@ -23,12 +23,30 @@ from qiskit.transpiler import PassManagerConfig, PassManager
 from .zxpass import ZXPass
 
 
+# The ZXPass strategy used at each optimization level, from cheapest to most expensive. Qiskit's default
+# level, 2, runs the full pipeline, as every level did before the cheaper strategies were added.
+optimization_level_strategies: Dict[int, str] = {
+    0: "basic",
+    1: "clifford",
+    2: "full_reduce",
+    3: "full_reduce",
+}
+
+
 class ZXPlugin(PassManagerStagePlugin):  # pylint: disable=too-few-public-methods
-    """Plugin class for optimization stage with :class:`~.ZXPass`."""
+    """Plugin class for optimization stage with :class:`~.ZXPass`.
+
+    The ``optimization_level`` selects how much effort :class:`~.ZXPass` spends on each segment
+    (see ``optimization_level_strategies``). If no level is given, the most thorough strategy is used.
+    """
 
     def pass_manager(
         self,
         pass_manager_config: PassManagerConfig,
         optimization_level: Optional[int] = None,
     ) -> PassManager:
-        return PassManager([ZXPass()])
+        if optimization_level is None:
+            optimization_level = max(optimization_level_strategies)
+        if optimization_level not in optimization_level_strategies:
+            raise ValueError(f"Unsupported optimization level {optimization_level}; expected 0 to 3.")
+        return PassManager([ZXPass(strategy=optimization_level_strategies[optimization_level])])
@@ -0,0 +1,235 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A cheap pre-screen that predicts whether optimising a unitary segment is worth its cost."""
+
+from fractions import Fraction
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import pyzx as zx
+from pyzx.circuit.gates import Gate, ParityPhase, RXX, XPhase, YPhase, ZPhase
+
+from .compaction import _gate_qubits
+
+# Gates that are Clifford whatever their attributes.
+_CLIFFORD_GATES = frozenset(["HAD", "NOT", "Y", "Z", "S", "CNOT", "CZ", "CX", "SWAP"])
+
+# Single-qubit and ZZ-type phase gates, which are Clifford if their phase is a multiple of pi/2. Controlled phases
+# (e.g. CPhase and CRZ) are not Clifford for such phases, so they are left out.
+_PHASE_GATES = (ZPhase, XPhase, YPhase, ParityPhase, RXX)
+
+# Two-qubit gates that are symmetric in their qubits.
+_SYMMETRIC_GATES = frozenset(["CZ", "SWAP"])
+
+# Families of gates of which two adjacent ones on the same qubits always merge into one (or cancel).
+_MERGEABLE_FAMILIES: Dict[str, str] = {
+    "ZPhase": "Z",
+    "Z": "Z",
+    "S": "Z",
+    "T": "Z",
+    "XPhase": "X",
+    "NOT": "X",
+}
+
+
+def _is_clifford(gate: Gate) -> bool:
+    """Return whether a PyZX gate is a Clifford gate."""
+    if isinstance(gate, _PHASE_GATES):
+        return isinstance(gate.phase, (int, Fraction)) and (Fraction(gate.phase) * 2).denominator == 1
+    return type(gate).__name__ in _CLIFFORD_GATES
+
+
+def _mergeable(first: Gate, second: Gate, qubits: Tuple[int, ...]) -> bool:
+    """Return whether two gates that are adjacent on all of their qubits merge into one or cancel."""
+    first_name, second_name = type(first).__name__, type(second).__name__
+    first_qubits = tuple(_gate_qubits(first))
+    if first_qubits != qubits and not (first_name in _SYMMETRIC_GATES and set(first_qubits) == set(qubits)):
+        return False
+    if first_name == second_name and (first_name in _CLIFFORD_GATES or len(qubits) == 1):
+        return True
+    family = _MERGEABLE_FAMILIES.get(first_name)
+    return family is not None and family == _MERGEABLE_FAMILIES.get(second_name)
+
+
+def segment_features(c: zx.Circuit) -> Dict[str, float]:
+    """Return the features of a unitary segment that :class:`BenefitPredictor` bases its decisions on.
+
+    :param c: The segment.
+    :return: The number of gates (``"gates"``), the fraction of them that act on two qubits
+        (``"two_qubit_density"``), the fraction that are Clifford (``"clifford_fraction"``), and the
+        number of pairs of gates that are adjacent on all their qubits and merge into one or cancel
+        (``"mergeable_pairs"``), e.g. two Hadamards, two CNOTs or two Z rotations.
+    """
+    two_qubit = clifford = mergeable = 0
+    last: Dict[int, Gate] = {}
+    for gate in c.gates:
+        qubits = tuple(_gate_qubits(gate))
+        two_qubit += len(qubits) == 2
+        clifford += _is_clifford(gate)
+        previous = last.get(qubits[0]) if qubits else None
+        if previous is not None and all(last.get(q) is previous for q in qubits):
+            mergeable += _mergeable(previous, gate, qubits)
+        for q in qubits:
+            last[q] = gate
+    n = len(c.gates)
+    return {
+        "gates": n,
+        "two_qubit_density": two_qubit / n if n else 0.0,
+        "clifford_fraction": clifford / n if n else 0.0,
+        "mergeable_pairs": mergeable,
+    }
+
+
+class BenefitPredictor:  # pylint: disable=too-many-instance-attributes
+    """Decides cheaply whether a unitary segment is worth optimising, and learns from the outcomes.
+
+    Building, simplifying and extracting a ZX-graph costs far more than the segment's size
+    suggests, and for short or already optimal segments the result is thrown away because it
+    is not smaller. A predictor screens each segment first, from features that take one pass
+    over its gates (see :func:`segment_features`), and the default optimiser leaves segments
+    it rejects as they are. A segment is attempted if it has at least one pair of adjacent
+    gates that merge or cancel; otherwise it is attempted only if it has at least
+    ``min_gates`` gates, a two-qubit density of at most ``max_two_qubit_density`` and a
+    Clifford fraction of at least ``min_clifford_fraction``, and if, among earlier attempts on
+    segments with similar features, at least ``min_success_rate`` improved once
+    ``min_history`` of them have been made.
+
+    To measure what is lost, one in every ``audit_every`` rejected segments is optimised
+    anyway; if it improves, it counts as a missed opportunity. Audits also add to the
+    history, so that a kind of segment that starts improving is attempted again. A single
+    instance may be shared between several passes, so that its history carries over.
+
+    :param min_gates: The smallest segment that is attempted without a mergeable pair.
+    :param max_two_qubit_density: The largest fraction of two-qubit gates in a segment that is
+        attempted without a mergeable pair.
+    :param min_clifford_fraction: The smallest fraction of Clifford gates in a segment that is
+        attempted without a mergeable pair.
+    :param min_success_rate: The fraction of similar segments that must have improved for a
+        segment without a mergeable pair to be attempted.
+    :param min_history: The number of attempts on similar segments before ``min_success_rate``
+        applies.
+    :param audit_every: Optimise one in this many rejected segments to count missed
+        opportunities, or ``None`` not to.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        min_gates: int = 2,
+        max_two_qubit_density: float = 1.0,
+        min_clifford_fraction: float = 0.0,
+        min_success_rate: float = 0.02,
+        min_history: int = 50,
+        audit_every: Optional[int] = 20,
+    ):
+        if min_gates < 1:
+            raise ValueError(f"Expected min_gates to be at least 1, got {min_gates}.")
+        for name, value in (
+            ("max_two_qubit_density", max_two_qubit_density),
+            ("min_clifford_fraction", min_clifford_fraction),
+            ("min_success_rate", min_success_rate),
+        ):
+            if not 0.0 <= value <= 1.0:
+                raise ValueError(f"Expected {name} to be between 0 and 1, got {value}.")
+        if min_history < 1:
+            raise ValueError(f"Expected min_history to be at least 1, got {min_history}.")
+        if audit_every is not None and audit_every < 1:
+            raise ValueError(f"Expected audit_every to be at least 1, got {audit_every}.")
+        self.min_gates = min_gates
+        self.max_two_qubit_density = max_two_qubit_density
+        self.min_clifford_fraction = min_clifford_fraction
+        self.min_success_rate = min_success_rate
+        self.min_history = min_history
+        self.audit_every = audit_every
+        self._lock = threading.Lock()
+        # Attempts and improvements so far, by bucket of similar segments (see ``_bucket``).
+        self._history: Dict[Tuple[int, int, int], List[int]] = {}
+        self.attempted = 0
+        self.improved = 0
+        self.skipped = 0
+        self.audited = 0
+        self.missed = 0
+
+    @staticmethod
+    def _bucket(features: Dict[str, float]) -> Tuple[int, int, int]:
+        """Group segments of roughly the same length, two-qubit density and Clifford fraction."""
+        return (
+            int(features["gates"]).bit_length(),
+            int(features["two_qubit_density"] * 4),
+            int(features["clifford_fraction"] * 4),
+        )
+
+    def _predict(self, features: Dict[str, float]) -> bool:
+        """Return whether a segment with the given features is likely to improve."""
+        if features["mergeable_pairs"]:
+            return True
+        if (
+            features["gates"] < self.min_gates
+            or features["two_qubit_density"] > self.max_two_qubit_density
+            or features["clifford_fraction"] < self.min_clifford_fraction
+        ):
+            return False
+        attempts, improvements = self._history.get(self._bucket(features), (0, 0))
+        return attempts < self.min_history or improvements >= self.min_success_rate * attempts
+
+    def screen(self, c: zx.Circuit) -> Tuple[bool, bool]:
+        """Decide whether to optimise a segment.
+
+        :param c: The segment.
+        :return: Whether to optimise it, and whether that is only to audit a rejection.
+        """
+        features = segment_features(c)
+        with self._lock:
+            if self._predict(features):
+                self.attempted += 1
+                return True, False
+            self.skipped += 1
+            if self.audit_every is not None and self.skipped % self.audit_every == 0:
+                self.audited += 1
+                return True, True
+            return False, False
+
+    def record(self, c: zx.Circuit, improved: bool, audit: bool = False) -> None:
+        """Record whether optimising a segment improved it.
+
+        :param c: The segment, as it was before optimisation.
+        :param improved: Whether the optimised segment was used.
+        :param audit: Whether the segment was only optimised to audit a rejection (see :meth:`screen`).
+        """
+        features = segment_features(c)
+        with self._lock:
+            if audit:
+                self.missed += improved
+            else:
+                self.improved += improved
+            entry = self._history.setdefault(self._bucket(features), [0, 0])
+            entry[0] += 1
+            entry[1] += improved
+
+    def clear(self) -> None:
+        """Forget the history of earlier attempts. The counters are left untouched."""
+        with self._lock:
+            self._history.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return the counts of attempted, improved, skipped and audited segments, and of missed opportunities."""
+        with self._lock:
+            return {
+                "attempted": self.attempted,
+                "improved": self.improved,
+                "skipped": self.skipped,
+                "audited": self.audited,
+                "missed": self.missed,
+            }
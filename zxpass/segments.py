@@ -0,0 +1,918 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Optimisation of the unitary segments of PyZX circuits for :class:`~.ZXPass`."""
+
+from typing import AbstractSet, Any, Dict, Hashable, Iterable, Iterator, List, Sequence, Tuple, TypeVar
+from typing import Callable, Optional, Union, cast
+from concurrent.futures import Executor, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from functools import partial
+import time
+
+import pyzx as zx
+from pyzx.optimize import basic_optimization
+from pyzx.symbolic import Poly
+from pyzx.circuit.gates import Gate, SWAP
+from pyzx.circuit.gates import Measurement as PyzxMeasurement, Reset as PyzxReset
+from pyzx.circuit.gates import ConditionalGate
+
+from .cache import SegmentCache, PersistentSegmentCache, segment_fingerprint, _copy_circuit, _gate_token
+from .graph import circuit_to_graph
+from .compaction import _gate_qubits, _merge_components, _split_components, canonical_form
+from .predictor import BenefitPredictor
+from .splicing import _unchanged
+from .hooks import PassHook
+from .stats import _Instruments, _record_graph, _stage
+
+# Name of the default optimisation pipeline in ``strategies``.
+_DEFAULT_STRATEGY = "full_reduce"
+
+# Segments larger than this are not given to ``clifford_simp`` by the "clifford" strategy.
+_CLIFFORD_MAX_GATES = 500
+
+SegmentCacheLike = Union[SegmentCache, PersistentSegmentCache]
+
+T = TypeVar("T")
+
+# The wire on which measurements and conditional gates in a PyZX circuit read or write classical bits.
+_CLASSICAL_WIRE = "classical"
+
+
+def _is_unitary_gate(gate: Gate) -> bool:
+    """Check whether a PyZX gate is a unitary gate (not measurement, reset, or conditional)."""
+    return not isinstance(gate, (PyzxMeasurement, PyzxReset, ConditionalGate))
+
+
+def compute_output_permutation(g: Any) -> Dict[int, int]:
+    """Compute the output-to-input qubit permutation from a post-extraction graph.
+
+    After ``extract_circuit(g, up_to_perm=True)`` the graph *g* is mutated so
+    that only boundary vertices (inputs and outputs) remain.  Each output vertex
+    is connected to exactly one input vertex.  This function reads that mapping
+    and returns a dict ``{output_qubit_index: input_qubit_index}``.
+
+    Qubit indices are those reported by ``g.qubit(v)`` for each boundary
+    vertex, matching the qubit numbering that pyzx uses elsewhere (e.g. the
+    ``target``/``control`` fields of extracted gates).
+
+    Raises ``ValueError`` if the extracted connectivity does not describe a
+    bijection (e.g. mismatched input/output counts, outputs with more than one
+    neighbour, outputs connected to non-input vertices, or two outputs sharing
+    an input).
+
+    Only uses public pyzx graph API (``g.inputs()``, ``g.outputs()``,
+    ``g.neighbors()``, ``g.qubit()``).
+    """
+    inputs = list(g.inputs())
+    outputs = list(g.outputs())
+    if len(inputs) != len(outputs):
+        raise ValueError(
+            f"Expected equal numbers of inputs and outputs, "
+            f"got {len(inputs)} inputs and {len(outputs)} outputs."
+        )
+    input_qubit_of_vertex = {v: g.qubit(v) for v in inputs}
+    perm: Dict[int, int] = {}
+    for out_v in outputs:
+        neighbors = list(g.neighbors(out_v))
+        if len(neighbors) != 1:
+            raise ValueError(
+                f"Expected output vertex {out_v} to have exactly one "
+                f"neighbour after extraction, got {len(neighbors)}."
+            )
+        in_v = neighbors[0]
+        if in_v not in input_qubit_of_vertex:
+            raise ValueError(
+                f"Output vertex {out_v} is connected to vertex {in_v} "
+                f"which is not an input vertex."
+            )
+        out_q = g.qubit(out_v)
+        if out_q in perm:
+            raise ValueError(
+                f"Multiple output vertices share qubit index {out_q}."
+            )
+        perm[out_q] = input_qubit_of_vertex[in_v]
+    if len(set(perm.values())) != len(perm):
+        raise ValueError(
+            "Output-to-input mapping is not bijective; "
+            "multiple outputs map to the same input."
+        )
+    return perm
+
+
+def _permutation_to_swaps(perm: Dict[int, int]) -> List[Tuple[int, int]]:
+    """Decompose a permutation into transpositions (SWAP pairs).
+
+    Uses cycle decomposition.  The returned list, applied left to right,
+    implements the forward permutation (wire *j* ends up holding the state
+    of input qubit ``perm[j]``).
+
+    Raises ``ValueError`` if ``perm`` is not a bijection on
+    ``range(len(perm))`` (i.e. if its keys or values are not exactly the
+    set of integers ``{0, 1, ..., len(perm) - 1}``).
+    """
+    n = len(perm)
+    expected = set(range(n))
+    if set(perm.keys()) != expected:
+        raise ValueError(
+            f"Expected permutation keys to be range({n}), "
+            f"got {sorted(perm.keys())}."
+        )
+    if set(perm.values()) != expected:
+        raise ValueError(
+            f"Expected permutation values to be a permutation of range({n}), "
+            f"got {sorted(perm.values())}."
+        )
+    current = [perm[i] for i in range(n)]
+    swaps: List[Tuple[int, int]] = []
+    for i in range(n):
+        while current[i] != i:
+            j = current[i]
+            swaps.append((i, j))
+            current[i], current[j] = current[j], current[i]
+    swaps.reverse()
+    return swaps
+
+
+class _SegmentTimeout(TimeoutError):
+    """Raised when a segment's optimisation runs past its deadline."""
+
+
+def _check_deadline(deadline: Optional[float]) -> None:
+    """Raise :class:`_SegmentTimeout` if ``deadline`` (a :func:`time.monotonic` value) has passed."""
+    if deadline is not None and time.monotonic() >= deadline:
+        raise _SegmentTimeout()
+
+
+def _has_symbolic_phases(c: zx.Circuit) -> bool:
+    """Return whether any gate of ``c`` has a symbolic phase, which ``basic_optimization`` does not support."""
+    return any(
+        isinstance(phase, Poly)
+        for g in c.gates
+        for phase in (getattr(g, "phase", None), *getattr(g, "phases", ()))
+    )
+
+
+def _simplify_and_extract(
+    c: zx.Circuit, simplify: Callable[[Any], Any], deadline: Optional[float] = None
+) -> zx.Circuit:
+    """Optimise a purely unitary PyZX circuit by simplifying its graph with ``simplify`` and extracting.
+
+    Extracts with ``up_to_perm=True`` so that ``basic_optimization`` runs on a
+    circuit free of SWAP-decomposition clutter (unless it has symbolic phases, which
+    ``basic_optimization`` does not support).  The output permutation is then
+    prepended as SWAP gates (each counting as one gate rather than three CNOTs),
+    giving a fairer gate-count comparison against the original circuit.  If the
+    result still has at least as many gates as the original, the original is
+    returned unchanged to avoid regressions on small circuits with compact
+    multi-qubit gates (e.g. Toffoli, Fredkin). The comparison counts PyZX gate
+    objects directly; since ``_recover_dag`` emits one Qiskit op per PyZX gate,
+    this matches the Qiskit-side ``size()`` that downstream passes see.
+
+    If a ``deadline`` (a :func:`time.monotonic` value) is given, it is checked
+    between pipeline stages and :class:`_SegmentTimeout` is raised once it has
+    passed. A stage that is already running is not interrupted.
+    """
+    _check_deadline(deadline)
+    with _stage("to_graph"):
+        g = circuit_to_graph(c)
+        _record_graph(g, "before")
+    with _stage("simplify"):
+        simplify(g)
+        _record_graph(g, "after")
+    _check_deadline(deadline)
+    with _stage("extract"):
+        optimized = zx.extract.extract_circuit(g, up_to_perm=True)
+    _check_deadline(deadline)
+    perm = compute_output_permutation(g)
+    if not _has_symbolic_phases(optimized):
+        with _stage("basic_optimization"):
+            optimized = basic_optimization(optimized.to_basic_gates(), do_swaps=False)
+    # Prepend SWAP gates for the output permutation.
+    swap_pairs = _permutation_to_swaps(perm)
+    if swap_pairs:
+        with_perm = zx.Circuit(c.qubits)
+        for i, j in swap_pairs:
+            with_perm.add_gate(SWAP(i, j))
+        for gate in optimized.gates:
+            with_perm.add_gate(gate)
+        optimized = with_perm
+    # TODO: Consider a two-axis comparison keyed primarily on 2-qubit gate
+    # count (``twoqubitcount()``), with total gate count as a tiebreaker. The
+    # 2-qubit count is the dominant hardware cost and is naturally apples-to-
+    # apples across gate bases (a Toffoli's 2-qubit count is 6 whether it is
+    # stored as a single gate object or as its 15-gate basic decomposition),
+    # but a naive drop-in replacement misses 1-qubit blow-ups and needs a
+    # tiebreaker to handle equal 2-qubit counts.
+    if len(optimized.gates) < len(c.gates):
+        return optimized
+    return c
+
+
+def _optimize_unitary(c: zx.Circuit, deadline: Optional[float] = None) -> zx.Circuit:
+    """Optimise a purely unitary PyZX circuit using full_reduce and extraction.
+
+    See :func:`_simplify_and_extract` for the details of the pipeline.
+    """
+    return _simplify_and_extract(c, zx.simplify.full_reduce, deadline)
+
+
+def _optimize_unitary_clifford(c: zx.Circuit, deadline: Optional[float] = None) -> zx.Circuit:
+    """Optimise a purely unitary PyZX circuit using clifford_simp and extraction.
+
+    ``clifford_simp`` leaves non-Clifford phases where they are instead of gadgetising
+    them, so it is considerably cheaper than ``full_reduce``. Extraction cost still grows
+    quickly with circuit size, so segments of more than ``_CLIFFORD_MAX_GATES`` gates are
+    handed to :func:`_optimize_unitary_basic` instead.
+    """
+    if len(c.gates) > _CLIFFORD_MAX_GATES:
+        return _optimize_unitary_basic(c, deadline)
+    return _simplify_and_extract(c, zx.simplify.clifford_simp, deadline)
+
+
+def _optimize_unitary_basic(c: zx.Circuit, deadline: Optional[float] = None) -> zx.Circuit:
+    """Optimise a purely unitary PyZX circuit with ``basic_optimization`` only, without any graph rewriting.
+
+    This cancels and merges adjacent gates and folds phases through CNOTs, at a small
+    fraction of the cost of the graph-based strategies. As with those, the original is
+    returned if the result is not smaller. ``basic_optimization`` does not support symbolic
+    phases, so segments with any are returned unchanged.
+    """
+    _check_deadline(deadline)
+    if _has_symbolic_phases(c):
+        return c
+    with _stage("basic_optimization"):
+        optimized = basic_optimization(c.to_basic_gates(), do_swaps=False)
+    if len(optimized.gates) < len(c.gates):
+        return optimized
+    return c
+
+
+def _optimize_unitary_teleport(c: zx.Circuit, deadline: Optional[float] = None) -> zx.Circuit:
+    """Optimise a purely unitary PyZX circuit by phase teleportation and ``basic_optimization``.
+
+    ``teleport_reduce`` runs ``full_reduce`` only to find which phases can be merged, and
+    moves them in the original graph without changing its structure. The circuit is then
+    read back from the graph directly, with no extraction, and ``basic_optimization``
+    cancels the gates the merged phases leave behind. As with the other strategies, the
+    original is returned if the result is not smaller. Segments with symbolic phases are
+    returned unchanged.
+    """
+    _check_deadline(deadline)
+    if _has_symbolic_phases(c):
+        return c
+    with _stage("to_graph"):
+        g = circuit_to_graph(c)
+        _record_graph(g, "before")
+    with _stage("simplify"):
+        zx.simplify.teleport_reduce(g)
+        _record_graph(g, "after")
+    _check_deadline(deadline)
+    with _stage("basic_optimization"):
+        optimized = basic_optimization(zx.Circuit.from_graph(g).to_basic_gates(), do_swaps=False)
+    if len(optimized.gates) < len(c.gates):
+        return optimized
+    return c
+
+
+# Optimisation pipelines for unitary segments, by name, from cheapest to most expensive.
+strategies: Dict[str, Callable[..., zx.Circuit]] = {
+    "basic": _optimize_unitary_basic,
+    "teleport": _optimize_unitary_teleport,
+    "clifford": _optimize_unitary_clifford,
+    "full_reduce": _optimize_unitary,
+}
+
+
+def _two_qubit_cost(c: zx.Circuit) -> Tuple[int, int]:
+    """Rank circuits by their number of two-qubit gates, then by their total number of gates."""
+    return c.twoqubitcount(), len(c.gates)
+
+
+def _depth_cost(c: zx.Circuit) -> Tuple[int, int]:
+    """Rank circuits by their depth, then by their total number of gates."""
+    return c.depth(), len(c.gates)
+
+
+# Cost functions for choosing between the results of a strategy portfolio, by name; lower is better.
+costs: Dict[str, Callable[[zx.Circuit], Any]] = {
+    "gates": lambda c: len(c.gates),
+    "two_qubit": _two_qubit_cost,
+    "depth": _depth_cost,
+}
+
+
+def _causal_split(
+    ops: Iterable[Tuple[T, AbstractSet[Hashable], bool]], causal: bool = True
+) -> List[Union[List[T], T]]:
+    """Group a sequence of operations into blocks of gates separated by barrier operations.
+
+    ``ops`` yields ``(op, wires, is_barrier)`` in a valid (e.g. topological) order, where
+    ``wires`` are the qubits and classical bits the operation acts on. Returns a list of
+    blocks (lists of gates, in order) and barrier operations that is also a valid order.
+
+    Only the causal past of a barrier on its wires is cut off before it: gates that neither
+    act on one of the barrier's wires nor precede such a gate on a shared wire stay pending,
+    and are placed in the same block as the gates that follow the barrier. This keeps
+    blocks as large as possible when a barrier touches only a few wires. If ``causal`` is
+    false, a barrier cuts off all the pending gates instead, so each block is a maximal run
+    of gates between two barriers.
+    """
+    parts: List[Union[List[T], T]] = []
+    pending: List[Tuple[T, AbstractSet[Hashable]]] = []
+    for op, wires, is_barrier in ops:
+        if not is_barrier:
+            pending.append((op, wires))
+            continue
+        # Scan backwards, collecting every pending gate that must stay before the barrier.
+        blocked = set(wires)
+        before: List[T] = []
+        after: List[Tuple[T, AbstractSet[Hashable]]] = []
+        for gate, gate_wires in reversed(pending):
+            if causal and blocked.isdisjoint(gate_wires):
+                after.append((gate, gate_wires))
+            else:
+                before.append(gate)
+                blocked.update(gate_wires)
+        if before:
+            parts.append(before[::-1])
+        parts.append(op)
+        pending = after[::-1]
+    if pending:
+        parts.append([gate for gate, _ in pending])
+    return parts
+
+
+def _gate_wires(gate: Gate) -> AbstractSet[Hashable]:
+    """Return the wires of a PyZX gate: its qubits, and a shared classical wire for measurements and conditionals."""
+    wires: set = set(_gate_qubits(gate))
+    if isinstance(gate, (PyzxMeasurement, ConditionalGate)):
+        wires.add(_CLASSICAL_WIRE)
+    return wires
+
+
+def _split_at_non_unitary(c: zx.Circuit, causal: bool = False) -> List[Union[zx.Circuit, Gate]]:
+    """Split a PyZX circuit into unitary segments and the non-unitary gates between them.
+
+    A purely unitary circuit is returned as ``[c]`` so that callers can hand it to
+    :func:`_optimize_unitary` unchanged. Otherwise, measurements, resets and conditional
+    gates are kept as bare gates between the segments, each of which is a fresh ``zx.Circuit``
+    over all of ``c``'s qubits. With ``causal``, they only cut the unitary gates in their
+    causal past (see :func:`_causal_split`), so gates on unrelated qubits stay in one large
+    segment; measurements and conditional gates then keep their relative order, since all
+    of them are treated as acting on the classical bits.
+    """
+    if all(_is_unitary_gate(g) for g in c.gates):
+        return [c]
+
+    parts: List[Union[zx.Circuit, Gate]] = []
+    for part in _causal_split(((g, _gate_wires(g), not _is_unitary_gate(g)) for g in c.gates), causal):
+        if isinstance(part, list):
+            segment = zx.Circuit(c.qubits)
+            for g in part:
+                segment.add_gate(g)
+            parts.append(segment)
+        else:
+            parts.append(part)
+    return parts
+
+
+def _reassemble(
+    c: zx.Circuit, parts: List[Union[zx.Circuit, Gate]], optimized: Iterator[zx.Circuit]
+) -> zx.Circuit:
+    """Inverse of :func:`_split_at_non_unitary`, taking optimised segments from ``optimized`` in order."""
+    if len(parts) == 1 and parts[0] is c:
+        return next(optimized)
+    result = zx.Circuit(c.qubits, bit_amount=c.bits or None)
+    for part in parts:
+        if isinstance(part, zx.Circuit):
+            for g in next(optimized).gates:
+                result.add_gate(g)
+        else:
+            result.add_gate(part)
+    return result
+
+
+def _optimize_unitary_within(
+    c: zx.Circuit,
+    strategy: str = _DEFAULT_STRATEGY,
+    segment_budget: Optional[float] = None,
+    deadline: Optional[float] = None,
+) -> zx.Circuit:
+    """Run the named strategy on ``c`` with at most ``segment_budget`` seconds from now, and before ``deadline``."""
+    if segment_budget is not None:
+        segment_deadline = time.monotonic() + segment_budget
+        deadline = segment_deadline if deadline is None else min(deadline, segment_deadline)
+    return strategies[strategy](c, deadline)
+
+
+def _map_segments(
+    func: Callable[[zx.Circuit], zx.Circuit],
+    segments: List[zx.Circuit],
+    executor: Optional[Executor] = None,
+    deadline: Optional[float] = None,
+    timed_out: Optional[List[int]] = None,
+) -> List[zx.Circuit]:
+    """Apply ``func`` to each segment, on ``executor`` if one is given, preserving order.
+
+    If ``timed_out`` is given, segments for which ``func`` raises :class:`_SegmentTimeout`,
+    or which have not finished by ``deadline`` (a :func:`time.monotonic` value), are left
+    unchanged and their indices are appended to ``timed_out``. Without an executor, the
+    deadline is only checked before each segment is started.
+    """
+    if timed_out is None:
+        if executor is None:
+            return [func(segment) for segment in segments]
+        return list(executor.map(func, segments))
+
+    results = list(segments)
+    if executor is None:
+        for i, segment in enumerate(segments):
+            try:
+                _check_deadline(deadline)
+                results[i] = func(segment)
+            except _SegmentTimeout:
+                timed_out.append(i)
+        return results
+
+    futures = [executor.submit(func, segment) for segment in segments]
+    wait(futures, timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+    for i, future in enumerate(futures):
+        if not future.done():
+            future.cancel()
+            timed_out.append(i)
+            continue
+        try:
+            results[i] = future.result()
+        except _SegmentTimeout:
+            timed_out.append(i)
+    return results
+
+
+def _terminate_workers(executor: ProcessPoolExecutor) -> None:
+    """Shut down a process pool without waiting, cancelling the tasks it has not started and terminating its workers."""
+    terminate = getattr(executor, "terminate_workers", None)
+    if terminate is not None:
+        terminate()
+        return
+    # Before Python 3.14, ProcessPoolExecutor has no public way to stop a task that is running, so its workers are
+    # terminated directly. They must be looked up before shutting down, which forgets them.
+    processes = list((executor._processes or {}).values())  # pylint: disable=protected-access
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+@contextmanager
+def _process_pool(workers: int, deadline: Optional[float] = None) -> Iterator[ProcessPoolExecutor]:
+    """Yield a pool of ``workers`` processes, which is shut down on exit.
+
+    If ``deadline`` (a :func:`time.monotonic` value) has passed by then, the pool does not wait for the segments it
+    is still optimising, whose results nobody is waiting for, but terminates its workers (see
+    :func:`_terminate_workers`), so that no PyZX call keeps running after the pass has returned.
+    """
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        yield executor
+    finally:
+        if deadline is not None and time.monotonic() >= deadline:
+            _terminate_workers(executor)
+        else:
+            executor.shutdown(cancel_futures=True)
+
+
+def _race_strategies(  # pylint: disable=too-many-arguments,too-many-locals
+    segments: List[zx.Circuit],
+    portfolio: Sequence[str],
+    cost: Callable[[zx.Circuit], Any],
+    executor: Optional[Executor] = None,
+    segment_budget: Optional[float] = None,
+    deadline: Optional[float] = None,
+    timed_out: Optional[List[int]] = None,
+    instruments: Optional[_Instruments] = None,
+) -> List[zx.Circuit]:
+    """Run every strategy in ``portfolio`` on each segment and keep the result with the lowest ``cost``.
+
+    With an executor, every pair of segment and strategy is submitted at once, so the
+    strategies race each other (and the other segments) under the shared ``deadline``. Once
+    all have finished, or the deadline has passed, strategies that have not started are
+    cancelled and the best of the finished results is kept; a strategy that is already
+    running in a worker cannot be interrupted, but stops at its next deadline check. Each
+    strategy has ``segment_budget`` seconds from when it starts. The original segment is a
+    candidate too, and wins ties. Segments for which no strategy finished are left
+    unchanged and, if ``timed_out`` is given, their indices are appended to it. If
+    ``instruments`` are given, they collect the statistics of each run.
+    """
+    funcs: List[Callable[[zx.Circuit], Any]] = [
+        partial(_optimize_unitary_within, strategy=strategy, segment_budget=segment_budget, deadline=deadline)
+        for strategy in portfolio
+    ]
+    if instruments is not None and instruments.enabled:
+        funcs = [instruments.wrap(func) for func in funcs]
+    finished: List[List[zx.Circuit]] = [[] for _ in segments]
+
+    def finish(i: int, strategy: str, outcome: Any) -> None:
+        if instruments is not None:
+            outcome = instruments.collect(segments[i], strategy, outcome)
+        finished[i].append(outcome)
+
+    if executor is None:
+        for i, segment in enumerate(segments):
+            for strategy, func in zip(portfolio, funcs):
+                try:
+                    _check_deadline(deadline)
+                    finish(i, strategy, func(segment))
+                except _SegmentTimeout:
+                    pass
+    else:
+        futures = [[executor.submit(func, segment) for func in funcs] for segment in segments]
+        wait(
+            [future for candidates in futures for future in candidates],
+            timeout=None if deadline is None else max(0.0, deadline - time.monotonic()),
+        )
+        for i, candidates in enumerate(futures):
+            for strategy, future in zip(portfolio, candidates):
+                if not future.done():
+                    future.cancel()
+                    continue
+                try:
+                    finish(i, strategy, future.result())
+                except _SegmentTimeout:
+                    pass
+
+    results = []
+    for i, segment in enumerate(segments):
+        if not finished[i] and timed_out is not None:
+            timed_out.append(i)
+        results.append(min([segment, *finished[i]], key=cost))
+    return results
+
+
+def _cache_lookup(key: str, caches: Sequence[SegmentCacheLike]) -> Optional[zx.Circuit]:
+    """Look ``key`` up in each cache in turn, copying a hit into the caches before it."""
+    for i, cache in enumerate(caches):
+        circuit = cache.get(key)
+        if circuit is not None:
+            for earlier in caches[:i]:
+                earlier.put(key, circuit)
+            return circuit
+    return None
+
+
+def _cut_windows(c: zx.Circuit, window_size: int, offset: int = 0) -> List[zx.Circuit]:
+    """Cut ``c`` into consecutive windows of ``window_size`` gates, the first being ``offset`` gates long."""
+    bounds = [0] + list(range(offset or window_size, len(c.gates), window_size)) + [len(c.gates)]
+    windows = []
+    for begin, end in zip(bounds, bounds[1:]):
+        window = zx.Circuit(c.qubits)
+        for gate in c.gates[begin:end]:
+            window.add_gate(gate)
+        windows.append(window)
+    return windows
+
+
+def _repeat_period(c: zx.Circuit) -> Optional[int]:
+    """Return the length of the shortest block of gates that ``c`` repeats at least twice, if any.
+
+    ``c`` repeats a block of ``p`` gates if each of its gates equals the gate ``p`` places later,
+    as for the layers of a Trotterised circuit. The last repetition may be incomplete.
+    """
+    tokens = [_gate_token(gate) for gate in c.gates]
+    # Knuth-Morris-Pratt failure function: border[i] is the length of the longest proper prefix of
+    # tokens[:i + 1] that is also a suffix of it.
+    border = [0] * len(tokens)
+    for i in range(1, len(tokens)):
+        k = border[i - 1]
+        while k and tokens[i] != tokens[k]:
+            k = border[k - 1]
+        border[i] = k + 1 if tokens[i] == tokens[k] else 0
+    if not tokens:
+        return None
+    period = len(tokens) - border[-1]
+    return period if len(tokens) >= 2 * period else None
+
+
+class _SegmentOptimizer:  # pylint: disable=too-many-instance-attributes
+    """Optimises unitary segments with the default optimiser, with the settings of one :class:`ZXPass` run.
+
+    :param strategy: The name of the pipeline in ``strategies`` to run on each segment.
+    :param executor: Where to run segments; ``None`` runs them serially in this process.
+    :param caches: Segment caches to consult, fastest first.
+    :param deadline: A :func:`time.monotonic` value after which no more optimisation is done.
+    :param segment_budget: The time in seconds each segment may take.
+    :param window_size: If given, segments with more gates than this are optimised in windows of
+        this many gates (see :meth:`optimize_segments`).
+    :param max_window_rounds: The maximum number of windowed rounds per segment.
+    :param detect_repeats: If true, segments that repeat a block of gates (see :func:`_repeat_period`)
+        are optimised in windows of whole blocks, so that each distinct window is optimised once.
+    :param portfolio: If given, the names of several pipelines in ``strategies`` to race on each segment
+        instead of ``strategy`` (see :func:`_race_strategies`).
+    :param cost: The name of the function in ``costs`` that picks the best result of a portfolio.
+    :param predictor: If given, screens segments missing from the caches, which are only optimised if it
+        predicts a benefit.
+    :param collect_stats: If true, the statistics of every segment optimised (see :func:`_with_stats`) are
+        appended to ``segment_stats``.
+    :param hook: If given, every segment optimised and the stages of its pipeline are reported to it.
+    :param causal_segmentation: If true, non-unitary gates only cut the unitary gates in their causal past
+        (see :func:`_split_at_non_unitary`).
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        strategy: str = _DEFAULT_STRATEGY,
+        executor: Optional[Executor] = None,
+        caches: Sequence[SegmentCacheLike] = (),
+        deadline: Optional[float] = None,
+        segment_budget: Optional[float] = None,
+        window_size: Optional[int] = None,
+        max_window_rounds: int = 10,
+        detect_repeats: bool = False,
+        portfolio: Sequence[str] = (),
+        cost: str = "gates",
+        predictor: Optional[BenefitPredictor] = None,
+        collect_stats: bool = False,
+        hook: Optional[PassHook] = None,
+        causal_segmentation: bool = False,
+    ):
+        self.strategy = strategy
+        self.executor = executor
+        self.caches = caches
+        self.deadline = deadline
+        self.segment_budget = segment_budget
+        self.window_size = window_size
+        self.max_window_rounds = max_window_rounds
+        self.detect_repeats = detect_repeats
+        self.portfolio = portfolio
+        self.cost = cost
+        self.predictor = predictor
+        self.causal_segmentation = causal_segmentation
+        self.segment_stats: Optional[List[Dict[str, Any]]] = [] if collect_stats else None
+        self.instruments = _Instruments(self.segment_stats, hook, live=executor is None)
+        # Indices (into the segments of the last batch) of segments that ran out of time, if timing is enabled.
+        self.timed_out: Optional[List[int]] = None
+        if deadline is not None or segment_budget is not None:
+            self.timed_out = []
+
+    @property
+    def strategy_key(self) -> str:
+        """The name under which results are cached: the strategy, or the portfolio and its cost function."""
+        if self.portfolio:
+            return f"portfolio({','.join(self.portfolio)}):{self.cost}"
+        return self.strategy
+
+    def _run(self, segments: List[zx.Circuit], timed_out: Optional[List[int]] = None) -> List[zx.Circuit]:
+        """Optimise each segment with the strategy or portfolio, on the executor, as :func:`_map_segments` does."""
+        if self.portfolio:
+            return _race_strategies(
+                segments,
+                self.portfolio,
+                costs[self.cost],
+                self.executor,
+                self.segment_budget,
+                self.deadline,
+                timed_out,
+                self.instruments,
+            )
+        func: Callable[[zx.Circuit], Any] = strategies[self.strategy]
+        if self.timed_out is not None:
+            func = partial(
+                _optimize_unitary_within,
+                strategy=self.strategy,
+                segment_budget=self.segment_budget,
+                deadline=self.deadline,
+            )
+        if not self.instruments.enabled:
+            return _map_segments(func, segments, self.executor, self.deadline, timed_out)
+
+        func = cast(Callable[[zx.Circuit], zx.Circuit], self.instruments.wrap(func))
+        outcomes = _map_segments(func, segments, self.executor, self.deadline, timed_out)
+        return [
+            self.instruments.collect(segment, self.strategy, outcome) for segment, outcome in zip(segments, outcomes)
+        ]
+
+    def _optimize_batch(  # pylint: disable=too-many-locals
+        self, segments: List[zx.Circuit], timed_out: Optional[List[int]] = None
+    ) -> List[zx.Circuit]:
+        """Optimise each segment as a whole, consulting the caches first.
+
+        Each segment is split into groups of qubits that never interact (see
+        :func:`_split_components`), and each group is compacted to the qubits it acts on (see
+        :func:`canonical_form`) and looked up or optimised as its own, smaller problem. The results
+        are mapped back onto the original qubits and concatenated. Segments any part of which
+        runs out of time (see :func:`_map_segments`) are returned unchanged and recorded in
+        ``timed_out``.
+        """
+        components = [_split_components(segment) for segment in segments]
+        owners = [i for i, parts in enumerate(components) for _ in parts]
+        compacted = [canonical_form(part) for parts in components for part in parts]
+        parts_timed_out: Optional[List[int]] = None if timed_out is None else []
+        optimized = self._optimize_compacted([circuit for circuit, _ in compacted], parts_timed_out)
+        expired = {owners[j] for j in parts_timed_out or ()}
+        if timed_out is not None:
+            timed_out.extend(sorted(expired))
+
+        results = []
+        begin = 0
+        for i, segment in enumerate(segments):
+            end = begin + len(components[i])
+            parts, part_results = compacted[begin:end], optimized[begin:end]
+            begin = end
+            if i in expired or all(_unchanged(circuit, result) for (circuit, _), result in zip(parts, part_results)):
+                results.append(segment)
+            else:
+                results.append(_merge_components(segment, parts, part_results))
+        return results
+
+    def _optimize_compacted(
+        self, segments: List[zx.Circuit], timed_out: Optional[List[int]] = None
+    ) -> List[zx.Circuit]:
+        """Optimise each compacted segment, optimising identical segments only once.
+
+        Segments with the same gates (e.g. repeated layers of a circuit, which :func:`canonical_form`
+        maps to the same qubits) share the result of one optimisation, which is looked up in or added to
+        the caches as :meth:`_optimize_distinct` describes.
+        """
+        keys = [f"{self.strategy_key}:{segment_fingerprint(segment)}" for segment in segments]
+        positions: Dict[str, int] = {}
+        distinct: List[int] = []
+        for i, key in enumerate(keys):
+            if key not in positions:
+                positions[key] = len(distinct)
+                distinct.append(i)
+        distinct_timed_out: Optional[List[int]] = None if timed_out is None else []
+        optimized = self._optimize_distinct(
+            [segments[i] for i in distinct], [keys[i] for i in distinct], distinct_timed_out
+        )
+        if timed_out is not None:
+            expired = {keys[distinct[j]] for j in distinct_timed_out or ()}
+            timed_out.extend(i for i, key in enumerate(keys) if key in expired)
+
+        results = []
+        for i, key in enumerate(keys):
+            first = distinct[positions[key]]
+            result = optimized[positions[key]]
+            if i != first:
+                # Keep the result of an unchanged duplicate recognisable as unchanged, and never share gates.
+                result = segments[i] if result is segments[first] else _copy_circuit(result)
+            results.append(result)
+        return results
+
+    def _optimize_distinct(  # pylint: disable=too-many-locals
+        self, segments: List[zx.Circuit], keys: List[str], timed_out: Optional[List[int]] = None
+    ) -> List[zx.Circuit]:
+        """Optimise each of a list of distinct compacted segments, consulting the caches first.
+
+        The caches are tried in order (e.g. in-memory before on-disk). Only segments missing
+        from all of them (and, with a predictor, that it expects to improve) are sent to the
+        executor; their results are added to every cache, except for segments that ran out of
+        time. Since keys are computed on canonical forms of segments, the same gates acting on
+        different qubits share one entry. Segments the predictor rejects are returned
+        unchanged and are not cached.
+        """
+        results: List[Optional[zx.Circuit]] = [_cache_lookup(key, self.caches) for key in keys]
+        misses = [i for i, result in enumerate(results) if result is None]
+        audits = set()
+        if self.predictor is not None:
+            attempts = []
+            for i in misses:
+                attempt, audit = self.predictor.screen(segments[i])
+                if attempt:
+                    attempts.append(i)
+                    if audit:
+                        audits.add(i)
+                else:
+                    results[i] = segments[i]
+            misses = attempts
+        missed_timeouts: Optional[List[int]] = None if timed_out is None else []
+        optimized = self._run([segments[i] for i in misses], missed_timeouts)
+        expired = {misses[j] for j in missed_timeouts or ()}
+        for i, circuit in zip(misses, optimized):
+            if i not in expired:
+                for cache in self.caches:
+                    cache.put(keys[i], circuit)
+                if self.predictor is not None:
+                    self.predictor.record(segments[i], not _unchanged(segments[i], circuit), audit=i in audits)
+            results[i] = circuit
+        if timed_out is not None:
+            timed_out.extend(sorted(expired))
+        return results  # type: ignore[return-value]
+
+    def _window_size(self, c: zx.Circuit) -> Optional[int]:
+        """Return the size of the windows to cut ``c`` into, or ``None`` to optimise it whole.
+
+        With ``detect_repeats``, a segment that repeats a block of gates is cut into windows of
+        as many whole blocks as fit in ``window_size`` (at least one), so that its windows are
+        identical and only optimised once.
+        """
+        size = self.window_size
+        if self.detect_repeats:
+            period = _repeat_period(c)
+            if period is not None:
+                size = period * max(1, (size or period) // period)
+        return size if size is not None and len(c.gates) > size else None
+
+    def optimize_segments(  # pylint: disable=too-many-locals,too-many-branches
+        self, segments: List[zx.Circuit]
+    ) -> List[zx.Circuit]:
+        """Optimise a batch of unitary segments, returning the results in the same order.
+
+        Without a ``window_size``, each segment is optimised as a whole. Otherwise, each
+        segment longer than ``window_size`` gates is cut into windows that are optimised
+        independently (and together with every other window in the batch, so they can run
+        in parallel) and stitched back together. This repeats, alternately shifting the
+        window boundaries by half a window so that gates on either side of a previous
+        boundary can meet, until neither alignment shortens the segment any further. Since
+        extraction cost grows super-linearly in the size of the graph, this trades some
+        optimisation quality for roughly linear scaling in segment length. With
+        ``detect_repeats``, window sizes are chosen per segment by :meth:`_window_size`.
+        """
+        if self.timed_out is not None:
+            self.timed_out.clear()
+        if self.window_size is None and not self.detect_repeats:
+            return self._optimize_batch(segments, self.timed_out)
+
+        results = list(segments)
+        # Segments still being windowed, with their number of consecutive rounds without improvement.
+        active = {i: 0 for i, segment in enumerate(segments) if self._window_size(segment) is not None}
+        whole = [i for i in range(len(segments)) if i not in active]
+        for round_index in range(self.max_window_rounds):
+            batch: List[zx.Circuit] = []
+            owners: List[int] = []
+            if round_index == 0:
+                batch.extend(segments[i] for i in whole)
+                owners.extend(whole)
+            for i in list(active):
+                window_size = self._window_size(results[i])
+                if window_size is None:
+                    del active[i]
+                    continue
+                offset = 0 if round_index % 2 == 0 else max(1, window_size // 2)
+                windows = _cut_windows(results[i], window_size, offset)
+                batch.extend(windows)
+                owners.extend([i] * len(windows))
+            if not batch:
+                break
+
+            batch_timed_out: Optional[List[int]] = None if self.timed_out is None else []
+            optimized = self._optimize_batch(batch, batch_timed_out)
+            expired = {owners[j] for j in batch_timed_out or ()}
+            if self.timed_out is not None:
+                self.timed_out.extend(sorted(expired - set(self.timed_out)))
+
+            stitched: Dict[int, zx.Circuit] = {}
+            for owner, circuit in zip(owners, optimized):
+                if owner not in active:
+                    results[owner] = circuit
+                    continue
+                if owner not in stitched:
+                    stitched[owner] = zx.Circuit(segments[owner].qubits)
+                for gate in circuit.gates:
+                    stitched[owner].add_gate(gate)
+            for i, circuit in stitched.items():
+                if len(circuit.gates) < len(results[i].gates):
+                    results[i] = circuit
+                    active[i] = 0
+                else:
+                    active[i] += 1
+            # Stop once both window alignments have failed to improve a segment, or it ran out of time.
+            active = {i: misses for i, misses in active.items() if misses < 2 and i not in expired}
+        return results
+
+    def optimize_circuits(self, circuits: List[zx.Circuit]) -> List[zx.Circuit]:
+        """Optimise several PyZX circuits, handling hybrid (non-unitary) circuits.
+
+        Every circuit is split at its non-unitary boundaries and the unitary segments of
+        *all* circuits are optimised as one batch, so that an executor can work on
+        segments from different circuits at the same time. Results are reassembled in
+        their original order, so the output does not depend on whether (or how) the
+        work was distributed. Indices in ``timed_out`` refer to this batch of segments.
+        """
+        split = [_split_at_non_unitary(c, self.causal_segmentation) for c in circuits]
+        segments = [part for parts in split for part in parts if isinstance(part, zx.Circuit)]
+        optimized = iter(self.optimize_segments(segments))
+        return [_reassemble(c, parts, optimized) for c, parts in zip(circuits, split)]
+
+
+def _optimize(c: zx.Circuit, executor: Optional[Executor] = None) -> zx.Circuit:
+    """Optimise a PyZX circuit, handling hybrid (non-unitary) circuits.
+
+    For purely unitary circuits, uses full_reduce + extract_circuit. For hybrid
+    circuits containing measurements, resets, or conditional gates, splits the
+    circuit at non-unitary boundaries, optimises each unitary segment
+    independently (on ``executor``, if given), and reassembles.
+    """
+    return _SegmentOptimizer(executor=executor).optimize_circuits([c])[0]
@@ -0,0 +1,81 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Finding the segments of a DAG that optimisation changed, and whether they can be replaced in place."""
+
+from typing import Dict, List, Optional, Tuple
+
+import pyzx as zx
+from pyzx.circuit.gates import Measurement as PyzxMeasurement, ConditionalGate
+
+from qiskit.circuit import Bit, Clbit, Qubit
+from qiskit.dagcircuit import DAGCircuit, DAGOpNode
+
+from .cache import segment_fingerprint
+from .compaction import _gate_qubits
+
+
+def _unchanged(circuit: zx.Circuit, optimized: zx.Circuit) -> bool:
+    """Return whether optimising ``circuit`` left its gates as they were."""
+    return optimized is circuit or (
+        len(optimized.gates) == len(circuit.gates) and segment_fingerprint(optimized) == segment_fingerprint(circuit)
+    )
+
+
+def _block_bits(
+    nodes: List[DAGOpNode], optimized: zx.Circuit, qubit_indices: Dict[Qubit, int], clbit_indices: Dict[Clbit, int]
+) -> Optional[List[Bit]]:
+    """Return the bits of the DAG nodes of a segment, qubits then clbits, each in the order of the DAG.
+
+    Returns ``None`` if the optimised segment cannot replace the nodes in place: when it contains a conditional gate
+    (whose condition names a register of the whole DAG) or acts on a bit the nodes do not.
+    """
+    qubits = {qubit for node in nodes for qubit in node.qargs}
+    clbits = {clbit for node in nodes for clbit in node.cargs}
+    qubit_set = {qubit_indices[qubit] for qubit in qubits}
+    clbit_set = {clbit_indices[clbit] for clbit in clbits}
+    for gate in optimized.gates:
+        if isinstance(gate, ConditionalGate):
+            return None
+        if not qubit_set.issuperset(_gate_qubits(gate)):
+            return None
+        if isinstance(gate, PyzxMeasurement) and gate.result_bit not in clbit_set:
+            return None
+    bits: List[Bit] = sorted(qubits, key=qubit_indices.__getitem__)
+    bits.extend(sorted(clbits, key=clbit_indices.__getitem__))
+    return bits
+
+
+def _changed_segments(
+    dag: DAGCircuit,
+    segment_nodes: List[List[DAGOpNode]],
+    circuits: List[zx.Circuit],
+    optimized_circuits: List[zx.Circuit],
+) -> Optional[List[Tuple[List[DAGOpNode], zx.Circuit, List[Bit]]]]:
+    """Return the nodes, optimised circuit and bits of each segment that optimisation changed.
+
+    Returns ``None`` if any of them cannot replace its nodes in place (see :func:`_block_bits`).
+    """
+    qubit_indices = {qubit: index for index, qubit in enumerate(dag.qubits)}
+    clbit_indices = {clbit: index for index, clbit in enumerate(dag.clbits)}
+    changed = []
+    for nodes, circuit, optimized in zip(segment_nodes, circuits, optimized_circuits):
+        if _unchanged(circuit, optimized):
+            continue
+        bits = _block_bits(nodes, optimized, qubit_indices, clbit_indices)
+        if bits is None:
+            return None
+        changed.append((nodes, optimized, bits))
+    return changed
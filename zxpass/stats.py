@@ -0,0 +1,194 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Collection of timings and graph statistics for ``property_set["zxpass_stats"]`` and for hooks."""
+
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from itertools import count
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pyzx as zx
+
+from .hooks import PassHook
+
+# The statistics of the segment being optimised on each thread, while :func:`_with_stats` collects them, and
+# the hook to report its stages to, with the segment's number, if it is optimised in this process.
+_segment_stats = threading.local()
+
+
+@contextmanager
+def _timed(times: Optional[Dict[str, Any]], name: str) -> Iterator[None]:
+    """Add the wall time of the enclosed block to ``times[name]``, unless ``times`` is ``None``."""
+    if times is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        times[name] = times.get(name, 0.0) + time.perf_counter() - start
+
+
+@contextmanager
+def _run_stage(times: Optional[Dict[str, Any]], hook: Optional[PassHook], name: str) -> Iterator[None]:
+    """Time the enclosed stage of a run into ``times`` as :func:`_timed` does, and report it to ``hook``, if any."""
+    if hook is None:
+        with _timed(times, name):
+            yield
+        return
+    hook.on_stage_start(name, None)
+    start = time.perf_counter()
+    try:
+        with _timed(times, name):
+            yield
+    finally:
+        hook.on_stage_end(name, None, time.perf_counter() - start, None)
+
+
+def _current_stats() -> Optional[Dict[str, Any]]:
+    """Return the statistics being collected for the segment optimised on this thread, if any."""
+    return getattr(_segment_stats, "current", None)
+
+
+@contextmanager
+def _recorded_stage(stats: Dict[str, Any], name: str) -> Iterator[None]:
+    """Record the enclosed stage of a pipeline in ``stats``, reporting it to the current hook, if any."""
+    hook: Optional[Tuple[PassHook, int]] = getattr(_segment_stats, "hook", None)
+    if hook is not None:
+        hook[0].on_stage_start(name, hook[1])
+    _segment_stats.graph = None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stats[f"{name}_time"] = stats.get(f"{name}_time", 0.0) + elapsed
+        graph_stats = _segment_stats.graph
+        stats["stages"].append((name, elapsed, graph_stats))
+        if hook is not None:
+            hook[0].on_stage_end(name, hook[1], elapsed, graph_stats)
+
+
+def _stage(name: str) -> Any:
+    """Record the enclosed stage of a pipeline in the current segment's statistics, if they are being collected.
+
+    The stage's wall time is added to the statistics' ``<name>_time``, and the stage, with the size of any ZX-graph
+    that :func:`_record_graph` recorded during it, is appended to their ``"stages"``.
+    """
+    stats = _current_stats()
+    return nullcontext() if stats is None else _recorded_stage(stats, name)
+
+
+def _record_graph(g: Any, when: str) -> None:
+    """Record the numbers of vertices and edges of ``g`` in the current segment's statistics, if any."""
+    stats = _current_stats()
+    if stats is not None:
+        stats[f"vertices_{when}"] = g.num_vertices()
+        stats[f"edges_{when}"] = g.num_edges()
+        _segment_stats.graph = {"vertices": stats[f"vertices_{when}"], "edges": stats[f"edges_{when}"]}
+
+
+def _with_stats(
+    func: Callable[[zx.Circuit], zx.Circuit],
+    c: zx.Circuit,
+    hook: Optional[PassHook] = None,
+    numbers: Optional[Iterator[int]] = None,
+) -> Tuple[zx.Circuit, Dict[str, Any]]:
+    """Run ``func`` on ``c``, also returning statistics about the run.
+
+    The statistics hold the segment's number of qubits, its gate counts before and after, the
+    total wall time, whether the result was discarded because it was not smaller
+    (``"discarded"``), and whatever the pipeline's stages recorded: the wall time of each stage
+    (e.g. ``"simplify_time"``), the size of the ZX-graph before and after simplification
+    (e.g. ``"vertices_before"``) and the stages in order (``"stages"``). This runs wherever
+    ``func`` does, including in a worker process. If a ``hook`` is given, the segment and its
+    stages are reported to it as they run, under the next number from ``numbers``.
+    """
+    stats: Dict[str, Any] = {"qubits": c.qubits, "gates_in": len(c.gates), "stages": []}
+    segment = -1
+    if hook is not None and numbers is not None:
+        segment = next(numbers)
+        hook.on_segment_start(segment, c)
+        _segment_stats.hook = (hook, segment)
+    _segment_stats.current = stats
+    result = c
+    start = time.perf_counter()
+    try:
+        result = func(c)
+        stats["discarded"] = result is c and bool(stats["stages"])
+    finally:
+        _segment_stats.current = None
+        _segment_stats.hook = None
+        stats["time"] = time.perf_counter() - start
+        if hook is not None:
+            hook.on_segment_end(segment, result, stats["time"])
+    stats["gates_out"] = len(result.gates)
+    return result, stats
+
+
+class _Instruments:
+    """Collects the statistics of the segments that one run optimises, and reports them to its hook.
+
+    Segments optimised in this process are reported to the hook as they run. For segments
+    optimised on an executor, the hook cannot be called where they run, so their recorded
+    statistics are reported once their result is back (see :meth:`collect`).
+
+    :param stats: The list to append the statistics of each segment to, if any.
+    :param hook: The hook to report segments and their stages to, if any.
+    :param live: Whether segments are optimised in this process.
+    """
+
+    def __init__(self, stats: Optional[List[Dict[str, Any]]], hook: Optional[PassHook], live: bool):
+        self.stats = stats
+        self.hook = hook
+        self.live = live
+        self._numbers = count()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether there is anything to collect."""
+        return self.stats is not None or self.hook is not None
+
+    def wrap(self, func: Callable[[zx.Circuit], Any]) -> Callable[[zx.Circuit], Any]:
+        """Wrap a segment function to also return its statistics (see :func:`_with_stats`)."""
+        if self.live:
+            return partial(_with_stats, func, hook=self.hook, numbers=self._numbers)
+        return partial(_with_stats, func)
+
+    def collect(self, segment: zx.Circuit, strategy: str, outcome: Any) -> zx.Circuit:
+        """Record the statistics returned by a wrapped segment function and return its result.
+
+        :param segment: The segment the function ran on.
+        :param strategy: The name of the strategy the function ran.
+        :param outcome: What the wrapped function returned; a segment that ran out of time is passed back as it
+            was, without statistics.
+        :return: The optimised segment.
+        """
+        if not isinstance(outcome, tuple):
+            return outcome
+        result, entry = outcome
+        stages = entry.pop("stages")
+        if self.stats is not None:
+            self.stats.append({"strategy": strategy, **entry})
+        if self.hook is not None and not self.live:
+            number = next(self._numbers)
+            self.hook.on_segment_start(number, segment)
+            for name, elapsed, graph_stats in stages:
+                self.hook.on_stage_end(name, number, elapsed, graph_stats)
+            self.hook.on_segment_end(number, result, entry["time"])
+        return result
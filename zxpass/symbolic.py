@@ -0,0 +1,99 @@
+# ZX transpiler pass for Qiskit
+# Copyright (C) 2023 David Yonge-Mallo
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Conversion between Qiskit angles and PyZX phases, both numeric and symbolic."""
+
+from fractions import Fraction
+from typing import Callable, Dict, Optional, Union
+
+import numpy as np
+from pyzx.symbolic import Poly, new_var
+
+from qiskit.circuit import Parameter, ParameterExpression
+
+
+def _exact_phase(phase: float, precision: int) -> Fraction:  # pylint: disable=unused-argument
+    """Convert ``phase`` (in units of pi) to the exact Fraction equal to the float."""
+    return Fraction(phase)
+
+
+def _limit_denominator_phase(phase: float, precision: int) -> Fraction:
+    """Convert ``phase`` (in units of pi) to the closest Fraction with a denominator of at most ``2**precision``."""
+    return Fraction(phase).limit_denominator(1 << precision)
+
+
+def _dyadic_phase(phase: float, precision: int) -> Fraction:
+    """Convert ``phase`` (in units of pi) to the closest multiple of ``1 / 2**precision``."""
+    return Fraction(round(phase * (1 << precision)), 1 << precision)
+
+
+# Ways of converting Qiskit angles to PyZX phases, by name.
+phase_modes: Dict[str, Callable[[float, int], Fraction]] = {
+    "exact": _exact_phase,
+    "limit_denominator": _limit_denominator_phase,
+    "dyadic": _dyadic_phase,
+}
+
+
+def parameter_to_phase(
+    param: ParameterExpression, to_phase: Callable[[float], Fraction], parameters: Dict[str, Parameter]
+) -> Optional[Poly]:
+    """Convert a Qiskit parameter expression to a symbolic PyZX phase (in units of pi).
+
+    Each parameter ``p`` becomes a PyZX variable of the same name standing for ``p / pi``, so
+    a linear expression ``a * p + b`` becomes the polynomial ``a * x + b / pi``. The constant
+    ``b`` is converted with ``to_phase``. Each parameter is recorded in ``parameters`` by name,
+    for :func:`phase_to_parameter`.
+
+    :param param: The expression to convert.
+    :param to_phase: The conversion to use for the expression's constant term, in radians.
+    :param parameters: The parameters seen so far, by name. Updated in place.
+    :return: The phase, or ``None`` if the expression is not linear with real coefficients.
+    """
+    phase = Poly([])
+    for parameter in param.parameters:
+        coefficient = param.gradient(parameter)
+        if isinstance(coefficient, ParameterExpression) or complex(coefficient).imag != 0:
+            return None
+        exact = Fraction(float(complex(coefficient).real))
+        # Prefer a small fraction (e.g. 1/3 rather than the float closest to it) if it is the same float.
+        small = exact.limit_denominator(1 << 16)
+        phase = phase + new_var(parameter.name, is_bool=False) * (small if float(small) == float(exact) else exact)
+        parameters[parameter.name] = parameter
+    constant = complex(param.bind({parameter: 0 for parameter in param.parameters}))
+    if constant.imag != 0:
+        return None
+    return phase + to_phase(constant.real)
+
+
+def phase_to_parameter(phase: Poly, parameters: Dict[str, Parameter]) -> Union[ParameterExpression, float]:
+    """Convert a symbolic PyZX phase back to a Qiskit angle, the inverse of :func:`parameter_to_phase`.
+
+    :param phase: The phase to convert, in units of pi.
+    :param parameters: The parameters named by the phase's variables, by name.
+    :return: The angle in radians: an expression in the parameters, or a float if none remain.
+    """
+    angle: Union[ParameterExpression, float] = 0.0
+    for coefficient, term in phase.terms:
+        if isinstance(coefficient, complex):
+            raise ValueError(f"Unsupported complex phase: {phase}.")
+        # Each variable stands for a parameter divided by pi, so a term of degree d carries a factor of pi**(1 - d).
+        degree = sum(exponent for _, exponent in term.vars)
+        value: Union[ParameterExpression, float] = float(coefficient) * np.pi ** (1 - degree)
+        for var, exponent in term.vars:
+            value = value * (parameters[var.name] if exponent == 1 else parameters[var.name] ** exponent)
+        angle = angle + value
+    return angle
@@ -15,15 +15,27 @@
 
 """A transpiler pass for Qiskit which uses ZX-Calculus for circuit optimization, implemented using PyZX."""
 
-from typing import Any, Dict, List, Tuple, Callable, Optional, Type, Union
+from typing import AbstractSet, Any, cast, Dict, Hashable, Iterator, List, Tuple, Callable, Optional, Sequence
+from typing import Type, Union
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from operator import attrgetter
+import numbers
+import time
 from fractions import Fraction
 import numpy as np
 
 from qiskit.transpiler.basepasses import TransformationPass
-from qiskit.dagcircuit import DAGCircuit, DAGOpNode
+from qiskit.circuit.parameterexpression import ParameterValueType
+from qiskit.dagcircuit import DAGCircuit, DAGNode, DAGOpNode
+from qiskit.converters import circuit_to_dag, dag_to_circuit
 from qiskit.circuit import (
+    Bit,
+    Clbit,
     Qubit,
     Instruction,
+    Parameter,
+    ParameterExpression,
     Measure,
     Reset,
     ClassicalRegister,
@@ -57,7 +69,6 @@ from qiskit.circuit.library import (
 from qiskit.circuit.library import CSwapGate, CCXGate, CCZGate
 
 import pyzx as zx
-from pyzx.optimize import basic_optimization
 from pyzx.circuit.gates import Gate
 from pyzx.circuit.gates import NOT, Y, Z, S, T, HAD, SX
 from pyzx.circuit.gates import XPhase, YPhase, ZPhase, U2, U3
@@ -66,6 +77,26 @@ from pyzx.circuit.gates import CRX, CRY, CRZ, CPhase, RXX, RZZ, CU3, CU
 from pyzx.circuit.gates import CSWAP, Tofolli, CCZ
 from pyzx.circuit.gates import Measurement as PyzxMeasurement, Reset as PyzxReset
 from pyzx.circuit.gates import ConditionalGate
+from pyzx.symbolic import Poly
+
+from .cache import DAGCache, SegmentCache, PersistentSegmentCache, dag_fingerprint, _onto_bits
+from .hooks import PassHook
+from .predictor import BenefitPredictor
+from .splicing import _changed_segments
+from .stats import _run_stage
+from .segments import (
+    _DEFAULT_STRATEGY,
+    SegmentCacheLike,
+    _SegmentOptimizer,
+    _causal_split,
+    _map_segments,
+    _optimize,
+    _process_pool,
+    costs,
+    strategies,
+)
+from .symbolic import parameter_to_phase, phase_modes, phase_to_parameter
+from .segments import compute_output_permutation  # pylint: disable=unused-import  # noqa: F401
 
 qiskit_gate_table: Dict[str, Tuple[Type[Gate], Type[Instruction], int, int]] = {
     # OpenQASM gate name: (PyZX gate type, Qiskit gate type, number of qubits, number of parameters, adjoint)
@@ -116,200 +147,368 @@ _conditional_inner_gates = {
 }
 
 
-def _is_unitary_gate(gate: Gate) -> bool:
-    """Check whether a PyZX gate is a unitary gate (not measurement, reset, or conditional)."""
-    return not isinstance(gate, (PyzxMeasurement, PyzxReset, ConditionalGate))
-
+# How to recover each kind of unitary PyZX gate, keyed by gate type and adjoint flag: a function returning the
+# gate's qubits (in the order Qiskit expects), a shared Qiskit instance for parameterless gates, the Qiskit gate
+# type, and the attribute ("phase" or "phases") holding the gate's parameters, if any. Filled in on first use.
+_recovery_table: Dict[
+    Tuple[Type[Gate], bool], Tuple[Callable[[Gate], Tuple[int, ...]], Optional[Instruction], Type[Instruction], str]
+] = {}
+
+
+def _gate_recovery(
+    gate: Gate,
+) -> Tuple[Callable[[Gate], Tuple[int, ...]], Optional[Instruction], Type[Instruction], str]:
+    """Look up (or work out and remember) how to recover a unitary PyZX gate as a Qiskit gate."""
+    key = (type(gate), bool(getattr(gate, "adjoint", False)))
+    entry = _recovery_table.get(key)
+    if entry is not None:
+        return entry
+    gate_name = gate.qasm_name_adjoint if key[1] else gate.qasm_name
+    if gate_name not in qiskit_gate_table:
+        raise ValueError(f"Unsupported gate: {gate_name}.")
+    _, gate_type, _, num_params, *_ = qiskit_gate_table[gate_name]
+    attrs = [attr for attr in ("ctrl1", "ctrl2", "control", "target") if hasattr(gate, attr)]
+    qubit_of = attrgetter(attrs[0])
+
+    def single_qubit(g: Gate) -> Tuple[int, ...]:
+        return (qubit_of(g),)
+
+    qubits_of = single_qubit if len(attrs) == 1 else cast(Callable[[Gate], Tuple[int, ...]], attrgetter(*attrs))
+    phase_attr = ""
+    if num_params > 0 and hasattr(gate, "phase"):
+        phase_attr = "phase"
+    elif num_params > 0 and hasattr(gate, "phases"):
+        phase_attr = "phases"
+    instance = gate_type() if num_params == 0 else None
+    entry = (qubits_of, instance, gate_type, phase_attr)
+    _recovery_table[key] = entry
+    return entry
+
+
+# Prefix of the names of the parameters standing for the angles of a structural template, followed by their index.
+_TEMPLATE_ANGLE_PREFIX = "_zxpass_angle_"
+
+
+def _is_template_angle(name: str, param: Any) -> bool:
+    """Return whether ``param`` of an operation called ``name`` is left out of a structural template.
+
+    These are the numeric angles of the gates PyZX supports, except for multiples of pi/4: those are Clifford+T
+    phases that the ZX rewrites can exploit, so they are kept as part of the structure.
+    """
+    if name not in qiskit_gate_table or not isinstance(param, numbers.Real):
+        return False
+    quarter_turns = float(param) * 4 / np.pi
+    return abs(quarter_turns - round(quarter_turns)) > 1e-9
 
-def compute_output_permutation(g: Any) -> Dict[int, int]:
-    """Compute the output-to-input qubit permutation from a post-extraction graph.
 
-    After ``extract_circuit(g, up_to_perm=True)`` the graph *g* is mutated so
-    that only boundary vertices (inputs and outputs) remain.  Each output vertex
-    is connected to exactly one input vertex.  This function reads that mapping
-    and returns a dict ``{output_qubit_index: input_qubit_index}``.
+def _template_angles(dag: DAGCircuit) -> List[float]:
+    """Return the angles of ``dag`` left out of its structural template, in topological order."""
+    return [
+        float(param)
+        for node in dag.topological_op_nodes()
+        for param in node.op.params
+        if _is_template_angle(node.op.name, param)
+    ]
 
-    Qubit indices are those reported by ``g.qubit(v)`` for each boundary
-    vertex, matching the qubit numbering that pyzx uses elsewhere (e.g. the
-    ``target``/``control`` fields of extracted gates).
 
-    Raises ``ValueError`` if the extracted connectivity does not describe a
-    bijection (e.g. mismatched input/output counts, outputs with more than one
-    neighbour, outputs connected to non-input vertices, or two outputs sharing
-    an input).
+def _insertion_order(dag: DAGCircuit) -> Callable[[DAGNode], str]:
+    """Return a sort key for :py:meth:`~qiskit.dagcircuit.DAGCircuit.topological_op_nodes` by insertion order.
 
-    Only uses public pyzx graph API (``g.inputs()``, ``g.outputs()``,
-    ``g.neighbors()``, ``g.qubit()``).
+    :py:meth:`~qiskit.dagcircuit.DAGCircuit.nodes` lists the nodes in the order they were added. Qiskit compares the
+    keys as strings, so the positions are zero-padded to sort numerically.
     """
-    inputs = list(g.inputs())
-    outputs = list(g.outputs())
-    if len(inputs) != len(outputs):
-        raise ValueError(
-            f"Expected equal numbers of inputs and outputs, "
-            f"got {len(inputs)} inputs and {len(outputs)} outputs."
-        )
-    input_qubit_of_vertex = {v: g.qubit(v) for v in inputs}
-    perm: Dict[int, int] = {}
-    for out_v in outputs:
-        neighbors = list(g.neighbors(out_v))
-        if len(neighbors) != 1:
-            raise ValueError(
-                f"Expected output vertex {out_v} to have exactly one "
-                f"neighbour after extraction, got {len(neighbors)}."
-            )
-        in_v = neighbors[0]
-        if in_v not in input_qubit_of_vertex:
-            raise ValueError(
-                f"Output vertex {out_v} is connected to vertex {in_v} "
-                f"which is not an input vertex."
-            )
-        out_q = g.qubit(out_v)
-        if out_q in perm:
-            raise ValueError(
-                f"Multiple output vertices share qubit index {out_q}."
-            )
-        perm[out_q] = input_qubit_of_vertex[in_v]
-    if len(set(perm.values())) != len(perm):
-        raise ValueError(
-            "Output-to-input mapping is not bijective; "
-            "multiple outputs map to the same input."
-        )
-    return perm
+    nodes = list(dag.nodes())
+    width = len(str(len(nodes)))
+    order = {node: f"{i:0{width}d}" for i, node in enumerate(nodes)}
+    return order.__getitem__
 
 
-def _permutation_to_swaps(perm: Dict[int, int]) -> List[Tuple[int, int]]:
-    """Decompose a permutation into transpositions (SWAP pairs).
+def _symbolic_copy(dag: DAGCircuit) -> DAGCircuit:
+    """Return a copy of ``dag`` with each angle left out of its structural template replaced by a parameter.
 
-    Uses cycle decomposition.  The returned list, applied left to right,
-    implements the forward permutation (wire *j* ends up holding the state
-    of input qubit ``perm[j]``).
-
-    Raises ``ValueError`` if ``perm`` is not a bijection on
-    ``range(len(perm))`` (i.e. if its keys or values are not exactly the
-    set of integers ``{0, 1, ..., len(perm) - 1}``).
-    """
-    n = len(perm)
-    expected = set(range(n))
-    if set(perm.keys()) != expected:
-        raise ValueError(
-            f"Expected permutation keys to be range({n}), "
-            f"got {sorted(perm.keys())}."
-        )
-    if set(perm.values()) != expected:
-        raise ValueError(
-            f"Expected permutation values to be a permutation of range({n}), "
-            f"got {sorted(perm.values())}."
-        )
-    current = [perm[i] for i in range(n)]
-    swaps: List[Tuple[int, int]] = []
-    for i in range(n):
-        while current[i] != i:
-            j = current[i]
-            swaps.append((i, j))
-            current[i], current[j] = current[j], current[i]
-    swaps.reverse()
-    return swaps
-
-
-def _optimize_unitary(c: zx.Circuit) -> zx.Circuit:
-    """Optimise a purely unitary PyZX circuit using full_reduce and extraction.
-
-    Extracts with ``up_to_perm=True`` so that ``basic_optimization`` runs on a
-    circuit free of SWAP-decomposition clutter.  The output permutation is then
-    prepended as SWAP gates (each counting as one gate rather than three CNOTs),
-    giving a fairer gate-count comparison against the original circuit.  If the
-    result still has at least as many gates as the original, the original is
-    returned unchanged to avoid regressions on small circuits with compact
-    multi-qubit gates (e.g. Toffoli, Fredkin). The comparison counts PyZX gate
-    objects directly; since ``_recover_dag`` emits one Qiskit op per PyZX gate,
-    this matches the Qiskit-side ``size()`` that downstream passes see.
-    """
-    g = c.to_graph()
-    zx.simplify.full_reduce(g)
-    optimized = zx.extract.extract_circuit(g, up_to_perm=True)
-    perm = compute_output_permutation(g)
-    optimized = basic_optimization(optimized.to_basic_gates(), do_swaps=False)
-    # Prepend SWAP gates for the output permutation.
-    swap_pairs = _permutation_to_swaps(perm)
-    if swap_pairs:
-        with_perm = zx.Circuit(c.qubits)
-        for i, j in swap_pairs:
-            with_perm.add_gate(SWAP(i, j))
-        for gate in optimized.gates:
-            with_perm.add_gate(gate)
-        optimized = with_perm
-    # TODO: Consider a two-axis comparison keyed primarily on 2-qubit gate
-    # count (``twoqubitcount()``), with total gate count as a tiebreaker. The
-    # 2-qubit count is the dominant hardware cost and is naturally apples-to-
-    # apples across gate bases (a Toffoli's 2-qubit count is 6 whether it is
-    # stored as a single gate object or as its 15-gate basic decomposition),
-    # but a naive drop-in replacement misses 1-qubit blow-ups and needs a
-    # tiebreaker to handle equal 2-qubit counts.
-    if len(optimized.gates) < len(c.gates):
-        return optimized
-    return c
-
-
-def _optimize(c: zx.Circuit) -> zx.Circuit:
-    """Optimise a PyZX circuit, handling hybrid (non-unitary) circuits.
-
-    For purely unitary circuits, uses full_reduce + extract_circuit. For hybrid
-    circuits containing measurements, resets, or conditional gates, splits the
-    circuit at non-unitary boundaries, optimises each unitary segment
-    independently, and reassembles.
+    The parameters are numbered in the order :func:`_template_angles` returns the angles.
     """
-    if all(_is_unitary_gate(g) for g in c.gates):
-        return _optimize_unitary(c)
-
-    # Split the circuit into unitary segments and non-unitary gates.
-    result = zx.Circuit(c.qubits, bit_amount=c.bits or None)
-    current_gates: List[Gate] = []
-
-    def _flush_unitary() -> None:
-        if not current_gates:
-            return
-        segment = zx.Circuit(c.qubits)
-        for g in current_gates:
-            segment.add_gate(g)
-        current_gates.clear()
-        optimized = _optimize_unitary(segment)
-        for g in optimized.gates:
-            result.add_gate(g)
-
-    for gate in c.gates:
-        if _is_unitary_gate(gate):
-            current_gates.append(gate)
-        else:
-            _flush_unitary()
-            result.add_gate(gate)
-
-    _flush_unitary()
-    return result
-
-
-class ZXPass(TransformationPass):
+    symbolic = dag.copy_empty_like()
+    index = 0
+    for node in dag.topological_op_nodes():
+        op = node.op
+        if any(_is_template_angle(op.name, param) for param in op.params):
+            op = op.copy()
+            params = []
+            for param in op.params:
+                if _is_template_angle(op.name, param):
+                    param = Parameter(f"{_TEMPLATE_ANGLE_PREFIX}{index}")
+                    index += 1
+                params.append(param)
+            op.params = params
+        symbolic.apply_operation_back(op, node.qargs, node.cargs, check=False)
+    return symbolic
+
+
+def _bind_template(template: DAGCircuit, angles: List[float]) -> DAGCircuit:
+    """Return the DAG obtained by binding the parameters of a structural template to ``angles``."""
+    circuit = dag_to_circuit(template, copy_operations=False)
+    values = {
+        param: angles[int(param.name[len(_TEMPLATE_ANGLE_PREFIX):])]
+        for param in circuit.parameters
+        if param.name.startswith(_TEMPLATE_ANGLE_PREFIX)
+    }
+    circuit.assign_parameters(values, inplace=True, strict=False)
+    return circuit_to_dag(circuit, copy_operations=False)
+
+
+class ZXPass(TransformationPass):  # pylint: disable=too-many-instance-attributes
     """This is a ZX transpiler pass using PyZX for circuit optimization.
 
     :param optimize: The function to use for optimizing a PyZX Circuit. If not specified, applies
         :py:meth:`~pyzx.simplify.full_reduce` followed by :py:meth:`~pyzx.extract.extract_circuit`,
         splitting at non-unitary boundaries (measurements, resets, conditional gates) when present.
     :type optimize: Callable[[pyzx.Circuit], pyzx.Circuit], optional
+    :param workers: If greater than 1, optimise independent segments in a pool of this many worker processes
+        for the duration of each :py:meth:`run`. The output is identical to the serial path.
+    :type workers: int, optional
+    :param executor: An existing :py:class:`concurrent.futures.Executor` to optimise segments on, instead of
+        creating a process pool per run. The caller owns the executor and is responsible for shutting it down.
+        With a process-based executor, a custom ``optimize`` function must be picklable.
+    :type executor: concurrent.futures.Executor, optional
+    :param cache: A cache of optimised unitary segments, consulted before running the default optimiser on
+        each segment. The same cache may be shared between several passes. Ignored for a custom ``optimize``.
+    :type cache: SegmentCache, optional
+    :param persistent_cache: An on-disk cache of optimised unitary segments, shared between processes and runs.
+        Consulted after ``cache`` (if any), and before running the default optimiser on each segment.
+    :type persistent_cache: PersistentSegmentCache, optional
+    :param time_budget: The wall-clock time in seconds that :py:meth:`run` may spend before it stops optimising.
+        Segments that have not finished by then are left unoptimised, and the indices of those segments are
+        recorded in ``property_set["zxpass_timed_out_segments"]``. The pass stops waiting for outstanding segments
+        at the deadline. As a running PyZX call cannot be interrupted, the default optimiser then runs in worker
+        processes (one, without ``workers`` or ``executor``), and those of a pool the pass created are terminated
+        at the deadline; a caller's ``executor`` finishes the stage it is running. A custom ``optimize`` without
+        ``workers`` or ``executor`` runs in this process, and the budget is only checked between segments.
+    :type time_budget: float, optional
+    :param segment_time_budget: The wall-clock time in seconds that the default optimiser may spend on any one
+        segment, checked between the stages of its pipeline. Segments over budget are left unoptimised and
+        recorded as above.
+    :type segment_time_budget: float, optional
+    :param strategy: The pipeline the default optimiser runs on each unitary segment, one of ``"full_reduce"``
+        (the default: :py:meth:`~pyzx.simplify.full_reduce` and extraction), ``"clifford"``
+        (:py:meth:`~pyzx.simplify.clifford_simp` and extraction, for segments of moderate size), ``"teleport"``
+        (:py:meth:`~pyzx.simplify.teleport_reduce`, which merges phases without changing the circuit's structure,
+        and :py:meth:`~pyzx.optimize.basic_optimization`) or ``"basic"``
+        (:py:meth:`~pyzx.optimize.basic_optimization` only). Ignored for a custom ``optimize``.
+    :type strategy: str, optional
+    :param portfolio: If given, the names of several strategies that the default optimiser runs on each unitary
+        segment instead of ``strategy``, keeping the best result by ``portfolio_cost``. With ``workers`` or
+        ``executor``, the strategies race each other in parallel under ``time_budget``, and those that have not
+        started by the deadline are cancelled. Each strategy may take up to ``segment_time_budget``.
+    :type portfolio: Sequence[str], optional
+    :param portfolio_cost: How the results of a portfolio are compared, one of ``"gates"`` (the default: the number
+        of gates), ``"two_qubit"`` (the number of two-qubit gates, then of gates) or ``"depth"`` (the depth, then
+        the number of gates). A segment is only replaced by a result that is strictly cheaper.
+    :type portfolio_cost: str, optional
+    :param window_size: If given, the default optimiser cuts unitary segments longer than this many gates into
+        windows of this size, optimises the windows independently (in parallel, with ``workers`` or ``executor``)
+        and stitches them back together, repeating with shifted window boundaries while that keeps shortening
+        the segment. This bounds the size of each ZX graph, trading some optimisation quality for throughput on
+        very long segments.
+    :type window_size: int, optional
+    :param max_window_rounds: The maximum number of windowed rounds per segment.
+    :type max_window_rounds: int, optional
+    :param detect_repeats: If true, the default optimiser looks for unitary segments that repeat a block of gates
+        (e.g. the layers of a Trotterised circuit) and cuts them into windows of whole blocks (as many as fit in
+        ``window_size``, if given), so that each distinct window is optimised only once and its result reused.
+    :type detect_repeats: bool, optional
+    :param phase_mode: How gate angles are converted to PyZX phases. ``"exact"`` (the default) converts each
+        float exactly, which gives fractions with denominators of up to 2**52 for arbitrary angles and makes
+        PyZX's phase arithmetic slow. ``"limit_denominator"`` uses the closest fraction with a denominator of at
+        most ``2**phase_precision``, and ``"dyadic"`` snaps to the closest multiple of ``pi / 2**phase_precision``.
+        The largest resulting change to any angle, in radians, is recorded in
+        ``property_set["zxpass_max_phase_error"]``.
+    :type phase_mode: str, optional
+    :param phase_precision: The number of bits of precision kept by the ``"limit_denominator"`` and ``"dyadic"``
+        phase modes.
+    :type phase_precision: int, optional
+    :param dag_cache: A cache of whole optimised DAGs, consulted before converting the input DAG at all, for
+        workloads that transpile the same circuits repeatedly. The same cache may be shared between several passes;
+        entries are keyed by the pass's strategy, phase and window settings as well as the DAG. Ignored for a custom
+        ``optimize``.
+    :type dag_cache: DAGCache, optional
+    :param template_cache: A cache of optimised structural templates, for workloads that transpile circuits with
+        the same gates but different rotation angles (e.g. successive iterations of a variational algorithm). The
+        numeric angles of supported gates, other than multiples of pi/4, are replaced by parameters and the result
+        is optimised with symbolic phases once per structure; later DAGs with the same structure only bind their
+        angles, converted according to ``phase_mode``, to the cached template. Optimising symbolically can find
+        fewer simplifications than optimising the actual angles. Ignored for a custom ``optimize``.
+    :type template_cache: DAGCache, optional
+    :param predictor: A pre-screen that the default optimiser consults before optimising each unitary segment that
+        is not cached, leaving segments it does not expect to improve as they are. The counts of segments it let
+        through, skipped and audited during a run, and of the improvements and missed opportunities among them, are
+        recorded in ``property_set["zxpass_predictor_stats"]``. The same predictor may be shared between several
+        passes, so that they learn from each other's outcomes. Ignored for a custom ``optimize``.
+    :type predictor: BenefitPredictor, optional
+    :param collect_stats: If true, each run records a summary of where its time went in
+        ``property_set["zxpass_stats"]``: the total wall time (``"time"``), the gate counts before and after
+        (``"gates_in"``, ``"gates_out"``), the wall time of each stage (``"stages"``: ``"convert"``, ``"optimize"``
+        and ``"recover"``), whether the DAG and template caches hit, how the DAG was recovered (``"recovery"``:
+        ``"spliced"``, ``"rebuilt"`` or ``"discarded"``, if the result was larger than the original), and for each
+        unitary segment the default optimiser ran (``"segments"``) its strategy, qubits, gate counts before and
+        after, the wall time of each stage of its pipeline, the numbers of vertices and edges of its ZX-graph before
+        and after simplification, and whether its result was discarded for not being smaller. Collecting statistics
+        costs nothing when disabled.
+    :type collect_stats: bool, optional
+    :param hook: Callbacks around each stage of a run (``"convert"``, ``"optimize"`` and ``"recover"``) and around
+        each unitary segment the default optimiser runs and each stage of its pipeline, with their wall times and
+        the sizes of the ZX-graphs, e.g. a :class:`ChromeTraceHook` or a :class:`CProfileHook`. See
+        :class:`PassHook` for when segments optimised on an executor are reported.
+    :type hook: PassHook, optional
+    :param causal_segmentation: If true, an operation that PyZX cannot optimise through (an unsupported gate, a
+        measurement, a reset or a conditional gate) only cuts off the gates in its causal past, and gates on
+        unrelated qubits are moved past it into the next segment. This gives larger segments, but does not always
+        give smaller results, so by default such an operation ends the segment.
+    :type causal_segmentation: bool, optional
     """
 
-    def __init__(self, optimize: Optional[Callable[[zx.Circuit], zx.Circuit]] = None):
+    def __init__(  # pylint: disable=too-many-arguments,too-many-locals
+        self,
+        optimize: Optional[Callable[[zx.Circuit], zx.Circuit]] = None,
+        workers: Optional[int] = None,
+        executor: Optional[Executor] = None,
+        cache: Optional[SegmentCache] = None,
+        persistent_cache: Optional[PersistentSegmentCache] = None,
+        time_budget: Optional[float] = None,
+        segment_time_budget: Optional[float] = None,
+        strategy: str = _DEFAULT_STRATEGY,
+        portfolio: Optional[Sequence[str]] = None,
+        portfolio_cost: str = "gates",
+        window_size: Optional[int] = None,
+        max_window_rounds: int = 10,
+        detect_repeats: bool = False,
+        phase_mode: str = "exact",
+        phase_precision: int = 16,
+        dag_cache: Optional[DAGCache] = None,
+        template_cache: Optional[DAGCache] = None,
+        predictor: Optional[BenefitPredictor] = None,
+        collect_stats: bool = False,
+        hook: Optional[PassHook] = None,
+        causal_segmentation: bool = False,
+    ):
         super().__init__()
+        if workers is not None and workers < 1:
+            raise ValueError(f"Expected workers to be at least 1, got {workers}.")
+        if workers is not None and executor is not None:
+            raise ValueError("Only one of workers and executor may be specified.")
         self.optimize: Callable[[zx.Circuit], zx.Circuit] = optimize or _optimize
+        self.workers = workers
+        self.executor = executor
+        self.cache = cache
+        self.persistent_cache = persistent_cache
+        for budget_name, budget in (("time_budget", time_budget), ("segment_time_budget", segment_time_budget)):
+            if budget is not None and budget <= 0:
+                raise ValueError(f"Expected {budget_name} to be positive, got {budget}.")
+        self.time_budget = time_budget
+        self.segment_time_budget = segment_time_budget
+        if strategy not in strategies:
+            raise ValueError(f"Unknown strategy {strategy!r}; expected one of {sorted(strategies)}.")
+        self.strategy = strategy
+        unknown = sorted(set(portfolio or ()) - set(strategies))
+        if unknown:
+            raise ValueError(f"Unknown portfolio strategies {unknown}; expected some of {sorted(strategies)}.")
+        if portfolio_cost not in costs:
+            raise ValueError(f"Unknown portfolio_cost {portfolio_cost!r}; expected one of {sorted(costs)}.")
+        self.portfolio = tuple(portfolio or ())
+        self.portfolio_cost = portfolio_cost
+        if window_size is not None and window_size < 2:
+            raise ValueError(f"Expected window_size to be at least 2, got {window_size}.")
+        if max_window_rounds < 1:
+            raise ValueError(f"Expected max_window_rounds to be at least 1, got {max_window_rounds}.")
+        self.window_size = window_size
+        self.max_window_rounds = max_window_rounds
+        self.detect_repeats = detect_repeats
+        if phase_mode not in phase_modes:
+            raise ValueError(f"Unknown phase_mode {phase_mode!r}; expected one of {sorted(phase_modes)}.")
+        if phase_precision < 1:
+            raise ValueError(f"Expected phase_precision to be at least 1, got {phase_precision}.")
+        self.phase_mode = phase_mode
+        self.phase_precision = phase_precision
+        self.dag_cache = dag_cache
+        self.template_cache = template_cache
+        self.predictor = predictor
+        self.collect_stats = collect_stats
+        self.hook = hook
+        self.causal_segmentation = causal_segmentation
+        # The statistics of the run in progress, while they are being collected.
+        self._stats: Optional[Dict[str, Any]] = None
+        # The largest change to any angle made by the last conversion, in radians.
+        self._max_phase_error = 0.0
+        # The parameters of the DAG being converted, by name, for recovering symbolic phases.
+        self._parameters: Dict[str, Parameter] = {}
+
+    def _caches(self) -> List[SegmentCacheLike]:
+        """Return the configured segment caches, fastest first."""
+        return [cache for cache in (self.cache, self.persistent_cache) if cache is not None]
+
+    @contextmanager
+    def _executor_context(self, deadline: Optional[float] = None) -> Iterator[Optional[Executor]]:
+        """Yield the executor to optimise segments on, or ``None`` to optimise them serially.
+
+        With a ``deadline``, the default optimiser runs in a process pool even without ``workers``, so that segments
+        still running at the deadline can be stopped (see :func:`_process_pool`).
+        """
+        if self.executor is not None:
+            yield self.executor
+        elif self.workers is not None and self.workers > 1:
+            with _process_pool(self.workers, deadline) as executor:
+                yield executor
+        elif deadline is not None and self.optimize is _optimize:
+            with _process_pool(1, deadline) as executor:
+                yield executor
+        else:
+            yield None
+
+    def _stage(self, name: str) -> Any:
+        """Time the enclosed stage of a run into its statistics, if they are being collected, and report it."""
+        return _run_stage(None if self._stats is None else self._stats["stages"], self.hook, name)
+
+    def _note(self, name: str, value: Any) -> None:
+        """Record a value in the statistics of the run, if they are being collected."""
+        if self._stats is not None:
+            self._stats[name] = value
+
+    def _to_phase(self, param: ParameterValueType) -> Optional[Union[Fraction, Poly]]:
+        """Convert a Qiskit angle to a PyZX phase (in units of pi) according to ``phase_mode``.
+
+        Angles that depend on parameters become symbolic phases (see :func:`~.symbolic.parameter_to_phase`), or
+        ``None`` if they are not linear in their parameters.
+        """
+        if isinstance(param, ParameterExpression) and param.parameters:
+            return parameter_to_phase(param, self._to_phase_numeric, self._parameters)
+        return self._to_phase_numeric(float(param))
+
+    def _to_phase_numeric(self, param: float) -> Fraction:
+        """Convert a numeric Qiskit angle to a PyZX phase (in units of pi) according to ``phase_mode``."""
+        phase = phase_modes[self.phase_mode](param / np.pi, self.phase_precision)
+        self._max_phase_error = max(self._max_phase_error, abs(float(phase) * np.pi - param))
+        return phase
+
+    def _to_angle(self, phase: Union[Fraction, Poly]) -> ParameterValueType:
+        """Convert a PyZX phase (in units of pi) back to a Qiskit angle, the inverse of :py:meth:`_to_phase`."""
+        if isinstance(phase, Poly):
+            return phase_to_parameter(phase, self._parameters)
+        return float(phase) * np.pi
 
     @staticmethod
-    def _try_convert_conditional(
+    def _try_convert_conditional(  # pylint: disable=too-many-return-statements
         node: DAGOpNode,
         qubit_to_index: Dict[Qubit, int],
+        to_phase: Callable[[ParameterValueType], Optional[Union[Fraction, Poly]]] = (
+            lambda param: Fraction(float(param) / np.pi)
+        ),
     ) -> Optional[ConditionalGate]:
         """Try to convert an IfElseOp DAGOpNode to a PyZX ConditionalGate.
 
         Returns ``None`` if the operation is not a supported conditional conversion
-        (e.g. unsupported gate type, Clbit condition, multi-qubit gate, or
-        multi-gate body).
+        (e.g. unsupported gate type, Clbit condition, multi-qubit gate, multi-gate
+        body, or an angle ``to_phase`` cannot convert). Angles are converted with
+        ``to_phase``.
         """
         gate = node.op
         cond_reg, cond_val = gate.condition
@@ -335,85 +534,88 @@ class ZXPass(TransformationPass):
                 f"Expected {num_params} parameters for conditional gate "
                 f"{inner_name}, got {len(inner_params)}: {inner_params}."
             )
+        phases = [to_phase(param) for param in inner_params]
+        if None in phases:
+            return None
         inner_gate = gate_type(  # type: ignore[call-arg]
             qubit_to_index[node.qargs[0]],
-            *[Fraction(param / np.pi) for param in inner_params],
+            *phases,
             **{"adjoint": adjoint[0]} if adjoint else {},
         )
         return ConditionalGate(
             cond_reg.name, int(cond_val), inner_gate, cond_reg.size
         )
 
-    def _dag_to_circuits_and_nodes(
-        self, dag: DAGCircuit
-    ) -> List[Union[zx.Circuit, DAGOpNode]]:
+    def _dag_to_circuits_and_nodes(self, dag: DAGCircuit) -> List[Union[zx.Circuit, DAGOpNode]]:
         """Convert a DAG to a list of PyZX Circuits and DAGOpNodes. As much of the DAG is converted to PyZX Circuits as
-        possible, but some gates are not supported by PyZX and are left as DAGOpNodes.
+        possible, but some gates are not supported by PyZX and are left as DAGOpNodes. With ``causal_segmentation``,
+        a DAGOpNode only splits off the gates in its causal past, so gates on unrelated qubits may be moved past it
+        into the next PyZX Circuit.
 
         :param dag: The DAG to convert.
         :return: A list of PyZX Circuits and DAGOpNodes corresponding to the DAG.
         """
+        return self._dag_to_segments(dag)[0]
 
-        circuits_and_nodes: List[Union[zx.Circuit, DAGOpNode]] = []
-        qubit_to_index = {qubit: index for index, qubit in enumerate(dag.qubits)}
-        clbit_to_index = {clbit: index for index, clbit in enumerate(dag.clbits)}
+    def _dag_to_segments(  # pylint: disable=too-many-locals,too-many-branches
+        self, dag: DAGCircuit
+    ) -> Tuple[List[Union[zx.Circuit, DAGOpNode]], List[List[DAGOpNode]]]:
+        """Convert a DAG as :py:meth:`_dag_to_circuits_and_nodes` does, also returning the nodes of each circuit.
 
-        current_circuit: Optional[zx.Circuit] = None
+        :param dag: The DAG to convert.
+        :return: The list of PyZX Circuits and DAGOpNodes, and for each PyZX Circuit in it (in order), the DAG nodes
+            its gates were converted from.
+        """
 
-        def _ensure_circuit() -> zx.Circuit:
-            nonlocal current_circuit
-            if current_circuit is None:
-                current_circuit = zx.Circuit(
-                    len(dag.qubits),
-                    bit_amount=len(dag.clbits) if dag.clbits else None,
-                )
-            return current_circuit
+        qubit_to_index = {qubit: index for index, qubit in enumerate(dag.qubits)}
+        clbit_to_index = {clbit: index for index, clbit in enumerate(dag.clbits)}
 
-        for node in dag.topological_op_nodes():
+        # Each operation (with the node it came from), the wires it acts on, and whether it must be left as a
+        # DAGOpNode.
+        ops: List[Tuple[Tuple[Union[Gate, DAGOpNode], DAGOpNode], AbstractSet[Hashable], bool]] = []
+        # Qiskit's default order interleaves the gates of successive layers on different qubits, hiding repeats;
+        # preferring the order in which the nodes were added keeps each layer of a circuit built layer by layer
+        # contiguous.
+        key = _insertion_order(dag) if self.detect_repeats else None
+        for node in dag.topological_op_nodes(key=key):
             gate = node.op
+            wires = frozenset(node.qargs) | frozenset(node.cargs)
 
             if gate.name == "measure":
-                _ensure_circuit().add_gate(
-                    PyzxMeasurement(
-                        qubit_to_index[node.qargs[0]],
-                        result_bit=clbit_to_index[node.cargs[0]],
-                    )
-                )
+                ops.append((
+                    (
+                        PyzxMeasurement(
+                            qubit_to_index[node.qargs[0]],
+                            result_bit=clbit_to_index[node.cargs[0]],
+                        ),
+                        node,
+                    ),
+                    wires,
+                    False,
+                ))
                 continue
 
             if gate.name == "reset":
-                _ensure_circuit().add_gate(
-                    PyzxReset(qubit_to_index[node.qargs[0]])
-                )
+                ops.append(((PyzxReset(qubit_to_index[node.qargs[0]]), node), wires, False))
                 continue
 
             # Handle conditional gates (IfElseOp): convert supported
             # single-qubit Z/X rotations to PyZX ConditionalGate; otherwise
             # store as DAGOpNode.
             if isinstance(gate, IfElseOp):
-                converted = self._try_convert_conditional(node, qubit_to_index)
+                converted = self._try_convert_conditional(node, qubit_to_index, self._to_phase)
                 if converted is not None:
-                    _ensure_circuit().add_gate(converted)
-                    continue
-                if current_circuit is not None:
-                    circuits_and_nodes.append(current_circuit)
-                    current_circuit = None
-                circuits_and_nodes.append(node)
+                    ops.append(((converted, node), wires, False))
+                else:
+                    ops.append(((node, node), wires, True))
                 continue
 
             if gate.name not in qiskit_gate_table:
                 # Encountered an operation not supported by PyZX (or an unsupported
-                # conditional gate), so just store the DAGOpNode.
-                # Flush the current PyZX Circuit first if there is one.
-                # TODO: It might be possible to do something more clever here by "snipping out"
-                # the unsupported operations, optimizing the rest of the circuit, and then
-                # reinserting the unsupported operations, but this is very tricky as the unsupported
-                # operations may have side effects on the rest of the circuit.
-                # See https://github.com/dlyongemallo/qiskit-zx-transpiler/issues/18.
-                if current_circuit is not None:
-                    circuits_and_nodes.append(current_circuit)
-                    current_circuit = None
-                circuits_and_nodes.append(node)
+                # conditional gate), so just store the DAGOpNode. With causal_segmentation,
+                # only the gates in its causal past are cut off from the rest of the circuit
+                # (see https://github.com/dlyongemallo/qiskit-zx-transpiler/issues/18).
+                ops.append(((node, node), wires, True))
                 continue
 
             gate_type, _, num_qubits, num_params, *adjoint = qiskit_gate_table[gate.name]  # type: ignore
@@ -427,24 +629,44 @@ class ZXPass(TransformationPass):
                     f"Expected {num_params} parameters for gate {gate.name}, got {len(node.op.params)}: "
                     f"{node.op.params}."
                 )
+            phases = [self._to_phase(param) for param in node.op.params]
+            if None in phases:
+                # A parameter expression PyZX cannot represent, so leave the gate as it is.
+                ops.append(((node, node), wires, True))
+                continue
             kwargs = {"adjoint": adjoint[0]} if adjoint else {}
-            _ensure_circuit().add_gate(
-                gate_type(
-                    *[qubit_to_index[qarg] for qarg in node.qargs],
-                    *[Fraction(param / np.pi) for param in node.op.params],
-                    **kwargs,
-                )
-            )
+            ops.append((
+                (
+                    gate_type(
+                        *[qubit_to_index[qarg] for qarg in node.qargs],
+                        *phases,
+                        **kwargs,
+                    ),
+                    node,
+                ),
+                wires,
+                False,
+            ))
 
-        # Flush any remaining PyZX Circuit.
-        if current_circuit is not None:
-            circuits_and_nodes.append(current_circuit)
+        circuits_and_nodes: List[Union[zx.Circuit, DAGOpNode]] = []
+        segment_nodes: List[List[DAGOpNode]] = []
+        for part in _causal_split(ops, self.causal_segmentation):
+            if isinstance(part, list):
+                circuit = zx.Circuit(
+                    len(dag.qubits),
+                    bit_amount=len(dag.clbits) if dag.clbits else None,
+                )
+                for converted_gate, _ in part:
+                    circuit.add_gate(converted_gate)
+                circuits_and_nodes.append(circuit)
+                segment_nodes.append([source for _, source in part])
+            else:
+                circuits_and_nodes.append(part[1])
 
-        return circuits_and_nodes
+        return circuits_and_nodes, segment_nodes
 
-    @staticmethod
     def _recover_conditional_gate(
-        gate: ConditionalGate, original_dag: DAGCircuit, dag: DAGCircuit
+        self, gate: ConditionalGate, original_dag: DAGCircuit, dag: DAGCircuit
     ) -> None:
         """Recover a ConditionalGate from a PyZX circuit into a Qiskit DAG."""
         inner = gate.inner_gate
@@ -458,10 +680,10 @@ class ZXPass(TransformationPass):
                 f"Unsupported inner gate in ConditionalGate: {inner_name}."
             )
         qubit = original_dag.qubits[inner.target]  # type: ignore[attr-defined]
-        params: List[float] = []
+        params: List[ParameterValueType] = []
         num_params = qiskit_gate_table[inner_name][3]
         if num_params > 0 and hasattr(inner, "phase"):
-            params = [float(inner.phase) * np.pi]
+            params = [self._to_angle(inner.phase)]
         _, inner_gate_type, _, _, *_ = qiskit_gate_table[inner_name]
         qiskit_gate = inner_gate_type(*params)
         # Build a body circuit for the IfElseOp.
@@ -471,7 +693,7 @@ class ZXPass(TransformationPass):
         if_op = IfElseOp((creg, gate.condition_value), body)
         dag.apply_operation_back(if_op, (qubit,), tuple(creg))
 
-    def _recover_dag(  # pylint: disable=too-many-locals,too-many-branches
+    def _recover_dag(
         self,
         circuits_and_nodes: List[Union[zx.Circuit, DAGOpNode]],
         original_dag: DAGCircuit,
@@ -503,15 +725,30 @@ class ZXPass(TransformationPass):
                     circuit_or_node.op, circuit_or_node.qargs, circuit_or_node.cargs
                 )
                 continue
-            for gate in circuit_or_node.gates:
+            self._append_gates(circuit_or_node, original_dag, dag)
+
+        return dag
+
+    def _append_gates(self, circuit: zx.Circuit, original_dag: DAGCircuit, dag: DAGCircuit) -> None:
+        """Append the gates of a PyZX circuit to a DAG, acting on the corresponding bits of the original DAG.
+
+        :param circuit: The PyZX circuit whose gates to append.
+        :param original_dag: The original input DAG to ZXPass, whose bits the gates' indices refer to.
+        :param dag: The DAG to append to. It must contain every bit the gates act on.
+        """
+        qubits = original_dag.qubits
+        for gate in circuit.gates:
+            # Unitary gates are by far the most common, so look them up before anything else.
+            entry = _recovery_table.get((type(gate), getattr(gate, "adjoint", False)))
+            if entry is None:
                 if isinstance(gate, PyzxMeasurement):
-                    qubit = original_dag.qubits[gate.target]
+                    qubit = qubits[gate.target]
                     clbit = original_dag.clbits[gate.result_bit]
                     dag.apply_operation_back(Measure(), (qubit,), (clbit,))
                     continue
 
                 if isinstance(gate, PyzxReset):
-                    qubit = original_dag.qubits[gate.target]
+                    qubit = qubits[gate.target]
                     dag.apply_operation_back(Reset(), (qubit,))
                     continue
 
@@ -519,40 +756,228 @@ class ZXPass(TransformationPass):
                     self._recover_conditional_gate(gate, original_dag, dag)
                     continue
 
-                gate_name = (
-                    gate.qasm_name
-                    if not (hasattr(gate, "adjoint") and gate.adjoint)
-                    else gate.qasm_name_adjoint
-                )
-                if gate_name not in qiskit_gate_table:
-                    raise ValueError(f"Unsupported gate: {gate_name}.")
-                qargs: List[Qubit] = []
-                for attr in ["ctrl1", "ctrl2", "control", "target"]:
-                    if hasattr(gate, attr):
-                        qargs.append(original_dag.qubits[getattr(gate, attr)])
-                _, gate_type, _, num_params, *_ = qiskit_gate_table[gate_name]
-                params: List[float] = []
-                if num_params > 0 and hasattr(gate, "phase"):
-                    params = [float(gate.phase) * np.pi]
-                elif num_params > 0 and hasattr(gate, "phases"):
-                    params = [float(phase) * np.pi for phase in gate.phases]
-                dag.apply_operation_back(gate_type(*params), tuple(qargs))
+                entry = _gate_recovery(gate)
+            qubits_of, instance, gate_type, phase_attr = entry
+            qargs = tuple(map(qubits.__getitem__, qubits_of(gate)))
+            if instance is None:
+                if phase_attr == "phase":
+                    instance = gate_type(self._to_angle(getattr(gate, "phase")))
+                elif phase_attr == "phases":
+                    instance = gate_type(*[self._to_angle(phase) for phase in getattr(gate, "phases")])
+                else:
+                    instance = gate_type()
+            dag.apply_operation_back(instance, qargs, check=False)
+
+    def _substitute_segments(
+        self, dag: DAGCircuit, segments: List[Tuple[List[DAGOpNode], zx.Circuit, List[Bit]]]
+    ) -> None:
+        """Replace the nodes of each segment in a DAG with its optimised gates, leaving the rest of the DAG untouched.
 
-        return dag
+        :param dag: The DAG to modify in place.
+        :param segments: For each segment to replace, the DAG nodes it was converted from, its optimised circuit and
+            the bits it acts on (qubits before clbits, see :func:`_block_bits`).
+        """
+        for nodes, circuit, bits in segments:
+            sub_dag = DAGCircuit()
+            sub_dag.add_qubits([bit for bit in bits if isinstance(bit, Qubit)])
+            sub_dag.add_clbits([bit for bit in bits if isinstance(bit, Clbit)])
+            self._append_gates(circuit, dag, sub_dag)
+            # A segment is a contiguous run of a topological order of the DAG, so it can be collapsed into a single
+            # node without creating a cycle.
+            placeholder = Instruction("zx_segment", sub_dag.num_qubits(), sub_dag.num_clbits(), [])
+            node = dag.replace_block_with_op(
+                nodes, placeholder, {bit: i for i, bit in enumerate(bits)}, cycle_check=False
+            )
+            dag.substitute_node_with_dag(node, sub_dag, wires=bits)
 
     def run(self, dag: DAGCircuit) -> DAGCircuit:
         """Run the ZX transpiler pass on the given DAG.
 
+        When only a small part of the DAG changes, the optimised segments are spliced into ``dag`` in place and
+        ``dag`` itself is returned; otherwise a new DAG is built.
+
         :param dag: The directed acyclic graph to optimize using pyzx.
         :return: The transformed DAG.
         """
+        if not self.collect_stats:
+            return self._run_pass(dag)
+        self._stats = {"stages": {}, "segments": [], "gates_in": dag.size(recurse=True)}
+        start = time.perf_counter()
+        try:
+            optimized_dag = self._run_pass(dag)
+        finally:
+            stats, self._stats = self._stats, None
+            stats["time"] = time.perf_counter() - start
+            self.property_set["zxpass_stats"] = stats
+        stats["gates_out"] = optimized_dag.size(recurse=True)
+        return optimized_dag
 
-        circuits_and_nodes = self._dag_to_circuits_and_nodes(dag)
+    def _run_pass(self, dag: DAGCircuit) -> DAGCircuit:
+        """Run the pass on ``dag``, as :py:meth:`run` does, without collecting statistics about the run."""
+        deadline = None if self.time_budget is None else time.monotonic() + self.time_budget
+        timed_out: Optional[List[int]] = None
+        if deadline is not None or self.segment_time_budget is not None:
+            timed_out = []
+            self.property_set["zxpass_timed_out_segments"] = timed_out
+
+        if self.optimize is not _optimize:
+            return self._run(dag, deadline, timed_out)
+
+        settings = (
+            f"{self.strategy}:{self.portfolio}:{self.portfolio_cost}:{self.phase_mode}:{self.phase_precision}:"
+            f"{self.window_size}:{self.max_window_rounds}:{self.detect_repeats}:{self.predictor is not None}:"
+            f"{self.causal_segmentation}"
+        )
+        key = None
+        if self.dag_cache is not None:
+            key = f"{settings}:{dag_fingerprint(dag)}"
+            hit = self.dag_cache.get(key)
+            self._note("dag_cache_hit", hit is not None)
+            if hit is not None:
+                return self._restore(hit, dag)
+        if self.template_cache is not None:
+            optimized_dag = self._run_template(dag, self.template_cache, settings, deadline, timed_out)
+        else:
+            optimized_dag = self._run(dag, deadline, timed_out)
+        # A DAG some of whose segments ran out of time is not the pass's real result, so is not kept.
+        if key is not None and self.dag_cache is not None and not timed_out:
+            self.dag_cache.put(key, optimized_dag, {"zxpass_max_phase_error": self._max_phase_error})
+        return optimized_dag
+
+    def _restore(self, hit: Tuple[DAGCircuit, Dict[str, Any]], dag: DAGCircuit) -> DAGCircuit:
+        """Return a DAG taken from a cache in place of ``dag``, restoring the properties recorded with it."""
+        cached_dag, properties = hit
+        cached_dag = _onto_bits(cached_dag, dag)
+        cached_dag.name = dag.name
+        cached_dag.metadata = dag.metadata
+        for name, value in properties.items():
+            self.property_set[name] = value
+        return cached_dag
+
+    def _run_template(  # pylint: disable=too-many-arguments
+        self,
+        dag: DAGCircuit,
+        cache: DAGCache,
+        settings: str,
+        deadline: Optional[float],
+        timed_out: Optional[List[int]],
+    ) -> DAGCircuit:
+        """Optimise a DAG by binding its angles to the optimised structural template of the DAG.
+
+        The template is the DAG with its angles (see :func:`_is_template_angle`) replaced by parameters, optimised
+        with symbolic phases. It is taken from ``cache`` if the structure has been seen before, and otherwise
+        optimised and stored there. The angles bound to it are first converted according to ``phase_mode``, as they
+        would have been without a template.
+
+        :param dag: The DAG to optimise.
+        :param cache: The cache of templates.
+        :param settings: The pass's settings, as part of the cache key.
+        :param deadline: The time (as given by :py:func:`time.monotonic`) at which to stop optimising, if any.
+        :param timed_out: The list to record the indices of segments that run out of time in, if any.
+        :return: The transformed DAG.
+        """
+        key = f"{settings}:{dag_fingerprint(dag, _is_template_angle)}"
+        hit = cache.get(key)
+        self._note("template_cache_hit", hit is not None)
+        if hit is not None:
+            template = self._restore(hit, dag)
+            self._max_phase_error = self.property_set["zxpass_max_phase_error"]
+        else:
+            template = self._run(_symbolic_copy(dag), deadline, timed_out)
+            if not timed_out:
+                cache.put(key, template, {"zxpass_max_phase_error": self._max_phase_error})
+        # The angles are converted as they would have been without a template, so that phase_mode applies to them.
+        angles = [float(self._to_phase_numeric(angle)) * np.pi for angle in _template_angles(dag)]
+        self.property_set["zxpass_max_phase_error"] = self._max_phase_error
+        optimized_dag = _bind_template(template, angles)
+        optimized_dag.name = dag.name
+        optimized_dag.metadata = dag.metadata
+        return optimized_dag
+
+    def _run(self, dag: DAGCircuit, deadline: Optional[float], timed_out: Optional[List[int]]) -> DAGCircuit:
+        """Convert, optimise and recover a DAG, as :py:meth:`run` does on a miss in the DAG cache.
+
+        :param dag: The DAG to optimise.
+        :param deadline: The time (as given by :py:func:`time.monotonic`) at which to stop optimising, if any.
+        :param timed_out: The list to record the indices of segments that run out of time in, if any.
+        :return: The transformed DAG.
+        """
+        self._max_phase_error = 0.0
+        self._parameters = {}
+        with self._stage("convert"):
+            circuits_and_nodes, segment_nodes = self._dag_to_segments(dag)
+        self.property_set["zxpass_max_phase_error"] = self._max_phase_error
         if not circuits_and_nodes:
             return dag
 
+        circuits = [circuit for circuit in circuits_and_nodes if isinstance(circuit, zx.Circuit)]
+        with self._stage("optimize"), self._executor_context(deadline) as executor:
+            if self.optimize is _optimize:
+                before = None if self.predictor is None else self.predictor.stats()
+                optimizer = _SegmentOptimizer(
+                    strategy=self.strategy,
+                    executor=executor,
+                    caches=self._caches(),
+                    deadline=deadline,
+                    segment_budget=self.segment_time_budget,
+                    window_size=self.window_size,
+                    max_window_rounds=self.max_window_rounds,
+                    detect_repeats=self.detect_repeats,
+                    portfolio=self.portfolio,
+                    cost=self.portfolio_cost,
+                    predictor=self.predictor,
+                    collect_stats=self._stats is not None,
+                    hook=self.hook,
+                    causal_segmentation=self.causal_segmentation,
+                )
+                optimized = iter(optimizer.optimize_circuits(circuits))
+                if self._stats is not None:
+                    self._stats["segments"].extend(optimizer.segment_stats or ())
+                if timed_out is not None:
+                    timed_out.extend(optimizer.timed_out or ())
+                if self.predictor is not None and before is not None:
+                    after = self.predictor.stats()
+                    self.property_set["zxpass_predictor_stats"] = {name: after[name] - before[name] for name in after}
+            else:
+                optimized = iter(_map_segments(self.optimize, circuits, executor, deadline, timed_out))
+        optimized_circuits = list(optimized)
+
+        with self._stage("recover"):
+            return self._recover(dag, circuits_and_nodes, segment_nodes, optimized_circuits)
+
+    def _recover(
+        self,
+        dag: DAGCircuit,
+        circuits_and_nodes: List[Union[zx.Circuit, DAGOpNode]],
+        segment_nodes: List[List[DAGOpNode]],
+        optimized_circuits: List[zx.Circuit],
+    ) -> DAGCircuit:
+        """Return the DAG with the optimised circuits in place of those they were optimised from.
+
+        :param dag: The DAG that was converted.
+        :param circuits_and_nodes: The conversion of ``dag`` (see :py:meth:`_dag_to_segments`).
+        :param segment_nodes: The DAG nodes of each PyZX circuit in ``circuits_and_nodes``.
+        :param optimized_circuits: The optimised version of each PyZX circuit in ``circuits_and_nodes``.
+        :return: The transformed DAG.
+        """
+        circuits = [circuit for circuit in circuits_and_nodes if isinstance(circuit, zx.Circuit)]
+
+        # Splice the segments that changed into the DAG in place, leaving the rest of it untouched. Splicing a node
+        # costs more than appending it to a new DAG, so the whole DAG is rebuilt instead when most of it changed, or
+        # when a segment cannot be spliced (see :func:`_block_bits`).
+        changed = _changed_segments(dag, segment_nodes, circuits, optimized_circuits)
+        if changed is not None and 2 * sum(len(nodes) for nodes, _, _ in changed) <= dag.num_ops():
+            # Each converted node becomes exactly one gate and vice versa, so the change in size is known up front.
+            if self.optimize is _optimize and sum(len(c.gates) - len(nodes) for nodes, c, _ in changed) > 0:
+                self._note("recovery", "discarded")
+                return dag
+            self._note("recovery", "spliced" if changed else "unchanged")
+            self._substitute_segments(dag, changed)
+            return dag
+
+        optimized = iter(optimized_circuits)
         circuits_and_nodes = [
-            self.optimize(circuit) if isinstance(circuit, zx.Circuit) else circuit
+            next(optimized) if isinstance(circuit, zx.Circuit) else circuit
             for circuit in circuits_and_nodes
         ]
 
@@ -563,8 +988,10 @@ class ZXPass(TransformationPass):
         # ``optimize`` callbacks may target other metrics (e.g. depth, T-count),
         # so their results are not discarded here.
         if self.optimize is _optimize and optimized_dag.size(recurse=True) > dag.size(recurse=True):
+            self._note("recovery", "discarded")
             return dag
 
+        self._note("recovery", "rebuilt")
         return optimized_dag
 
     def name(self) -> str: